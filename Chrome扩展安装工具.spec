@@ -1,4 +1,8 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# 设置环境变量 CHROME_TOOLS_ONEDIR=1 时打包为目录模式，启动时不再解压整个程序到临时目录
+ONEDIR = os.environ.get('CHROME_TOOLS_ONEDIR') == '1'
 
 
 a = Analysis(
@@ -15,12 +19,7 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
+exe_options = dict(
     name='Chrome扩展安装工具',
     debug=False,
     bootloader_ignore_signals=False,
@@ -36,3 +35,30 @@ exe = EXE(
     entitlements_file=None,
     uac_admin=True,
 )
+
+if ONEDIR:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        **exe_options,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        name='Chrome扩展安装工具',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        **exe_options,
+    )
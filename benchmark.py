@@ -0,0 +1,564 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crx_parser import CRX3_SHA256_WITH_ECDSA, CRX3_SHA256_WITH_RSA, CrxFile, extension_id_from_public_key
+from crx_verifier import (CRX3_SIGNATURE_CONTEXT, CrxVerifier, _P256_G, _P256_N, _SHA256_DIGEST_INFO,
+                          _p256_multiply_add)
+from extension_inventory import ExtensionInventory
+from extension_manager_core import ExtensionManagerCore
+from extension_name_cache import SOURCE_STORE
+from extension_name_resolver import ExtensionNameResolver
+from registry_backend import HKEY_CURRENT_USER, MemoryRegistryBackend
+from chrome_extension_installer import ChromeExtensionInstaller
+from chrome_extension_cli import RecordWriter
+from extension_snapshot import BinarySnapshotWriter, import_snapshot, snapshot_record
+
+# 默认规模：注册表中的扩展数量、CRX文件大小（KB）
+REGISTRY_SIZES = (100, 1000, 10000)
+CRX_SIZES_KB = (16, 1024, 8192)
+EXTENSION_REG_PATH = r"Software\Google\Chrome\Extensions"
+
+
+def percentile(samples, fraction):
+    """最近秩法计算分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(benchmark, params, samples, items, wall_seconds, **extra):
+    """把一组耗时（秒）整理成结果记录，吞吐量按 items / 总耗时 计算"""
+    result = {
+        "benchmark": benchmark,
+        "params": params,
+        "samples": len(samples),
+        "items": items,
+        "wall_s": round(wall_seconds, 6),
+        "throughput_per_s": round(items / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3) if samples else 0.0,
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+    result.update(extra)
+    return result
+
+
+def print_result(result):
+    params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+    print(f"{result['benchmark']:<8} {params:<32} "
+          f"p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+          f"{result['throughput_per_s']:12.1f} /s")
+
+
+def random_extension_id(rng):
+    return "".join(rng.choice("abcdefghijklmnop") for _ in range(32))
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, payload):
+    """protobuf 长度前缀字段"""
+    return _varint((number << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _der(tag, content):
+    if len(content) < 0x80:
+        return bytes([tag, len(content)]) + content
+    length = len(content).to_bytes((len(content).bit_length() + 7) // 8, 'big')
+    return bytes([tag, 0x80 | len(length)]) + length + content
+
+
+def _der_int(value):
+    return _der(0x02, value.to_bytes(value.bit_length() // 8 + 1, 'big'))
+
+
+def _is_probable_prime(n, rng, rounds=24):
+    for p in (3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+        if n % p == 0:
+            return n == p
+    d, r = n - 1, 0
+    while d % 2 == 0:
+        d, r = d // 2, r + 1
+    for _ in range(rounds):
+        x = pow(rng.randrange(2, n - 1), d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(r - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def make_rsa_key(rng, bits=2048):
+    """生成RSA密钥（只用于测试），返回 (模数, 公钥指数, 私钥指数)"""
+    exponent = 65537
+    while True:
+        primes = []
+        while len(primes) < 2:
+            candidate = rng.getrandbits(bits // 2) | (3 << (bits // 2 - 2)) | 1
+            if _is_probable_prime(candidate, rng):
+                primes.append(candidate)
+        phi = (primes[0] - 1) * (primes[1] - 1)
+        if primes[0] != primes[1] and math.gcd(exponent, phi) == 1:
+            return primes[0] * primes[1], exponent, pow(exponent, -1, phi)
+
+
+def rsa_public_key_der(key):
+    modulus, exponent, _ = key
+    algorithm = _der(0x30, _der(0x06, bytes.fromhex("2a864886f70d010101")) + b"\x05\x00")
+    return _der(0x30, algorithm + _der(0x03, b"\x00" + _der(0x30, _der_int(modulus) + _der_int(exponent))))
+
+
+def rsa_sign(key, digest):
+    modulus, _, private_exponent = key
+    size = (modulus.bit_length() + 7) // 8
+    encoded = _SHA256_DIGEST_INFO + digest
+    padded = b"\x00\x01" + b"\xff" * (size - len(encoded) - 3) + b"\x00" + encoded
+    return pow(int.from_bytes(padded, 'big'), private_exponent, modulus).to_bytes(size, 'big')
+
+
+def make_ecdsa_key(rng):
+    """生成 P-256 密钥（只用于测试），返回 (私钥, 公钥的DER编码)"""
+    private_key = rng.randrange(1, _P256_N)
+    x, y = _p256_multiply_add(private_key, _P256_G, 0, _P256_G)
+    algorithm = _der(0x30, _der(0x06, bytes.fromhex("2a8648ce3d0201")) + _der(0x06, bytes.fromhex("2a8648ce3d030107")))
+    point = b"\x04" + x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+    return private_key, _der(0x30, algorithm + _der(0x03, b"\x00" + point))
+
+
+def ecdsa_sign(private_key, digest, rng):
+    e = int.from_bytes(digest, 'big')
+    while True:
+        k = rng.randrange(1, _P256_N)
+        r = _p256_multiply_add(k, _P256_G, 0, _P256_G)[0] % _P256_N
+        s = pow(k, -1, _P256_N) * (e + r * private_key) % _P256_N
+        if r and s:
+            return _der(0x30, _der_int(r) + _der_int(s))
+
+
+def make_crx(path, payload_kb, rng, name="Benchmark Extension", publisher_key=None):
+    """生成一个签名有效的CRX3文件，返回扩展ID
+
+    开发者签名使用每个文件各自的 ECDSA P-256 密钥，指定 publisher_key 时再加一个
+    RSA签名（与扩展商店发布的CRX文件一样有两个签名）。
+    """
+    private_key, public_key = make_ecdsa_key(rng)
+    crx_id = hashlib.sha256(public_key).digest()[:16]
+    signed_header_data = _field(1, crx_id)
+
+    manifest = {"manifest_version": 3, "name": name, "version": "1.0.0"}
+    zip_path = path + ".zip"
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr("manifest.json", json.dumps(manifest))
+        # 随机内容无法压缩，文件大小接近 payload_kb
+        archive.writestr("payload.bin", os.urandom(payload_kb * 1024), zipfile.ZIP_STORED)
+    digest = hashlib.sha256(CRX3_SIGNATURE_CONTEXT + len(signed_header_data).to_bytes(4, 'little')
+                            + signed_header_data)
+    with open(zip_path, 'rb') as z:
+        for chunk in iter(lambda: z.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest = digest.digest()
+
+    header = _field(CRX3_SHA256_WITH_ECDSA, _field(1, public_key) + _field(2, ecdsa_sign(private_key, digest, rng)))
+    if publisher_key is not None:
+        header += _field(CRX3_SHA256_WITH_RSA,
+                         _field(1, rsa_public_key_der(publisher_key)) + _field(2, rsa_sign(publisher_key, digest)))
+    header += _field(10000, signed_header_data)
+    with open(path, 'wb') as f:
+        f.write(b"Cr24" + (3).to_bytes(4, 'little') + len(header).to_bytes(4, 'little') + header)
+        with open(zip_path, 'rb') as z:
+            shutil.copyfileobj(z, f)
+    os.remove(zip_path)
+    return extension_id_from_public_key(public_key)
+
+
+def make_crx_corpus(directory, sizes_kb, count_per_size, rng):
+    """为每种大小生成 count_per_size 个CRX文件，返回 {大小: [(路径, 扩展ID)]}"""
+    corpus = {}
+    publisher_key = make_rsa_key(rng)
+    for size_kb in sizes_kb:
+        files = []
+        for i in range(count_per_size):
+            path = os.path.join(directory, f"bench_{size_kb}k_{i}.crx")
+            files.append((path, make_crx(path, size_kb, rng, f"Benchmark {size_kb}K #{i}", publisher_key)))
+        corpus[size_kb] = files
+    return corpus
+
+
+def make_registry(count, existing_path, rng, missing_ratio=0.1):
+    """生成包含 count 个扩展子键的内存注册表，部分扩展的文件路径不存在"""
+    registry = MemoryRegistryBackend()
+    extension_ids = []
+    for _ in range(count):
+        extension_id = random_extension_id(rng)
+        path = existing_path if rng.random() >= missing_ratio else existing_path + ".missing"
+        registry.write_values(HKEY_CURRENT_USER, f"{EXTENSION_REG_PATH}\\{extension_id}",
+                              {"path": path, "version": "1.0.0"})
+        extension_ids.append(extension_id)
+    return registry, extension_ids
+
+
+class StubStoreHandler(BaseHTTPRequestHandler):
+    """模拟 crxsoso 和 Chrome Web Store 的扩展详情页"""
+
+    latency = 0.0
+    failure_rate = 0.0
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        with self.rng_lock:
+            failed = self.rng.random() < self.failure_rate
+        extension_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        if failed:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/crxsoso/"):
+            body = f'<div class="name el2">Stub {extension_id}<!----></div>'.encode('utf-8')
+        else:
+            body = f'<h1 class="e-f-w">Stub {extension_id}</h1>'.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubStoreServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的监听队列只有5，并发请求多时连接会被拒绝并在1秒后重试
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # 对冲请求中较慢的一方得到结果前，客户端可能已经关闭连接
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+@contextlib.contextmanager
+def stub_store_server(latency, failure_rate, seed=0):
+    """在本地端口启动模拟扩展商店，返回 (crxsoso地址模板, webstore地址模板)"""
+    handler = type("Handler", (StubStoreHandler,), {
+        "latency": latency, "failure_rate": failure_rate, "rng": random.Random(seed),
+    })
+    server = StubStoreServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        yield base + "/crxsoso/{}", base + "/webstore/{}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class TimedResolver(ExtensionNameResolver):
+    """记录每个扩展名称获取耗时的 ExtensionNameResolver"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.samples = []
+        self._samples_lock = threading.Lock()
+
+    def resolve(self, extension_id):
+        start = time.perf_counter()
+        name = super().resolve(extension_id)
+        with self._samples_lock:
+            self.samples.append(time.perf_counter() - start)
+        return name
+
+
+def bench_scan(work_dir, sizes, repeats, rng):
+    """扫描注册表：scan_registry_extensions，缓存中已有大部分名称"""
+    results = []
+    existing_path = os.path.join(work_dir, "existing.crx")
+    open(existing_path, 'wb').close()
+    for count in sizes:
+        registry, extension_ids = make_registry(count, existing_path, rng)
+        core = ExtensionManagerCore(registry=registry, cache_file=os.path.join(work_dir, f"names_{count}.json"))
+        for extension_id in extension_ids[:int(count * 0.9)]:
+            core.name_cache.set(extension_id, f"Name {extension_id[:8]}", SOURCE_STORE)
+
+        samples = []
+        wall_start = time.perf_counter()
+        for _ in range(repeats):
+            start = time.perf_counter()
+            core.scan_registry_extensions()
+            samples.append(time.perf_counter() - start)
+        wall = time.perf_counter() - wall_start
+        results.append(summarize("scan", {"extensions": count}, samples, count * repeats, wall))
+    return results
+
+
+def bench_parse(corpus):
+    """解析CRX：读取扩展ID和 manifest.json"""
+    results = []
+    for size_kb, files in corpus.items():
+        samples = []
+        wall_start = time.perf_counter()
+        for path, expected_id in files:
+            start = time.perf_counter()
+            with CrxFile(path) as crx:
+                extension_id = crx.extension_id
+                crx.manifest()
+            samples.append(time.perf_counter() - start)
+            if extension_id != expected_id:
+                raise RuntimeError(f"扩展ID不一致: {path}")
+        wall = time.perf_counter() - wall_start
+        results.append(summarize("parse", {"crx_kb": size_kb}, samples, len(files), wall))
+    return results
+
+
+def bench_resolve(count, latency, failure_rate, max_workers, per_host_limit, rng):
+    """从模拟扩展商店并发获取名称，单个名称的耗时包含等待同一主机并发名额的时间"""
+    extension_ids = [random_extension_id(rng) for _ in range(count)]
+    with stub_store_server(latency, failure_rate) as (crxsoso_url, webstore_url):
+        resolver = TimedResolver(max_workers=max_workers, per_host_limit=per_host_limit,
+                                 crxsoso_url=crxsoso_url, webstore_url=webstore_url)
+        try:
+            wall_start = time.perf_counter()
+            names = resolver.resolve_many(extension_ids)
+            wall = time.perf_counter() - wall_start
+            provider_stats = resolver.stats()
+        finally:
+            resolver.close()
+    resolved = sum(1 for name in names.values() if name)
+    params = {"ids": count, "latency_ms": int(latency * 1000), "failure_rate": failure_rate,
+              "workers": max_workers, "per_host": per_host_limit}
+    return [summarize("resolve", params, resolver.samples, count, wall,
+                      success_rate=round(resolved / count, 4) if count else 0.0,
+                      providers=provider_stats)]
+
+
+def bench_install(work_dir, corpus, batch_workers):
+    """安装CRX：逐个 install_extension 以及 install_batch"""
+    results = []
+    # 安装记录和校验结果写入临时目录中的扩展清单，而不是程序目录下的默认清单
+    inventory = ExtensionInventory(os.path.join(work_dir, "install_inventory.db"))
+    for size_kb, files in corpus.items():
+        installer = ChromeExtensionInstaller(registry=MemoryRegistryBackend(),
+                                             extension_dir=os.path.join(work_dir, f"install_{size_kb}k"),
+                                             inventory=inventory)
+        samples = []
+        wall_start = time.perf_counter()
+        for path, extension_id in files:
+            start = time.perf_counter()
+            if not installer.install_extension(extension_id, path):
+                raise RuntimeError(f"安装失败: {path}")
+            samples.append(time.perf_counter() - start)
+        wall = time.perf_counter() - wall_start
+        results.append(summarize("install", {"crx_kb": size_kb}, samples, len(files), wall))
+
+        installer = ChromeExtensionInstaller(registry=MemoryRegistryBackend(),
+                                             extension_dir=os.path.join(work_dir, f"batch_{size_kb}k"),
+                                             inventory=inventory)
+        start = time.perf_counter()
+        batch_results = installer.install_batch([path for path, _ in files], max_workers=batch_workers)
+        wall = time.perf_counter() - start
+        failures = [item for item in batch_results if item["error"]]
+        if failures:
+            raise RuntimeError(f"批量安装失败: {failures[0]['error']}")
+        results.append(summarize("install_batch", {"crx_kb": size_kb, "workers": batch_workers},
+                                 [wall], len(files), wall))
+    inventory.close()
+    return results
+
+
+def bench_verify(corpus, workers):
+    """校验CRX：单进程、进程池，以及结果已缓存时再次校验"""
+    results = []
+    paths = [path for files in corpus.values() for path, _ in files]
+    total_kb = sum(size_kb * len(files) for size_kb, files in corpus.items())
+    for label, max_workers in (("serial", 1), ("pool", workers)):
+        verifier = CrxVerifier(max_workers=max_workers)
+        start = time.perf_counter()
+        verify_results = verifier.verify_many(paths)
+        wall = time.perf_counter() - start
+        invalid = [result for result in verify_results if not result["valid"]]
+        if invalid:
+            raise RuntimeError(f"校验失败: {invalid[0]['path']}: {invalid[0]['errors']}")
+        results.append(summarize("verify", {"mode": label, "workers": max_workers, "total_kb": total_kb},
+                                 [wall], len(paths), wall))
+
+        start = time.perf_counter()
+        verifier.verify_many(paths)
+        wall = time.perf_counter() - start
+        results.append(summarize("verify", {"mode": f"{label}_cached", "workers": max_workers,
+                                            "total_kb": total_kb}, [wall], len(paths), wall))
+    return results
+
+
+def _export_snapshot(core, snapshot_file, binary):
+    with open(snapshot_file, 'wb' if binary else 'w', **({} if binary else {"encoding": "utf-8"})) as f:
+        writer = BinarySnapshotWriter(f) if binary else RecordWriter(f)
+        core.scan_registry_extensions(
+            on_batch=lambda batch: [writer.write(snapshot_record(ext_info)) for ext_info in batch])
+        writer.close()
+
+
+def bench_snapshot(work_dir, sizes, rng):
+    """导出快照并导入到空注册表，NDJSON 和二进制快照各一次"""
+    results = []
+    existing_path = os.path.join(work_dir, "existing.crx")
+    open(existing_path, 'wb').close()
+    for count in sizes:
+        registry, extension_ids = make_registry(count, existing_path, rng)
+        # 每个 core 的扩展清单放在缓存文件所在目录，导出和导入各用一个目录
+        export_dir = os.path.join(work_dir, f"export_{count}")
+        os.makedirs(export_dir, exist_ok=True)
+        core = ExtensionManagerCore(registry=registry, cache_file=os.path.join(export_dir, "names.json"))
+        for extension_id in extension_ids:
+            core.name_cache.set(extension_id, f"Name {extension_id[:8]}", SOURCE_STORE)
+
+        for snapshot_format in ("ndjson", "binary"):
+            snapshot_file = os.path.join(work_dir, f"snapshot_{count}.{snapshot_format}")
+            start = time.perf_counter()
+            _export_snapshot(core, snapshot_file, snapshot_format == "binary")
+            export_wall = time.perf_counter() - start
+
+            import_dir = os.path.join(work_dir, f"import_{count}_{snapshot_format}")
+            os.makedirs(import_dir, exist_ok=True)
+            target = ExtensionManagerCore(registry=MemoryRegistryBackend(),
+                                          cache_file=os.path.join(import_dir, "names.json"))
+            start = time.perf_counter()
+            counts = import_snapshot(target, snapshot_file)
+            import_wall = time.perf_counter() - start
+            if counts["imported"] != count:
+                raise RuntimeError(f"快照导入数量不一致: {counts}")
+
+            params = {"extensions": count, "format": snapshot_format}
+            size = os.path.getsize(snapshot_file)
+            results.append(summarize("export", params, [export_wall], count, export_wall, bytes=size))
+            results.append(summarize("import", params, [import_wall], count, import_wall, bytes=size))
+    return results
+
+
+def compare_results(results, baseline_file):
+    """与之前保存的结果比较 p50 和吞吐量"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {(item["benchmark"], json.dumps(item["params"], sort_keys=True)): item
+                    for item in json.load(f)["results"]}
+    print(f"\n=== 与 {baseline_file} 比较 ===")
+    for result in results:
+        old = baseline.get((result["benchmark"], json.dumps(result["params"], sort_keys=True)))
+        if old is None or not old["p50_ms"] or not old["throughput_per_s"]:
+            continue
+        p50_ratio = result["p50_ms"] / old["p50_ms"]
+        throughput_ratio = result["throughput_per_s"] / old["throughput_per_s"]
+        marker = "×" if p50_ratio > 1.2 else "√"
+        params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+        print(f"{marker} {result['benchmark']:<8} {params:<32} "
+              f"p50 x{p50_ratio:.2f}  吞吐量 x{throughput_ratio:.2f}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Chrome扩展管理工具性能测试")
+    parser.add_argument("--sizes", default=",".join(map(str, REGISTRY_SIZES)),
+                        help="注册表中的扩展数量，逗号分隔")
+    parser.add_argument("--crx-sizes", default=",".join(map(str, CRX_SIZES_KB)),
+                        help="CRX文件大小（KB），逗号分隔")
+    parser.add_argument("--crx-count", type=int, default=20, help="每种大小的CRX文件数量")
+    parser.add_argument("--repeats", type=int, default=5, help="扫描注册表的重复次数")
+    parser.add_argument("--resolve-count", type=int, default=200, help="获取名称的扩展数量")
+    parser.add_argument("--latency-ms", type=float, default=20, help="模拟扩展商店的响应延迟")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="模拟扩展商店的失败率")
+    parser.add_argument("--workers", type=int, default=8, help="获取名称和批量安装的并发数")
+    parser.add_argument("--per-host-limit", type=int, default=4, help="获取名称时每个主机的并发上限")
+    parser.add_argument("--only", help="只运行指定项目：scan,parse,resolve,install,snapshot,verify")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="把结果保存为JSON文件")
+    parser.add_argument("--compare", help="与之前保存的JSON结果比较")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    only = set(args.only.split(",")) if args.only else {"scan", "parse", "resolve", "install", "snapshot", "verify"}
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    crx_sizes = [int(size) for size in args.crx_sizes.split(",") if size]
+    rng = random.Random(args.seed)
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="chrome_ext_bench_")
+    try:
+        corpus = None
+        if only & {"parse", "install", "verify"}:
+            print(f"生成CRX文件: {crx_sizes} KB，每种 {args.crx_count} 个")
+            corpus = make_crx_corpus(work_dir, crx_sizes, args.crx_count, rng)
+
+        # 被测代码的过程输出会干扰计时，全部丢弃
+        with open(os.devnull, 'w') as devnull:
+            steps = [
+                ("scan", lambda: bench_scan(work_dir, sizes, args.repeats, rng)),
+                ("parse", lambda: bench_parse(corpus)),
+                ("resolve", lambda: bench_resolve(args.resolve_count, args.latency_ms / 1000,
+                                                  args.failure_rate, args.workers,
+                                                  args.per_host_limit, rng)),
+                ("install", lambda: bench_install(work_dir, corpus, args.workers)),
+                ("snapshot", lambda: bench_snapshot(work_dir, sizes, rng)),
+                ("verify", lambda: bench_verify(corpus, os.cpu_count() or 1)),
+            ]
+            for name, step in steps:
+                if name not in only:
+                    continue
+                with contextlib.redirect_stdout(devnull):
+                    step_results = step()
+                for result in step_results:
+                    print_result(result)
+                results.extend(step_results)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        data = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+            "results": results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+    if args.compare:
+        compare_results(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
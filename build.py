@@ -1,9 +1,15 @@
 import os
+import sys
 import subprocess
 import shutil
 
-def build_exe():
-    print("开始打包程序...")
+def build_exe(onedir=False):
+    """打包管理工具
+
+    onedir 为真时打包为目录模式：exe 和依赖放在同一目录中，启动时不需要
+    像单文件模式那样先把整个程序解压到临时目录，启动更快。
+    """
+    print(f"开始打包程序（{'目录' if onedir else '单文件'}模式）...")
     
     # 清理之前的构建文件
     for dir_name in ['build', 'dist']:
@@ -18,7 +24,7 @@ def build_exe():
     cmd = [
         'pyinstaller',
         '--noconfirm',
-        '--onefile',
+        '--onedir' if onedir else '--onefile',
         '--windowed',
         '--uac-admin',  # 请求管理员权限
         '--name', 'Chrome扩展管理工具',
@@ -46,7 +52,11 @@ def build_exe():
             
         if process.returncode == 0:
             print("\n打包完成！")
-            print("可执行文件位置：dist/Chrome扩展管理工具.exe")
+            if onedir:
+                print("可执行文件位置：dist/Chrome扩展管理工具/Chrome扩展管理工具.exe")
+                print("发布时需要复制整个 dist/Chrome扩展管理工具 目录")
+            else:
+                print("可执行文件位置：dist/Chrome扩展管理工具.exe")
             
             # 复制README到dist目录
             if os.path.exists('README.md'):
@@ -62,4 +72,5 @@ def build_exe():
         return False
 
 if __name__ == "__main__":
-    build_exe() 
\ No newline at end of file
+    # python build.py --onedir 使用目录模式打包
+    build_exe(onedir='--onedir' in sys.argv[1:]) 
\ No newline at end of file
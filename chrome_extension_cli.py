@@ -0,0 +1,335 @@
+import argparse
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import sys
+
+from crx_verifier import CrxVerifier
+from extension_manager_core import ExtensionManagerCore, EXTENSION_ID_PATTERN
+from extension_path_checker import STATUS_OK
+from extension_change_feed import ExtensionChangeFeed, CHANGE_POLL_INTERVAL, CHANGE_REMOVED
+from extension_snapshot import BinarySnapshotWriter, IMPORT_BATCH_SIZE, import_snapshot, snapshot_record
+
+
+class RecordWriter:
+    """输出结果记录
+
+    ndjson 格式每条记录写一行并立即刷新，便于通过管道逐条处理；
+    json 格式在结束时输出一个数组。
+    """
+
+    def __init__(self, stream, output_format="ndjson"):
+        self.stream = stream
+        self.output_format = output_format
+        self.records = []
+
+    def write(self, record):
+        if self.output_format == "json":
+            self.records.append(record)
+            return
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        if self.output_format == "json":
+            json.dump(self.records, self.stream, ensure_ascii=False, indent=2)
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def extension_record(ext_info, core=None):
+    """把扩展信息转换为输出记录，指定 core 时附带名称来源"""
+    record = dict(ext_info)
+    if core is not None:
+        entry = core.name_cache.get_entry(ext_info["id"])
+        record["name_source"] = entry["source"] if entry and entry["name"] else ""
+    return record
+
+
+def cmd_list(core, args, writer):
+    """列出扩展，扫描到一批就输出一批"""
+    def needs_name(ext_info):
+        # 与 scan_registry_extensions 的判断一致：文件存在但缓存中没有名称
+        return ext_info["status"] == STATUS_OK and not core.name_cache.get(ext_info["id"])
+
+    def emit_batch(batch):
+        for ext_info in batch:
+            # 需要获取名称的扩展等名称确定后再输出
+            if not (args.resolve and needs_name(ext_info)):
+                writer.write(extension_record(ext_info))
+
+    _, unresolved = core.scan_registry_extensions(on_batch=emit_batch)
+    if args.resolve:
+        core.resolve_missing_names(unresolved, on_name=lambda ext_info: writer.write(extension_record(ext_info)))
+    return 0
+
+
+def cmd_export(core, args, writer):
+    """导出所有扩展的快照记录（ID、名称、路径、版本号、状态、注册位置、CRX哈希）
+
+    扫描到一批就写出一批；--binary 时写成二进制快照。
+    """
+    def emit_batch(batch):
+        hashes = core.get_inventory_hashes([ext_info["id"] for ext_info in batch])
+        for ext_info in batch:
+            record = snapshot_record(ext_info, hashes.get(ext_info["id"], ""))
+            if not args.binary:
+                entry = core.name_cache.get_entry(ext_info["id"])
+                record["name_source"] = entry["source"] if entry and entry["name"] else ""
+                record["conflict"] = ext_info["conflict"]
+            writer.write(record)
+
+    core.scan_registry_extensions(on_batch=emit_batch)
+    return 0
+
+
+def cmd_import(core, args, writer):
+    """导入 export 生成的快照（NDJSON 或二进制），分批写入注册表"""
+    try:
+        counts = import_snapshot(core, args.path, batch_size=args.batch_size)
+    except (OSError, ValueError) as e:
+        writer.write({"path": args.path, "error": str(e)})
+        return 1
+    writer.write(dict(counts, path=args.path))
+    return 0
+
+
+def cmd_add(core, args, writer):
+    """添加扩展，指定CRX文件时从文件中读取ID、版本号和名称"""
+    extension_id = args.id or ""
+    version = args.version or ""
+    name = args.name or ""
+    if args.path.lower().endswith(".crx") and os.path.isfile(args.path):
+        check = core.verify_crx(args.path)
+        if not check["valid"]:
+            writer.write({"path": args.path, "error": "CRX文件校验失败", "details": check["errors"]})
+            return 1
+        if extension_id and extension_id.lower() != check["extension_id"]:
+            writer.write({"id": extension_id, "error": f"扩展ID与CRX文件不一致：{check['extension_id']}"})
+            return 1
+    if args.path.lower().endswith(".crx") and not (extension_id and version and name):
+        crx_id, crx_version, crx_name = core.get_crx_info(args.path)
+        extension_id = extension_id or crx_id
+        version = version or crx_version
+        name = name or crx_name
+
+    if not re.match(EXTENSION_ID_PATTERN, extension_id):
+        writer.write({"id": extension_id, "error": "扩展ID格式不正确，必须是32位字母"})
+        return 1
+    extension_id = extension_id.lower()
+
+    core.write_extension(extension_id, args.path, version)
+    if name:
+        core.name_cache[extension_id] = name
+        core.save_name_cache()
+    writer.write(extension_record(core.get_registry_extension(extension_id), core))
+    return 0
+
+
+def cmd_remove(core, args, writer):
+    """删除扩展，每个扩展输出一条结果"""
+    exit_code = 0
+    for extension_id in args.ids:
+        extension_id = extension_id.lower()
+        try:
+            core.delete_extension(extension_id)
+        except OSError as e:
+            writer.write({"id": extension_id, "removed": False, "error": str(e)})
+            exit_code = 1
+            continue
+        if extension_id in core.name_cache:
+            del core.name_cache[extension_id]
+        writer.write({"id": extension_id, "removed": True})
+    # 所有删除合并为一次缓存写入
+    core.save_name_cache()
+    return exit_code
+
+
+def cmd_modify(core, args, writer):
+    """修改已有扩展的路径、版本号或名称"""
+    extension_id = args.id.lower()
+    ext_info = core.get_registry_extension(extension_id)
+    if ext_info is None:
+        writer.write({"id": extension_id, "error": "注册表中不存在该扩展"})
+        return 1
+
+    path = ext_info["path"] if args.path is None else args.path
+    version = ext_info["version"] if args.version is None else args.version
+    if path != ext_info["path"] or version != ext_info["version"]:
+        core.write_extension(extension_id, path, version)
+    if args.name is not None:
+        core.name_cache[extension_id] = args.name
+        core.save_name_cache()
+    writer.write(extension_record(core.get_registry_extension(extension_id), core))
+    return 0
+
+
+def cmd_resolve_names(core, args, writer):
+    """从扩展商店获取名称，未指定ID时处理注册表中所有缺少名称的扩展"""
+    if args.ids:
+        extension_ids = [extension_id.lower() for extension_id in args.ids]
+    else:
+        extension_ids = [extension_id for extension_id in core.scanner.scan()
+                         if not core.name_cache.get(extension_id)]
+
+    def emit(extension_id, name):
+        writer.write({"id": extension_id, "name": name, "resolved": bool(name)})
+
+    resolved = core.resolve_extension_names(extension_ids, on_result=emit, force=args.force)
+    # 仍在失败等待期内、没有发起请求的扩展
+    for extension_id in extension_ids:
+        if extension_id not in resolved:
+            writer.write({"id": extension_id, "name": core.name_cache.get(extension_id, ""),
+                          "resolved": False, "skipped": True})
+
+    if args.stale:
+        stale_ids = [extension_id for extension_id in core.name_cache.stale_ids()
+                     if extension_id not in resolved]
+        core.resolve_extension_names(stale_ids, on_result=emit, force=True)
+
+    if args.stats and core._name_resolver is not None:
+        writer.write({"provider_stats": core.name_resolver.stats()})
+    return 0
+
+
+def cmd_verify(core, args, writer):
+    """校验CRX文件的签名、扩展ID和ZIP内容，目录中的 .crx 文件在进程池中并行校验"""
+    crx_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            crx_paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                    if name.lower().endswith('.crx')))
+        else:
+            crx_paths.append(path)
+    exit_code = 0
+    for result in CrxVerifier(core.inventory, max_workers=args.workers).verify_many(crx_paths):
+        writer.write(result)
+        if not result["valid"]:
+            exit_code = 1
+    return exit_code
+
+
+def cmd_import_bundle(core, args, writer):
+    """导入离线名称数据包（JSON Lines 或 SQLite）"""
+    try:
+        counts = core.import_name_bundle(args.path, replace=not args.append)
+    except (OSError, ValueError, sqlite3.DatabaseError) as e:
+        writer.write({"path": args.path, "error": str(e)})
+        return 1
+    writer.write(dict(counts, path=args.path))
+    return 0
+
+
+def cmd_watch(core, args, writer):
+    """监视扩展的变化，每个发生变化的扩展输出一条记录，按 Ctrl+C 结束"""
+    def emit(changes):
+        for extension_id, change in changes.items():
+            ext_info = None if change == CHANGE_REMOVED else core.get_registry_extension(extension_id)
+            record = {"id": extension_id} if ext_info is None else extension_record(ext_info, core)
+            record["change"] = change
+            writer.write(record)
+
+    feed = ExtensionChangeFeed(core, emit, poll_interval=args.interval)
+    try:
+        feed.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="chrome_extension_cli",
+                                     description="Chrome扩展管理工具（命令行版）")
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson",
+                        help="输出格式，默认每行一条JSON记录")
+    parser.add_argument("--cache-file", help="名称缓存文件路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="列出已安装的扩展")
+    list_parser.add_argument("--resolve", action="store_true",
+                             help="从扩展商店获取缓存中没有的名称")
+    list_parser.set_defaults(handler=cmd_list)
+
+    add_parser = subparsers.add_parser("add", help="添加扩展")
+    add_parser.add_argument("path", help="CRX文件路径")
+    add_parser.add_argument("--id", help="扩展ID，默认从CRX文件中读取")
+    add_parser.add_argument("--version", help="版本号，默认从CRX文件中读取")
+    add_parser.add_argument("--name", help="扩展名称")
+    add_parser.set_defaults(handler=cmd_add)
+
+    remove_parser = subparsers.add_parser("remove", help="删除扩展")
+    remove_parser.add_argument("ids", nargs="+", metavar="ID")
+    remove_parser.set_defaults(handler=cmd_remove)
+
+    modify_parser = subparsers.add_parser("modify", help="修改扩展")
+    modify_parser.add_argument("id")
+    modify_parser.add_argument("--path")
+    modify_parser.add_argument("--version")
+    modify_parser.add_argument("--name")
+    modify_parser.set_defaults(handler=cmd_modify)
+
+    export_parser = subparsers.add_parser("export", help="导出所有扩展的快照")
+    export_parser.add_argument("-o", "--output", help="输出文件，默认输出到标准输出")
+    export_parser.add_argument("--binary", action="store_true", help="写成紧凑的二进制快照")
+    export_parser.set_defaults(handler=cmd_export)
+
+    import_parser = subparsers.add_parser("import", help="导入 export 生成的快照")
+    import_parser.add_argument("path", help="NDJSON 或二进制快照文件")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                               help=f"每批写入注册表的记录数，默认 {IMPORT_BATCH_SIZE}")
+    import_parser.set_defaults(handler=cmd_import)
+
+    resolve_parser = subparsers.add_parser("resolve-names", help="从扩展商店获取扩展名称")
+    resolve_parser.add_argument("ids", nargs="*", metavar="ID")
+    resolve_parser.add_argument("--force", action="store_true", help="忽略失败等待期和已缓存的名称")
+    resolve_parser.add_argument("--stale", action="store_true", help="同时重新获取已过期的商店名称")
+    resolve_parser.add_argument("--stats", action="store_true",
+                                help="最后输出各名称来源的命中、失败、对冲次数和耗时")
+    resolve_parser.set_defaults(handler=cmd_resolve_names)
+
+    verify_parser = subparsers.add_parser("verify", help="校验CRX文件的签名和完整性")
+    verify_parser.add_argument("paths", nargs="+", metavar="PATH", help="CRX文件或包含CRX文件的目录")
+    verify_parser.add_argument("--workers", type=int, help="校验进程数，默认为CPU核心数")
+    verify_parser.set_defaults(handler=cmd_verify)
+
+    bundle_parser = subparsers.add_parser("import-bundle", help="导入离线名称数据包")
+    bundle_parser.add_argument("path", help="JSON Lines 或 SQLite 文件，记录包含 id、name、version、publisher")
+    bundle_parser.add_argument("--append", action="store_true", help="保留已导入的记录，只添加或更新")
+    bundle_parser.set_defaults(handler=cmd_import_bundle)
+
+    watch_parser = subparsers.add_parser("watch", help="监视扩展的变化")
+    watch_parser.add_argument("--interval", type=float, default=CHANGE_POLL_INTERVAL,
+                              help=f"轮询间隔（秒），默认 {CHANGE_POLL_INTERVAL}")
+    watch_parser.set_defaults(handler=cmd_watch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output_path = getattr(args, "output", None)
+    if getattr(args, "binary", False):
+        stream = open(output_path, 'wb') if output_path else sys.stdout.buffer
+        writer = BinarySnapshotWriter(stream)
+    else:
+        stream = open(output_path, 'w', encoding='utf-8') if output_path else sys.stdout
+        writer = RecordWriter(stream, args.format)
+    try:
+        # 标准输出只用于结果记录，过程信息输出到标准错误
+        with contextlib.redirect_stdout(sys.stderr):
+            core = ExtensionManagerCore(cache_file=args.cache_file)
+            try:
+                exit_code = args.handler(core, args, writer)
+            finally:
+                core.save_name_cache()
+                core.registry.flush()
+        writer.close()
+    finally:
+        if output_path:
+            stream.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
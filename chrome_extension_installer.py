@@ -1,32 +1,56 @@
 import os
 import sys
-import winreg
-import shutil
 import json
+import multiprocessing
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from crx_parser import CrxFile
+from policy_list import PolicyList
+from registry_backend import HKEY_CURRENT_USER, HKEY_LOCAL_MACHINE, get_registry_backend
+from crx_store import CrxStore, normalize_path
+from crx_verifier import CrxVerifier, format_result
+from extension_scanner import forcelist_path
+from extension_inventory import ExtensionInventory, TOOL_INSTALLER
 
 class ChromeExtensionInstaller:
-    def __init__(self):
+    def __init__(self, registry=None, extension_dir=None, inventory=None, verify=True):
+        self.registry = registry or get_registry_backend()
+        self.extension_dir = extension_dir  # 未指定时使用程序目录下的 Extensions
+        self.store = None
+        self.inventory = inventory  # 未指定时使用默认的扩展清单
+        self.verify = verify  # 安装前校验CRX文件的签名和完整性
+        self.verifier = None
+        
         # 扩展安装的注册表路径
         self.registry_paths = {
             'chrome_extensions': [
-                (winreg.HKEY_LOCAL_MACHINE, r"Software\Google\Chrome\Extensions"),
-                (winreg.HKEY_LOCAL_MACHINE, r"Software\Wow6432Node\Google\Chrome\Extensions"),
+                (HKEY_LOCAL_MACHINE, r"Software\Google\Chrome\Extensions"),
+                (HKEY_LOCAL_MACHINE, r"Software\Wow6432Node\Google\Chrome\Extensions"),
             ],
             'policies': [
-                (winreg.HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"),
-                (winreg.HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\ExtensionInstallAllowlist"),
+                (HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"),
+                (HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\ExtensionInstallAllowlist"),
             ],
             'preferences': [
-                (winreg.HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\PreferenceMACs"),
+                (HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\PreferenceMACs"),
             ]
         }
 
     def install_extension(self, extension_id, crx_path):
         """安装Chrome扩展的完整流程"""
         try:
+            # 0. 校验签名、扩展ID和ZIP内容，损坏或被截断的文件不安装
+            check = self.verify_files([crx_path]).get(crx_path)
+            if check is not None:
+                if not check["valid"]:
+                    print(format_result(check))
+                    return False
+                if check["extension_id"] != extension_id.lower():
+                    print(f"× 扩展ID与CRX文件不一致：{extension_id} != {check['extension_id']}")
+                    return False
+            
             # 1. 复制扩展文件到固定位置
-            install_path = self._copy_extension_file(crx_path)
+            install_path, digest = self._copy_extension_file(crx_path)
             
             # 2. 在Chrome扩展注册表中注册
             self._register_extension(extension_id, install_path)
@@ -36,6 +60,9 @@ class ChromeExtensionInstaller:
             
             # 4. 添加到允许列表
             self._add_to_allowlist(extension_id)
+            self.registry.flush()
+            self._record_installs([{"id": extension_id, "path": install_path, "version": "1.0",
+                                    "sha256": digest, "size": os.path.getsize(install_path)}])
             
             print(f"扩展安装成功：{extension_id}")
             return True
@@ -44,79 +71,283 @@ class ChromeExtensionInstaller:
             return False
 
     def _copy_extension_file(self, crx_path):
-        """复制扩展文件到程序目录"""
-        # 获取程序安装目录
-        program_dir = os.path.dirname(os.path.abspath(sys.executable))
-        extension_dir = os.path.join(program_dir, "Extensions")
+        """复制扩展文件到程序目录，返回 (安装路径, 内容哈希)"""
+        extension_dir = self._extension_dir()
         os.makedirs(extension_dir, exist_ok=True)
         
-        # 复制文件
+        # 复制文件，内容相同的文件只保存一份并尽量使用硬链接
         dest_path = os.path.join(extension_dir, os.path.basename(crx_path))
-        shutil.copy2(crx_path, dest_path)
-        return dest_path
+        digest, written = self._get_store().place(crx_path, dest_path)
+        if not written:
+            print(f"√ 文件内容未变化，跳过复制: {dest_path}")
+        return dest_path, digest
 
-    def _register_extension(self, extension_id, crx_path):
-        """在Chrome扩展注册表中注册"""
-        for root_key, path in self.registry_paths['chrome_extensions']:
+    def _extension_dir(self):
+        if self.extension_dir:
+            return self.extension_dir
+        # 获取程序安装目录
+        program_dir = os.path.dirname(os.path.abspath(sys.executable))
+        return os.path.join(program_dir, "Extensions")
+
+    def _get_store(self):
+        if self.store is None:
+            self.store = CrxStore(os.path.join(self._extension_dir(), ".store"))
+        return self.store
+
+    def _get_inventory(self):
+        if self.inventory is None:
+            self.inventory = ExtensionInventory()
+        return self.inventory
+
+    def _get_verifier(self):
+        if self.verifier is None:
             try:
-                key = winreg.CreateKeyEx(root_key, f"{path}\\{extension_id}", 0,
-                                       winreg.KEY_ALL_ACCESS | winreg.KEY_WOW64_64KEY)
-                winreg.SetValueEx(key, "path", 0, winreg.REG_SZ, crx_path)
-                winreg.SetValueEx(key, "version", 0, winreg.REG_SZ, "1.0")
-                winreg.CloseKey(key)
-            except WindowsError:
+                inventory = self._get_inventory()
+            except Exception as e:
+                print(f"× 打开扩展清单失败，校验结果不会缓存: {str(e)}")
+                inventory = None
+            self.verifier = CrxVerifier(inventory)
+        return self.verifier
+
+    def verify_files(self, crx_paths):
+        """校验CRX文件，返回 {路径: 校验结果}；不校验时返回空字典"""
+        if not self.verify or not crx_paths:
+            return {}
+        return {result["path"]: result for result in self._get_verifier().verify_many(crx_paths)}
+
+    def _record_installs(self, installs):
+        """在扩展清单中记录安装结果，失败时不影响安装"""
+        try:
+            self._get_inventory().record_installs(installs, TOOL_INSTALLER)
+        except Exception as e:
+            print(f"× 写入扩展清单失败: {str(e)}")
+
+    def collect_crx_references(self):
+        """收集注册表中引用的所有CRX文件路径"""
+        paths = set()
+        extension_roots = self.registry_paths['chrome_extensions'] + [
+            (HKEY_CURRENT_USER, r"Software\Google\Chrome\Extensions")]
+        for root_key, path in extension_roots:
+            for values in self.registry.read_subkey_values(root_key, path).values():
+                if values.get("path"):
+                    paths.add(values["path"])
+        
+        # 强制安装列表中的 "ID;file://C:/路径"，与扫描时使用同一个解析函数，保留盘符
+        root_key, path = self.registry_paths['policies'][0]
+        for _, value_data in PolicyList(self.registry, root_key, path).items():
+            file_path = forcelist_path(value_data)
+            if file_path:
+                paths.add(file_path)
+        return paths
+
+    def gc_store(self, store_dirs=None):
+        """删除仓库中未被注册表引用的CRX文件"""
+        if store_dirs is None:
+            store_dirs = [os.path.join(self._extension_dir(), ".store")]
+            app_data = os.environ.get('LOCALAPPDATA')
+            if app_data:
+                store_dirs.append(os.path.join(app_data, 'Chrome_Extensions', ".store"))
+        referenced = self.collect_crx_references()
+        for store_dir in store_dirs:
+            if not os.path.isdir(store_dir):
                 continue
+            removed = CrxStore(store_dir).gc(referenced)
+            print(f"√ 已清理 {store_dir}：删除 {len(removed)} 个未引用的文件")
+
+    def _register_extension(self, extension_id, crx_path, version="1.0"):
+        """在Chrome扩展注册表中注册"""
+        self._register_extensions([(extension_id, crx_path, version)])
+
+    def _register_extensions(self, items):
+        """批量注册扩展
+
+        items 为 [(扩展ID, 文件路径, 版本号)]
+        """
+        for root_key, path in self.registry_paths['chrome_extensions']:
+            for extension_id, crx_path, version in items:
+                try:
+                    self.registry.write_values(root_key, f"{path}\\{extension_id}",
+                                               {"path": crx_path, "version": version})
+                except OSError:
+                    continue
 
     def _add_to_forcelist(self, extension_id, crx_path):
         """添加到强制安装列表"""
-        try:
-            root_key, path = self.registry_paths['policies'][0]  # ExtensionInstallForcelist
-            key = winreg.CreateKeyEx(root_key, path, 0,
-                                   winreg.KEY_ALL_ACCESS | winreg.KEY_WOW64_64KEY)
-            
-            # 获取现有项数量
-            count = 0
-            try:
-                while True:
-                    winreg.EnumValue(key, count)
-                    count += 1
-            except WindowsError:
-                pass
-            
-            # 添加新项
-            value_name = str(count + 1)
-            value_data = f"{extension_id};file://{crx_path.replace(os.sep, '/')}"
-            winreg.SetValueEx(key, value_name, 0, winreg.REG_SZ, value_data)
-            winreg.CloseKey(key)
-        except WindowsError:
-            pass
+        self._upsert_policy_values(0, [(extension_id, self._forcelist_value(extension_id, crx_path))])
 
     def _add_to_allowlist(self, extension_id):
         """添加到允许列表"""
+        self._upsert_policy_values(1, [(extension_id, extension_id)])
+
+    def _forcelist_value(self, extension_id, crx_path):
+        return f"{extension_id};file://{crx_path.replace(os.sep, '/')}"
+
+    def _upsert_policy_values(self, policy_index, items):
+        """添加或更新策略列表中的多项，列表只打开和读取一次
+
+        items 为 [(扩展ID, 值)]，已存在的扩展ID原位更新，不会重复添加。
+        """
         try:
-            root_key, path = self.registry_paths['policies'][1]  # ExtensionInstallAllowlist
-            key = winreg.CreateKeyEx(root_key, path, 0,
-                                   winreg.KEY_ALL_ACCESS | winreg.KEY_WOW64_64KEY)
-            
-            # 获取现有项数量
-            count = 0
+            root_key, path = self.registry_paths['policies'][policy_index]
+            PolicyList(self.registry, root_key, path).upsert_many(items)
+            return True
+        except OSError:
+            return False
+
+    def compact_policies(self):
+        """整理强制安装列表和允许列表：删除重复项，编号重排为连续"""
+        for root_key, path in self.registry_paths['policies']:
             try:
-                while True:
-                    winreg.EnumValue(key, count)
-                    count += 1
-            except WindowsError:
-                pass
-            
-            # 添加新项
-            value_name = str(count + 1)
-            winreg.SetValueEx(key, value_name, 0, winreg.REG_SZ, extension_id)
-            winreg.CloseKey(key)
-        except WindowsError:
-            pass
+                policy_list = PolicyList(self.registry, root_key, path)
+                writes = policy_list.compact()
+                print(f"√ 已整理 {path}：{len(policy_list)} 项，重写 {writes} 项")
+            except OSError as e:
+                print(f"整理 {path} 失败: {str(e)}")
+        self.registry.flush()
+
+    def install_batch(self, crx_paths, max_workers=8):
+        """批量安装多个扩展
+
+        先在进程池中校验所有CRX文件，再并行解析和复制通过校验的文件，
+        然后集中写入注册表，每个策略列表只打开一次。
+        安装位置只取CRX文件名，不同目录下的同名文件会复制到同一位置，这些文件都不安装。
+        返回每个文件的安装结果列表。
+        """
+        sources = {}
+        for crx_path in crx_paths:
+            sources.setdefault(os.path.normcase(os.path.basename(crx_path)), set()).add(normalize_path(crx_path))
+        clashes = {name for name, paths in sources.items() if len(paths) > 1}
+        
+        # 1. 校验CRX文件，然后并行解析并复制到固定位置
+        checks = self.verify_files([crx_path for crx_path in crx_paths
+                                    if os.path.normcase(os.path.basename(crx_path)) not in clashes])
+        
+        def prepare(crx_path):
+            if os.path.normcase(os.path.basename(crx_path)) in clashes:
+                return {"crx_path": crx_path, "id": "", "version": "", "install_path": "", "sha256": "", "size": 0,
+                        "error": f"安装位置重复：列表中有其他同名的CRX文件 {os.path.basename(crx_path)}"}
+            check = checks.get(crx_path)
+            if check is not None and not check["valid"]:
+                return {"crx_path": crx_path, "id": check["extension_id"], "version": "", "install_path": "",
+                        "sha256": check["sha256"], "size": 0, "error": "；".join(check["errors"])}
+            return self._prepare_extension(crx_path)
+        
+        # 引用记录在所有文件复制完成后只写入一次
+        with self._get_store().batch(), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(prepare, crx_paths))
+        prepared = [result for result in results if not result["error"]]
+        
+        # 2. 在Chrome扩展注册表中注册
+        self._register_extensions([(result["id"], result["install_path"], result["version"] or "1.0")
+                                   for result in prepared])
+        
+        # 3. 集中写入强制安装列表和允许列表
+        forcelist_ok = self._upsert_policy_values(
+            0, [(result["id"], self._forcelist_value(result["id"], result["install_path"]))
+                for result in prepared])
+        allowlist_ok = self._upsert_policy_values(1, [(result["id"], result["id"]) for result in prepared])
+        for result in prepared:
+            if not forcelist_ok:
+                result["error"] = "写入强制安装列表失败"
+            elif not allowlist_ok:
+                result["error"] = "写入允许列表失败"
+        self.registry.flush()
+        
+        # 4. 在一个事务中记录到扩展清单
+        self._record_installs([{"id": result["id"], "path": result["install_path"],
+                                "version": result["version"] or "1.0", "sha256": result["sha256"],
+                                "size": result["size"]}
+                               for result in prepared if not result["error"]])
+        
+        return results
+
+    def _prepare_extension(self, crx_path):
+        """读取扩展ID和版本号并复制文件，不写注册表"""
+        result = {"crx_path": crx_path, "id": "", "version": "", "install_path": "",
+                  "sha256": "", "size": 0, "error": ""}
+        try:
+            with CrxFile(crx_path) as crx:
+                result["id"] = crx.extension_id
+                try:
+                    result["version"] = crx.manifest().get('version', '')
+                except Exception:
+                    pass
+            result["install_path"], result["sha256"] = self._copy_extension_file(crx_path)
+            result["size"] = os.path.getsize(result["install_path"])
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+
+def find_crx_files(source):
+    """从目录或列表文件中获取CRX文件路径
+
+    列表文件每行一个路径，空行和以 # 开头的行被忽略，相对路径相对于列表文件所在目录。
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if name.lower().endswith('.crx'))
+    
+    base_dir = os.path.dirname(os.path.abspath(source))
+    crx_paths = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                crx_paths.append(os.path.join(base_dir, line))
+    return crx_paths
+
+
+def print_batch_report(results):
+    """输出批量安装结果"""
+    succeeded = 0
+    for result in results:
+        if result["error"]:
+            print(f"× {result['crx_path']}: {result['error']}")
+        else:
+            succeeded += 1
+            print(f"√ {result['id']} {result['version']} <- {result['crx_path']}")
+    print(f"\n共 {len(results)} 个扩展，成功 {succeeded} 个，失败 {len(results) - succeeded} 个")
 
 def main():
+    if len(sys.argv) == 3 and sys.argv[1] == '--batch':
+        installer = ChromeExtensionInstaller()
+        results = installer.install_batch(find_crx_files(sys.argv[2]))
+        print_batch_report(results)
+        return
+    
+    if len(sys.argv) == 3 and sys.argv[1] == '--verify':
+        results = ChromeExtensionInstaller().verify_files(find_crx_files(sys.argv[2]))
+        for result in results.values():
+            print(format_result(result))
+        invalid = sum(1 for result in results.values() if not result["valid"])
+        print(f"\n共 {len(results)} 个CRX文件，校验通过 {len(results) - invalid} 个，失败 {invalid} 个")
+        if invalid:
+            sys.exit(1)
+        return
+    
+    if len(sys.argv) == 2 and sys.argv[1] == '--compact':
+        ChromeExtensionInstaller().compact_policies()
+        return
+    
+    if len(sys.argv) == 2 and sys.argv[1] == '--gc':
+        ChromeExtensionInstaller().gc_store()
+        return
+    
+    if len(sys.argv) >= 3 and sys.argv[1] == '--reconcile' and sys.argv[3:] in ([], ['--dry-run']):
+        from extension_reconciler import reconcile
+        dry_run = sys.argv[3:] == ['--dry-run']
+        if not reconcile(ChromeExtensionInstaller(), sys.argv[2], dry_run=dry_run):
+            sys.exit(1)
+        return
+    
     if len(sys.argv) != 3:
         print("用法: chrome_extension_installer.py <扩展ID> <crx文件路径>")
+        print("      chrome_extension_installer.py --batch <crx目录或列表文件>")
+        print("      chrome_extension_installer.py --verify <crx目录或列表文件>")
+        print("      chrome_extension_installer.py --compact")
+        print("      chrome_extension_installer.py --gc")
+        print("      chrome_extension_installer.py --reconcile <期望状态文件> [--dry-run]")
         return
     
     extension_id = sys.argv[1]
@@ -126,4 +357,6 @@ def main():
     installer.install_extension(extension_id, crx_path)
 
 if __name__ == "__main__":
+    # 打包为exe后，批量校验的进程池需要
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
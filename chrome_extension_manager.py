@@ -1,24 +1,50 @@
-import os
+# 最先导入，以便记录其余模块的导入耗时
+from startup_trace import parse_startup_trace_args
 import sys
-import winreg
-import shutil
-import json
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from pathlib import Path
 import logging
 import re
-import requests
-import time
+import threading
+import queue
+from extension_manager_core import ExtensionManagerCore, EXTENSION_ID_PATTERN
+from keyed_treeview import KeyedTreeview, VirtualTreeview, ROW_FIELDS
+from extension_search_index import ExtensionSearchIndex
+from extension_change_feed import ExtensionChangeFeed, CHANGE_REMOVED
+from extension_path_checker import STATUS_OK
+
+# 后台刷新：轮询间隔（毫秒）和每次轮询处理的消息数
+REFRESH_POLL_MS = 50
+REFRESH_MESSAGES_PER_TICK = 20
+
+# 主线程检查扩展变化队列的间隔（毫秒）
+CHANGE_POLL_MS = 200
+
+# 扩展数量达到该值时使用虚拟列表
+VIRTUAL_LIST_THRESHOLD = 1000
+
+# Treeview 的列：(列名, 标题, 宽度)，顺序与 ROW_FIELDS 一致
+TREE_COLUMNS = (
+    ("名称", "扩展名称", 150),
+    ("ID", "扩展ID", 250),
+    ("路径", "安装路径", 400),
+    ("版本", "版本号", 150),
+    ("状态", "状态", 100),
+    ("来源", "注册位置", 200),
+    ("冲突", "冲突", 300),
+)
 
 # 配置日志
 logging.basicConfig(level=logging.DEBUG,
                    format='%(asctime)s - %(levelname)s - %(message)s',
                    handlers=[logging.StreamHandler()])
 
-class ChromeExtensionManager:
-    def __init__(self, root):
+class ChromeExtensionManager(ExtensionManagerCore):
+    def __init__(self, root, startup_trace=None, virtual_list=None):
+        super().__init__()
         self.root = root
+        self.startup_trace = startup_trace
+        self.virtual_list = virtual_list  # None 表示按扩展数量自动选择
         self.root.title("Chrome扩展管理工具")
         
         # 设置窗口大小和位置
@@ -38,14 +64,6 @@ class ChromeExtensionManager:
         self.style.configure('Treeview', font=('微软雅黑', 10), rowheight=25)
         self.style.configure('Treeview.Heading', font=('微软雅黑', 10, 'bold'))
         
-        # 注册表路径
-        self.reg_path = r"Software\Google\Chrome\Extensions"
-        self.root_key = winreg.HKEY_CURRENT_USER
-        
-        # 缓存文件路径
-        self.cache_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extension_names.json")
-        self.name_cache = self.load_name_cache()
-        
         # 创建主框架
         self.main_frame = ttk.Frame(self.root, padding="20")
         self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -65,64 +83,85 @@ class ChromeExtensionManager:
         ttk.Button(self.button_frame, text="删除选中", command=self.remove_selected, style='TButton').pack(side=tk.LEFT, padx=5)
         ttk.Button(self.button_frame, text="修改选中", command=self.modify_selected, style='TButton').pack(side=tk.LEFT, padx=5)
         ttk.Button(self.button_frame, text="刷新列表", command=self.refresh_list, style='TButton').pack(side=tk.LEFT, padx=5)
-        
-        # 创建Treeview
+        self.cancel_button = ttk.Button(self.button_frame, text="取消刷新", command=self.cancel_refresh, style='TButton', state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
+        # 刷新进度
+        self.progress = ttk.Progressbar(self.button_frame, length=200, mode='determinate')
+        self.progress.pack(side=tk.LEFT, padx=(20, 5))
+        self.status_label = ttk.Label(self.button_frame, text="")
+        self.status_label.pack(side=tk.LEFT, padx=5)
+        self.refresh_queue = None
+        self.refresh_cancel = None
+        
+        # 创建搜索框和Treeview
+        self.search_index = ExtensionSearchIndex()
+        self.create_filter_box()
         self.create_treeview()
         
+        # 关闭窗口时合并名称缓存
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 注册表或CRX文件发生变化时只更新对应的行，第一次刷新完成后开始监视
+        self.change_queue = queue.Queue()
+        self.change_feed = ExtensionChangeFeed(self, self._on_extension_changes)
+        
         # 初始加载扩展列表
         self.refresh_list()
 
-    def load_name_cache(self):
-        """加载名称缓存"""
-        try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"加载缓存文件失败: {str(e)}")
-        return {}
+    def on_close(self):
+        """关闭窗口前停止刷新并合并缓存"""
+        self.change_feed.stop()
+        self.cancel_refresh()
+        self.compact_name_cache()
+        self.root.destroy()
 
-    def save_name_cache(self):
-        """保存名称缓存"""
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.name_cache, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存缓存文件失败: {str(e)}")
+    def create_filter_box(self):
+        """列表上方的搜索框，每次输入都重新过滤"""
+        filter_frame = ttk.Frame(self.main_frame)
+        filter_frame.grid(row=2, column=0, columnspan=2, pady=(0, 10), sticky=(tk.W, tk.E))
+        ttk.Label(filter_frame, text="搜索:").pack(side=tk.LEFT, padx=5)
+        self.filter_text = tk.StringVar()
+        self.filter_text.trace_add('write', lambda *args: self.apply_filter())
+        ttk.Entry(filter_frame, textvariable=self.filter_text, width=50).pack(side=tk.LEFT, padx=5)
+        self.filter_label = ttk.Label(filter_frame, text="")
+        self.filter_label.pack(side=tk.LEFT, padx=5)
+        self.filter_pending = False
 
     def create_treeview(self):
         # 创建Treeview框架
         self.tree_frame = ttk.Frame(self.main_frame)
-        self.tree_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
         self.main_frame.columnconfigure(0, weight=1)
-        self.main_frame.rowconfigure(2, weight=1)
+        self.main_frame.rowconfigure(3, weight=1)
         
         # 创建Treeview和滚动条
-        self.tree = ttk.Treeview(self.tree_frame, columns=("名称", "ID", "路径", "版本", "状态"), show="headings")
+        self.tree = ttk.Treeview(self.tree_frame, columns=tuple(column for column, _, _ in TREE_COLUMNS), show="headings")
         vsb = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self.tree.yview)
         hsb = ttk.Scrollbar(self.tree_frame, orient="horizontal", command=self.tree.xview)
         
         # 配置Treeview
         self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
-        # 设置列标题
-        self.tree.heading("名称", text="扩展名称")
-        self.tree.heading("ID", text="扩展ID")
-        self.tree.heading("路径", text="安装路径")
-        self.tree.heading("版本", text="版本号")
-        self.tree.heading("状态", text="状态")
-        
-        # 设置列宽
-        self.tree.column("名称", width=150, anchor=tk.W)
-        self.tree.column("ID", width=250, anchor=tk.W)
-        self.tree.column("路径", width=400, anchor=tk.W)
-        self.tree.column("版本", width=150, anchor=tk.W)
-        self.tree.column("状态", width=100, anchor=tk.W)
+        # 设置列标题和列宽，点击标题按该列排序
+        for (column, heading, width), field in zip(TREE_COLUMNS, ROW_FIELDS):
+            self.tree.heading(column, text=heading, command=lambda field=field: self.sort_by(field))
+            self.tree.column(column, width=width, anchor=tk.W)
         
         # 设置交替行颜色
         self.tree.tag_configure('oddrow', background='#f0f0f0')
         self.tree.tag_configure('evenrow', background='#ffffff')
         
+        if self.virtual_list is None:
+            self.virtual_list = self.count_registry_extensions() >= VIRTUAL_LIST_THRESHOLD
+        if self.virtual_list:
+            # 扩展很多时只创建可见的行，滚动由虚拟列表处理
+            self.tree.configure(yscrollcommand="")
+            self.view = VirtualTreeview(self.tree, vsb)
+        else:
+            # 以扩展ID为键维护行，刷新时只更新有变化的行
+            self.view = KeyedTreeview(self.tree)
+        
         # 放置组件
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         vsb.grid(row=0, column=1, sticky=(tk.N, tk.S))
@@ -132,203 +171,227 @@ class ChromeExtensionManager:
         self.tree_frame.columnconfigure(0, weight=1)
         self.tree_frame.rowconfigure(0, weight=1)
 
-    def find_extension_id_in_name(self, name):
-        """从名称中查找32位连续字母作为扩展ID"""
-        matches = re.findall(r'[a-zA-Z]{32}', name)
-        return matches[0].lower() if matches else ""
+    def count_registry_extensions(self):
+        """所有注册位置中的扩展数量，扩展项只枚举键名"""
+        return self.scanner.count()
 
-    def get_extension_name_from_store(self, extension_id):
-        """从扩展商店获取扩展名称"""
-        try:
-            # 首先尝试从crxsoso.com获取
-            url = f"https://www.crxsoso.com/webstore/detail/{extension_id}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                # 从页面中提取扩展名称，使用新的HTML结构
-                match = re.search(r'<div[^>]*class="name el2"[^>]*>(.*?)<!---->', response.text, re.DOTALL)
-                if match:
-                    name = match.group(1).strip()
-                    if name:
-                        print(f"√ 从crxsoso.com获取到名称: {name}")
-                        return name
-                
-                # 如果上面的正则没匹配到，尝试其他可能的模式
-                match = re.search(r'<div[^>]*class="name el2"[^>]*>(.*?)</div>', response.text, re.DOTALL)
-                if match:
-                    name = match.group(1).strip()
-                    if name:
-                        print(f"√ 从crxsoso.com获取到名称: {name}")
-                        return name
-            
-            # 如果从crxsoso.com获取失败，尝试从Chrome Web Store获取
-            # 首先获取重定向后的URL
-            url = f"https://chrome.google.com/webstore/detail/{extension_id}"
-            response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
-            
-            if response.status_code == 200:
-                # 从URL中提取扩展名称
-                final_url = response.url
-                if '/detail/' in final_url:
-                    parts = final_url.split('/detail/')
-                    if len(parts) > 1:
-                        name_part = parts[1].split('/')[0]
-                        if name_part and name_part != extension_id:
-                            name = name_part.replace('-', ' ').title()
-                            print(f"√ 从Chrome Web Store URL获取到名称: {name}")
-                            return name
-                
-                # 如果无法从URL获取，尝试从页面内容获取
-                match = re.search(r'<h1 class="e-f-w">(.*?)</h1>', response.text)
-                if match:
-                    name = match.group(1).strip()
-                    if name:
-                        print(f"√ 从Chrome Web Store页面获取到名称: {name}")
-                        return name
-        except Exception as e:
-            print(f"从扩展商店获取名称失败: {str(e)}")
-        return ""
+    def apply_filter(self):
+        """按搜索框的内容过滤列表，搜索词之间为“并且”关系"""
+        self.filter_pending = False
+        matched = self.search_index.search(self.filter_text.get())
+        self.view.set_filter(matched)
+        if matched is None:
+            self.filter_label.configure(text="")
+        else:
+            self.filter_label.configure(text=f"显示 {len(matched)} / {len(self.view)}")
+
+    def _upsert_row(self, ext, index=None):
+        """更新一行，同时更新搜索索引"""
+        self.view.upsert(ext, index)
+        self.search_index.update(ext)
+        self.filter_pending = self.view.filter_ids is not None
 
-    def get_extension_name_from_manifest(self, extension_path):
-        """从扩展的manifest.json中读取名称（不再使用此方法获取名称）"""
-        return ""
+    def _set_row_field(self, extension_id, field, value):
+        self.view.set_field(extension_id, field, value)
+        self.search_index.set_field(extension_id, field, value)
+        self.filter_pending = self.view.filter_ids is not None
 
-    def get_crx_info(self, crx_path):
-        """从CRX文件中读取扩展信息"""
+    def _remove_rows(self, extension_ids):
+        self.view.remove(extension_ids)
+        for extension_id in extension_ids:
+            self.search_index.remove(extension_id)
+        self.filter_pending = self.view.filter_ids is not None
+
+    def sort_by(self, field):
+        """按某一列排序，再次点击同一列时倒序"""
+        reverse = self.view.sort_field == field and not self.view.sort_reverse
+        self.view.sort(field, reverse)
+        for (column, heading, _), column_field in zip(TREE_COLUMNS, ROW_FIELDS):
+            arrow = (" ▼" if reverse else " ▲") if column_field == field else ""
+            self.tree.heading(column, text=heading + arrow)
+
+    def refresh_list(self):
+        """在后台线程中刷新扩展列表，扫描结果分批显示"""
+        # 取消尚未完成的刷新
+        self.cancel_refresh()
+        
+        self.refresh_cancel = threading.Event()
+        self.refresh_queue = queue.Queue()
+        self.refresh_count = 0
+        self.refresh_seen = set()
+        
+        self.progress.configure(mode='indeterminate', value=0)
+        self.progress.start(10)
+        self.status_label.configure(text="正在扫描注册表...")
+        self.cancel_button.configure(state=tk.NORMAL)
+        
+        worker = threading.Thread(target=self._refresh_worker,
+                                  args=(self.refresh_queue, self.refresh_cancel), daemon=True)
+        worker.start()
+        self.root.after(REFRESH_POLL_MS, self._process_refresh_queue, self.refresh_queue)
+
+    def cancel_refresh(self):
+        """取消正在进行的刷新，已显示的行保留"""
+        if self.refresh_queue is None:
+            return
+        self.refresh_cancel.set()
+        self.refresh_queue = None
+        self._finish_refresh(f"已取消，显示 {self.refresh_count} 个扩展")
+
+    def _refresh_worker(self, refresh_queue, cancel_event):
+        """后台线程：扫描注册表并获取名称，结果通过队列交给主线程"""
         try:
-            import zipfile
-            import json
-            
-            # 从文件名中提取ID
-            file_name = os.path.basename(crx_path)
-            name_without_ext = os.path.splitext(file_name)[0]
-            
-            print(f"\n检查文件名: {name_without_ext}")
-            
-            extension_id = self.find_extension_id_in_name(name_without_ext)
-            version = ""
-            name = ""
-            
-            # 如果找到了32位连续字母
-            if extension_id:
-                print(f"√ 从文件名提取到扩展ID: {extension_id}")
-                
-                # 首先使用缓存中的名称
-                cached_name = self.name_cache.get(extension_id)
-                if cached_name:
-                    name = cached_name
-                    print(f"√ 使用缓存中的名称: {cached_name}")
-                
-                # 尝试从CRX文件中读取版本号
-                try:
-                    with zipfile.ZipFile(crx_path) as zip_ref:
-                        try:
-                            manifest_data = zip_ref.read('manifest.json')
-                            manifest = json.loads(manifest_data.decode('utf-8'))
-                            version = manifest.get('version', '')
-                            if version:
-                                print(f"√ 从manifest.json读取到版本号: {version}")
-                        except Exception as e:
-                            print(f"读取manifest.json失败: {str(e)}")
-                except Exception as e:
-                    print(f"打开CRX文件失败: {str(e)}")
-                
-                # 如果缓存中没有名称，尝试从扩展商店获取
-                if not name:
-                    name = self.get_extension_name_from_store(extension_id)
-            else:
-                print("× 文件名中未找到32位连续字母作为扩展ID")
-            
-            return extension_id, version, name
-            
+            extensions, unresolved = self.scan_registry_extensions(
+                on_batch=lambda batch: refresh_queue.put(("rows", list(batch))),
+                cancel_event=cancel_event
+            )
+            refresh_queue.put(("resolving", len(unresolved)))
+            self.resolve_missing_names(
+                unresolved,
+                on_name=lambda ext_info: refresh_queue.put(("name", ext_info["id"], ext_info["name"])),
+                cancel_event=cancel_event
+            )
+            if not cancel_event.is_set():
+                # 过期的商店名称在后台更新，下次刷新时生效
+                self.refresh_stale_names()
         except Exception as e:
-            print(f"处理CRX文件失败: {str(e)}")
-            return "", "", ""
+            print(f"刷新扩展列表失败: {str(e)}")
+        finally:
+            refresh_queue.put(("done",))
 
-    def get_registry_extensions(self):
-        extensions = []
+    def _process_refresh_queue(self, refresh_queue):
+        """主线程：从队列中取出扫描结果更新Treeview"""
+        if refresh_queue is not self.refresh_queue:
+            return
         
-        try:
-            # 打开Chrome扩展注册表路径
-            with winreg.OpenKey(self.root_key, self.reg_path, 0, winreg.KEY_READ) as main_key:
-                # 枚举所有子键（扩展ID）
-                i = 0
-                while True:
-                    try:
-                        extension_id = winreg.EnumKey(main_key, i)
-                        # 打开扩展的子键
-                        with winreg.OpenKey(main_key, extension_id) as ext_key:
-                            ext_info = {
-                                "name": "",  # 初始化为空
-                                "id": extension_id,
-                                "path": "",
-                                "version": "",
-                                "status": "正常"
-                            }
-                            
-                            # 读取所有可能的值
-                            try:
-                                ext_info["path"] = winreg.QueryValueEx(ext_key, "path")[0]
-                            except WindowsError:
-                                pass
-                                
-                            try:
-                                ext_info["version"] = winreg.QueryValueEx(ext_key, "version")[0]
-                            except WindowsError:
-                                pass
-                            
-                            # 检查文件是否存在
-                            if ext_info["path"] and os.path.exists(ext_info["path"]):
-                                # 首先使用缓存中的名称
-                                cached_name = self.name_cache.get(extension_id)
-                                if cached_name:
-                                    ext_info["name"] = cached_name
-                                    print(f"√ 使用缓存中的名称: {cached_name}")
-                                else:
-                                    # 如果缓存中没有，尝试从扩展商店获取
-                                    name = self.get_extension_name_from_store(extension_id)
-                                    if name:
-                                        ext_info["name"] = name
-                                    else:
-                                        # 如果无法从扩展商店获取，则从manifest.json中读取
-                                        name = self.get_extension_name_from_manifest(ext_info["path"])
-                                        if name:
-                                            ext_info["name"] = name
-                                        else:
-                                            # 最后才使用扩展ID作为名称
-                                            ext_info["name"] = extension_id
-                            else:
-                                ext_info["status"] = "文件缺失"
-                                # 如果文件不存在，使用缓存中的名称或扩展ID
-                                ext_info["name"] = self.name_cache.get(extension_id, extension_id)
-                            
-                            extensions.append(ext_info)
-                        i += 1
-                    except WindowsError:
-                        break
-        except WindowsError as e:
-            print(f"访问注册表失败: {str(e)}")
-        
-        return extensions
+        for _ in range(REFRESH_MESSAGES_PER_TICK):
+            try:
+                message = refresh_queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            kind = message[0]
+            if kind == "rows":
+                for ext in message[1]:
+                    self._upsert_row(ext, self.refresh_count)
+                    self.refresh_seen.add(ext["id"])
+                    self.refresh_count += 1
+                self.view.retag()
+                self.status_label.configure(text=f"已扫描 {self.refresh_count} 个扩展...")
+                if self.startup_trace and self.startup_trace.elapsed_ms("first_paint") is None:
+                    # 立即绘制，记录第一批扩展显示出来的时间
+                    self.root.update_idletasks()
+                    self.startup_trace.mark("first_paint")
+            elif kind == "resolving":
+                self.progress.stop()
+                self.progress.configure(mode='determinate', maximum=max(message[1], 1), value=0)
+                if message[1]:
+                    self.status_label.configure(text=f"正在获取 {message[1]} 个扩展名称...")
+            elif kind == "name":
+                _, extension_id, name = message
+                self._set_row_field(extension_id, "name", name)
+                self.progress.step(1)
+            elif kind == "done":
+                # 删除注册表中已不存在的扩展
+                self._remove_rows([extension_id for extension_id in self.view.order
+                                   if extension_id not in self.refresh_seen])
+                if self.view.sort_field:
+                    # 扫描结果按注册表顺序插入，完成后恢复当前的排序
+                    self.view.sort(self.view.sort_field, self.view.sort_reverse)
+                if self.filter_pending:
+                    self.apply_filter()
+                self.view.retag()
+                self.refresh_queue = None
+                self._finish_refresh(f"共 {self.refresh_count} 个扩展")
+                if not self.change_feed.running:
+                    self.change_feed.start()
+                    self.root.after(CHANGE_POLL_MS, self._process_change_queue)
+                if self.startup_trace and not self.startup_trace.reported:
+                    if self.startup_trace.elapsed_ms("first_paint") is None:
+                        # 注册表中没有扩展，以空列表显示的时间为准
+                        self.root.update_idletasks()
+                        self.startup_trace.mark("first_paint")
+                    self.startup_trace.mark("refresh_done")
+                    self.startup_trace.report()
+                return
+        
+        if self.filter_pending:
+            # 每次轮询只重新过滤一次，新扫描到的扩展匹配时才显示
+            self.apply_filter()
+        self.root.after(REFRESH_POLL_MS, self._process_refresh_queue, refresh_queue)
 
-    def refresh_list(self):
-        # 清空现有项目
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # 获取并显示扩展列表
-        extensions = self.get_registry_extensions()
-        for i, ext in enumerate(extensions):
-            tag = 'oddrow' if i % 2 == 0 else 'evenrow'
-            self.tree.insert("", tk.END, values=(
-                ext["name"],
-                ext["id"],
-                ext["path"],
-                ext["version"],
-                ext["status"]
-            ), tags=(tag,))
+    def _finish_refresh(self, status_text):
+        self.progress.stop()
+        self.progress.configure(mode='determinate', value=0)
+        self.status_label.configure(text=status_text)
+        self.cancel_button.configure(state=tk.DISABLED)
+
+    def _on_extension_changes(self, changes):
+        """后台线程：读取发生变化的扩展并获取缺少的名称，结果通过队列交给主线程"""
+        updated = []
+        removed = []
+        for extension_id, change in changes.items():
+            ext_info = None if change == CHANGE_REMOVED else self.get_registry_extension(extension_id)
+            if ext_info is None:
+                removed.append(extension_id)
+            else:
+                updated.append(ext_info)
+        self.change_queue.put(("rows", updated, removed))
+        
+        unresolved = [ext_info for ext_info in updated
+                      if ext_info["status"] == STATUS_OK and not self.name_cache.get(ext_info["id"])]
+        self.resolve_missing_names(
+            unresolved,
+            on_name=lambda ext_info: self.change_queue.put(("name", ext_info["id"], ext_info["name"]))
+        )
+
+    def _process_change_queue(self):
+        """主线程：应用变化监视发现的修改"""
+        changed = False
+        while True:
+            try:
+                message = self.change_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "rows":
+                _, updated, removed = message
+                added = False
+                for ext_info in updated:
+                    added = added or ext_info["id"] not in self.view
+                    self._upsert_row(ext_info)
+                self._remove_rows(removed)
+                if added and self.view.sort_field:
+                    self.view.sort(self.view.sort_field, self.view.sort_reverse)
+                self.status_label.configure(text=f"{len(updated) + len(removed)} 个扩展已变化，共 {len(self.view)} 个扩展")
+            elif message[0] == "name":
+                _, extension_id, name = message
+                self._set_row_field(extension_id, "name", name)
+            changed = True
+        
+        if changed:
+            if self.filter_pending:
+                self.apply_filter()
+            self.view.retag()
+        if self.change_feed.running:
+            self.root.after(CHANGE_POLL_MS, self._process_change_queue)
+
+    def refresh_extension(self, extension_id):
+        """重新读取单个扩展并只更新它所在的行"""
+        ext_info = self.get_registry_extension(extension_id)
+        if ext_info is None:
+            self._remove_rows([extension_id])
+        else:
+            self._upsert_row(ext_info)
+        if self.filter_pending:
+            self.apply_filter()
+        self.view.retag()
+
+    def warn_invalid_crx(self, crx_path):
+        """CRX文件签名或内容校验失败时提示，不阻止继续添加"""
+        check = self.verify_crx(crx_path)
+        if not check["valid"]:
+            messagebox.showwarning("CRX校验失败",
+                                   "文件可能已损坏或被篡改，Chrome 可能拒绝安装：\n" + "\n".join(check["errors"]))
 
     def add_extension(self):
         # 创建添加扩展对话框
@@ -367,6 +430,7 @@ class ChromeExtensionManager:
                 path_entry.insert(0, file_path)
                 # 自动读取扩展信息
                 extension_id, version, name = self.get_crx_info(file_path)
+                self.warn_invalid_crx(file_path)
                 if extension_id:
                     id_entry.delete(0, tk.END)
                     id_entry.insert(0, extension_id)
@@ -390,34 +454,21 @@ class ChromeExtensionManager:
         def save_extension():
             try:
                 # 验证ID格式
-                if not re.match(r'^[a-zA-Z]{32}$', id_entry.get()):
+                if not re.match(EXTENSION_ID_PATTERN, id_entry.get()):
                     messagebox.showerror("错误", "扩展ID格式不正确，必须是32位字母")
                     return
                 
-                # 创建扩展注册表项
-                ext_key = winreg.CreateKeyEx(
-                    self.root_key,
-                    f"{self.reg_path}\\{id_entry.get().lower()}",  # 确保ID是小写
-                    0,
-                    winreg.KEY_WRITE
-                )
-                
-                # 设置值
-                if path_entry.get():
-                    winreg.SetValueEx(ext_key, "path", 0, winreg.REG_SZ, path_entry.get())
-                if version_entry.get():
-                    winreg.SetValueEx(ext_key, "version", 0, winreg.REG_SZ, version_entry.get())
-                
-                winreg.CloseKey(ext_key)
+                # 创建扩展注册表项并设置值（确保ID是小写）
+                self.write_extension(id_entry.get().lower(), path_entry.get(), version_entry.get())
                 
                 # 保存名称到缓存
                 if name_entry.get():
-                    self.name_cache[id_entry.get()] = name_entry.get()
+                    self.name_cache[id_entry.get().lower()] = name_entry.get()
                     self.save_name_cache()
                 
                 messagebox.showinfo("成功", "扩展已成功添加！")
                 dialog.destroy()
-                self.refresh_list()
+                self.refresh_extension(id_entry.get().lower())
                 
             except Exception as e:
                 messagebox.showerror("错误", f"添加扩展失败: {str(e)}")
@@ -426,13 +477,13 @@ class ChromeExtensionManager:
         ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
 
     def modify_selected(self):
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_ids = self.view.selection()
+        if not selected_ids:
             messagebox.showwarning("警告", "请先选择要修改的扩展")
             return
         
         # 获取选中项的值
-        values = self.tree.item(selected_items[0])["values"]
+        values = self.view.get_values(selected_ids[0])
         
         # 创建修改对话框
         dialog = tk.Toplevel(self.root)
@@ -474,6 +525,7 @@ class ChromeExtensionManager:
                 path_entry.insert(0, file_path)
                 # 自动读取扩展信息
                 _, version, name = self.get_crx_info(file_path)
+                self.warn_invalid_crx(file_path)
                 if version:
                     version_entry.delete(0, tk.END)
                     version_entry.insert(0, version)
@@ -494,21 +546,8 @@ class ChromeExtensionManager:
         
         def save_changes():
             try:
-                # 打开扩展注册表项
-                ext_key = winreg.OpenKey(
-                    self.root_key,
-                    f"{self.reg_path}\\{id_entry.get()}",
-                    0,
-                    winreg.KEY_WRITE
-                )
-                
-                # 更新值
-                if path_entry.get():
-                    winreg.SetValueEx(ext_key, "path", 0, winreg.REG_SZ, path_entry.get())
-                if version_entry.get():
-                    winreg.SetValueEx(ext_key, "version", 0, winreg.REG_SZ, version_entry.get())
-                
-                winreg.CloseKey(ext_key)
+                # 更新扩展注册表项中的值
+                self.write_extension(id_entry.get(), path_entry.get(), version_entry.get())
                 
                 # 更新名称缓存
                 new_name = name_entry.get()
@@ -517,13 +556,7 @@ class ChromeExtensionManager:
                     self.save_name_cache()
                 
                 # 更新Treeview中的显示
-                self.tree.item(selected_items[0], values=(
-                    new_name,  # 更新名称
-                    values[1],  # ID保持不变
-                    path_entry.get(),
-                    version_entry.get(),
-                    values[4]  # 状态保持不变
-                ))
+                self.refresh_extension(id_entry.get())
                 
                 messagebox.showinfo("成功", "扩展信息已更新！")
                 dialog.destroy()
@@ -535,41 +568,55 @@ class ChromeExtensionManager:
         ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
 
     def remove_selected(self):
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_ids = self.view.selection()
+        if not selected_ids:
             messagebox.showwarning("警告", "请先选择要删除的扩展")
             return
             
         if not messagebox.askyesno("确认", "确定要删除选中的扩展吗？"):
             return
             
-        for item in selected_items:
-            values = self.tree.item(item)["values"]
-            extension_id = values[1]
+        removed_ids = []
+        for extension_id in selected_ids:
             
             try:
                 # 删除注册表项
                 try:
-                    winreg.DeleteKey(self.root_key, f"{self.reg_path}\\{extension_id}")
+                    self.delete_extension(extension_id)
                     print(f"删除注册表项成功: {extension_id}")
-                except WindowsError as e:
+                    removed_ids.append(extension_id)
+                except OSError as e:
                     print(f"删除注册表项失败: {str(e)}")
                     continue
                 
                 # 从缓存中删除名称
                 if extension_id in self.name_cache:
                     del self.name_cache[extension_id]
-                    self.save_name_cache()
                 
             except Exception as e:
                 messagebox.showerror("错误", f"删除扩展 {extension_id} 失败: {str(e)}")
         
+        # 所有删除合并为一次缓存写入
+        self.save_name_cache()
+        
+        # 只删除对应的行
+        self._remove_rows(removed_ids)
+        if self.filter_pending:
+            self.apply_filter()
+        self.view.retag()
         messagebox.showinfo("成功", "已删除选中的扩展")
-        self.refresh_list()
 
 def main():
+    # --startup-trace[=文件]：输出导入耗时和首次显示扩展列表的耗时
+    startup_trace, sys.argv[1:] = parse_startup_trace_args(sys.argv[1:])
+    if startup_trace:
+        startup_trace.mark("imports")
+    # --virtual-list：无论扩展数量多少都使用虚拟列表
+    virtual_list = True if "--virtual-list" in sys.argv[1:] else None
     root = tk.Tk()
-    app = ChromeExtensionManager(root)
+    app = ChromeExtensionManager(root, startup_trace, virtual_list)
+    if startup_trace:
+        startup_trace.mark("window")
     root.mainloop()
 
 if __name__ == "__main__":
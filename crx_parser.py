@@ -0,0 +1,317 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+
+CRX_MAGIC = b"Cr24"
+
+# CRX3 文件头（protobuf CrxFileHeader）中的字段编号
+CRX3_SHA256_WITH_RSA = 2
+CRX3_SHA256_WITH_ECDSA = 3
+CRX3_SIGNED_HEADER_DATA = 10000
+# AsymmetricKeyProof / SignedData 中的字段编号
+PROOF_PUBLIC_KEY = 1
+PROOF_SIGNATURE = 2
+SIGNED_DATA_CRX_ID = 1
+
+# ZIP 结构签名
+ZIP_LOCAL_HEADER = b"PK\x03\x04"
+ZIP_CENTRAL_HEADER = b"PK\x01\x02"
+ZIP_END_OF_CENTRAL_DIR = b"PK\x05\x06"
+ZIP_EOCD_SIZE = 22
+ZIP_MAX_COMMENT = 0xFFFF
+
+# 检查ZIP内容时每次读取的压缩数据大小
+ZIP_CHECK_CHUNK_SIZE = 1024 * 1024
+
+
+class CrxError(Exception):
+    """CRX文件格式错误"""
+
+
+def extension_id_from_public_key(public_key):
+    """由公钥计算扩展ID：SHA-256 的前16字节，每个十六进制位映射为 a-p"""
+    return extension_id_from_crx_id(hashlib.sha256(public_key).digest()[:16])
+
+
+def extension_id_from_crx_id(crx_id):
+    return "".join(chr(ord('a') + int(c, 16)) for c in crx_id.hex())
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise CrxError("protobuf varint 被截断")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def parse_protobuf(data):
+    """解析 protobuf 消息，返回 [(字段编号, 值)]，只保留 varint 和长度前缀字段"""
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        field_number, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = bytes(data[pos:pos + length]), pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise CrxError(f"不支持的 protobuf 字段类型: {wire_type}")
+        if pos > len(data):
+            raise CrxError("protobuf 消息被截断")
+        fields.append((field_number, value))
+    return fields
+
+
+class CrxFile:
+    """流式读取CRX文件
+
+    只读取文件头和ZIP中需要的部分，可用时通过mmap访问文件。
+    用法：
+        with CrxFile(path) as crx:
+            crx.extension_id, crx.manifest()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.crx_version = 0
+        self.header_size = 0
+        self.payload_offset = 0
+        self.public_key = b""
+        self.signature = b""
+        self.proofs = []          # CRX3: [(算法, 公钥, 签名)]
+        self.crx_id = b""         # CRX3 签名数据中声明的ID
+        self.signed_header_data = b""
+        self.extension_id = ""
+        self._file = open(path, 'rb')
+        self._map = None
+        self._entries = None
+        self._zip_base = 0
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # 空文件或不支持mmap的文件系统，退回普通读取
+                self._map = None
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def read_at(self, offset, size):
+        """读取文件中指定位置的字节"""
+        if offset < 0 or offset + size > self.size:
+            raise CrxError(f"读取越界: {offset}+{size} > {self.size}")
+        if self._map is not None:
+            return self._map[offset:offset + size]
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def _parse_header(self):
+        magic, version = struct.unpack("<4sI", self.read_at(0, 8))
+        if magic != CRX_MAGIC:
+            raise CrxError("不是有效的CRX文件（文件头不是 Cr24）")
+        self.crx_version = version
+
+        if version == 2:
+            key_length, signature_length = struct.unpack("<II", self.read_at(8, 8))
+            self.public_key = self.read_at(16, key_length)
+            self.signature = self.read_at(16 + key_length, signature_length)
+            self.header_size = key_length + signature_length
+            self.payload_offset = 16 + self.header_size
+            self.extension_id = extension_id_from_public_key(self.public_key)
+        elif version == 3:
+            (self.header_size,) = struct.unpack("<I", self.read_at(8, 4))
+            self.payload_offset = 12 + self.header_size
+            self._parse_crx3_header(self.read_at(12, self.header_size))
+        else:
+            raise CrxError(f"不支持的CRX版本: {version}")
+
+    def _parse_crx3_header(self, header):
+        for field_number, value in parse_protobuf(header):
+            if field_number in (CRX3_SHA256_WITH_RSA, CRX3_SHA256_WITH_ECDSA):
+                proof = dict(parse_protobuf(value))
+                algorithm = "rsa" if field_number == CRX3_SHA256_WITH_RSA else "ecdsa"
+                self.proofs.append((algorithm, proof.get(PROOF_PUBLIC_KEY, b""),
+                                    proof.get(PROOF_SIGNATURE, b"")))
+            elif field_number == CRX3_SIGNED_HEADER_DATA:
+                self.signed_header_data = value
+                self.crx_id = dict(parse_protobuf(value)).get(SIGNED_DATA_CRX_ID, b"")
+
+        if not self.proofs:
+            raise CrxError("CRX3文件头中没有公钥")
+        # 扩展ID由开发者公钥决定，即哈希前16字节与 crx_id 一致的公钥。
+        # 扩展商店的发布者签名也带有RSA公钥，不能用来推测扩展ID
+        if self.crx_id:
+            for _, public_key, signature in self.proofs:
+                if hashlib.sha256(public_key).digest()[:16] == self.crx_id:
+                    self.public_key = public_key
+                    self.signature = signature
+                    break
+            else:
+                raise CrxError(f"没有与扩展ID {extension_id_from_crx_id(self.crx_id)} 对应的签名公钥")
+        elif len(self.proofs) == 1:
+            # 没有声明ID时只有唯一的公钥才能确定扩展ID
+            _, self.public_key, self.signature = self.proofs[0]
+        else:
+            raise CrxError("CRX3文件头中没有扩展ID，无法确定开发者公钥")
+        self.extension_id = extension_id_from_public_key(self.public_key)
+
+    def _load_central_directory(self):
+        """从ZIP末尾的目录结束记录定位中央目录"""
+        tail_size = min(self.size - self.payload_offset, ZIP_EOCD_SIZE + ZIP_MAX_COMMENT)
+        tail_offset = self.size - tail_size
+        tail = self.read_at(tail_offset, tail_size)
+        eocd = tail.rfind(ZIP_END_OF_CENTRAL_DIR)
+        if eocd < 0 or eocd + ZIP_EOCD_SIZE > len(tail):
+            raise CrxError("未找到ZIP目录结束记录")
+        (_, _, _, _, entry_count, directory_size,
+         directory_offset, _) = struct.unpack("<4sHHHHIIH", tail[eocd:eocd + ZIP_EOCD_SIZE])
+        if directory_offset == 0xFFFFFFFF or entry_count == 0xFFFF:
+            raise CrxError("不支持ZIP64格式")
+
+        # 中央目录紧挨目录结束记录，据此推算ZIP偏移量的基准位置
+        directory_start = tail_offset + eocd - directory_size
+        self._zip_base = directory_start - directory_offset
+        if self._zip_base < 0:
+            raise CrxError("ZIP中央目录位置无效")
+        directory = self.read_at(directory_start, directory_size)
+        entries = {}
+        pos = 0
+        for _ in range(entry_count):
+            if directory[pos:pos + 4] != ZIP_CENTRAL_HEADER or pos + 46 > len(directory):
+                raise CrxError("ZIP中央目录损坏")
+            (method, crc, compressed_size, size, name_length, extra_length,
+             comment_length, local_offset) = struct.unpack(
+                "<6xH4xIIIHHH8xI", directory[pos + 4:pos + 46])
+            name = directory[pos + 46:pos + 46 + name_length].decode('utf-8', 'replace')
+            entries[name] = (method, crc, compressed_size, size, local_offset)
+            pos += 46 + name_length + extra_length + comment_length
+        self._entries = entries
+
+    def namelist(self):
+        if self._entries is None:
+            self._load_central_directory()
+        return list(self._entries)
+
+    @property
+    def zip_offset(self):
+        """ZIP数据在CRX文件中的实际起始位置，正常的CRX文件等于 payload_offset"""
+        if self._entries is None:
+            self._load_central_directory()
+        return self._zip_base
+
+    def _data_offset(self, name):
+        """ZIP中一个文件的压缩数据在CRX文件中的位置"""
+        method, crc, compressed_size, size, local_offset = self._entries[name]
+        header_offset = self._zip_base + local_offset
+        local_header = self.read_at(header_offset, 30)
+        if local_header[:4] != ZIP_LOCAL_HEADER:
+            raise CrxError(f"ZIP本地文件头损坏: {name}")
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        return header_offset + 30 + name_length + extra_length
+
+    def read(self, name):
+        """读取ZIP中的一个文件，检查长度和CRC"""
+        if self._entries is None:
+            self._load_central_directory()
+        if name not in self._entries:
+            raise KeyError(name)
+        method, crc, compressed_size, size, _ = self._entries[name]
+        data = self.read_at(self._data_offset(name), compressed_size)
+
+        if method == 0:
+            content = bytes(data)
+        elif method == 8:
+            try:
+                content = zlib.decompress(data, -15)
+            except zlib.error as e:
+                raise CrxError(f"解压失败: {name}: {e}")
+        else:
+            raise CrxError(f"不支持的压缩方式: {method}")
+        if len(content) != size:
+            raise CrxError(f"文件长度不符: {name}")
+        if zlib.crc32(content) != crc:
+            raise CrxError(f"CRC校验失败: {name}")
+        return content
+
+    def check_entry(self, name):
+        """分块解压ZIP中的一个文件并检查长度和CRC，不把整个文件读入内存"""
+        if self._entries is None:
+            self._load_central_directory()
+        method, crc, compressed_size, size, _ = self._entries[name]
+        if method not in (0, 8):
+            raise CrxError(f"不支持的压缩方式: {method}")
+        offset = self._data_offset(name)
+        decompressor = zlib.decompressobj(-15) if method == 8 else None
+        actual_crc = 0
+        actual_size = 0
+        for start in range(0, compressed_size, ZIP_CHECK_CHUNK_SIZE):
+            chunk = self.read_at(offset + start, min(ZIP_CHECK_CHUNK_SIZE, compressed_size - start))
+            if decompressor is not None:
+                try:
+                    chunk = decompressor.decompress(chunk)
+                except zlib.error as e:
+                    raise CrxError(f"解压失败: {name}: {e}")
+            actual_crc = zlib.crc32(chunk, actual_crc)
+            actual_size += len(chunk)
+        if decompressor is not None:
+            if not decompressor.eof:
+                raise CrxError(f"压缩数据不完整: {name}")
+            tail = decompressor.flush()
+            actual_crc = zlib.crc32(tail, actual_crc)
+            actual_size += len(tail)
+        if actual_size != size:
+            raise CrxError(f"文件长度不符: {name}")
+        if actual_crc != crc:
+            raise CrxError(f"CRC校验失败: {name}")
+
+    def check_entries(self):
+        """检查ZIP中所有文件的长度和CRC，返回错误信息列表"""
+        errors = []
+        for name in self.namelist():
+            try:
+                self.check_entry(name)
+            except CrxError as e:
+                errors.append(str(e))
+        return errors
+
+    def manifest(self):
+        """读取并解析 manifest.json"""
+        return json.loads(self.read('manifest.json').decode('utf-8-sig'))
+
+
+def parse_crx(crx_path):
+    """读取CRX文件，返回 (扩展ID, manifest字典)"""
+    with CrxFile(crx_path) as crx:
+        return crx.extension_id, crx.manifest()
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """分块计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _same_file(path_a, path_b):
+    try:
+        return os.path.samefile(path_a, path_b)
+    except OSError:
+        return False
+
+
+class CrxStore:
+    """按SHA-256内容寻址的CRX文件仓库
+
+    相同内容只保存一份（store/blobs/ab/abcd...crx），安装位置的文件尽量
+    以硬链接指向仓库中的文件，无法硬链接时才复制。所有写入都先写临时文件
+    再重命名，中途失败不会留下不完整的文件。
+    批量安装时在 batch() 中调用 place()，引用记录只在结束时写入一次。
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.blob_dir = os.path.join(root_dir, "blobs")
+        self.refs_file = os.path.join(root_dir, "refs.json")
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._batch_depth = 0
+        self._refs_dirty = False
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.refs = self._load_refs()  # 安装位置 -> 内容哈希
+
+    def _load_refs(self):
+        try:
+            with open(self.refs_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_refs(self):
+        # 串行写入，避免较旧的快照覆盖较新的
+        with self._save_lock:
+            with self._lock:
+                data = dict(self.refs)
+            self._atomic_write_text(self.refs_file, json.dumps(data, ensure_ascii=False))
+
+    @contextmanager
+    def batch(self):
+        """在其中调用的 place() 不立即写入 refs.json，退出时（包括出错时）写入一次"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                save = self._batch_depth == 0 and self._refs_dirty
+            if save:
+                self.save_refs()
+
+    def save_refs(self):
+        """写入引用记录"""
+        with self._lock:
+            self._refs_dirty = False
+        self._save_refs()
+
+    @staticmethod
+    def _atomic_write_text(path, text):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def _atomic_place(src_path, dest_path, prefer_link=True):
+        """把 src_path 以硬链接（或复制）的方式原子地放到 dest_path，返回是否为硬链接"""
+        dest_dir = os.path.dirname(dest_path)
+        fd, temp_path = tempfile.mkstemp(dir=dest_dir, suffix=".tmp")
+        os.close(fd)
+        os.remove(temp_path)
+        try:
+            linked = False
+            if prefer_link:
+                try:
+                    os.link(src_path, temp_path)
+                    linked = True
+                except OSError:
+                    # 跨文件系统或文件系统不支持硬链接
+                    linked = False
+            if not linked:
+                shutil.copy2(src_path, temp_path)
+            os.replace(temp_path, dest_path)
+            return linked
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.crx")
+
+    def put(self, src_path, digest=None):
+        """把文件加入仓库，内容已存在时跳过，返回 (哈希, 仓库中的路径)"""
+        digest = digest or hash_file(src_path)
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            self._atomic_place(src_path, blob, prefer_link=False)
+        return digest, blob
+
+    def place(self, src_path, dest_path):
+        """把CRX文件安装到 dest_path
+
+        内容与已安装的文件相同时不做任何写入。返回 (哈希, 是否写入了文件)。
+        """
+        digest = hash_file(src_path)
+        ref_key = normalize_path(dest_path)
+        with self._lock:
+            known_digest = self.refs.get(ref_key)
+        if known_digest == digest and _same_file(dest_path, self.blob_path(digest)):
+            return digest, False
+
+        _, blob = self.put(src_path, digest)
+        if os.path.exists(dest_path) and (_same_file(dest_path, blob) or hash_file(dest_path) == digest):
+            written = False
+        else:
+            os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+            self._atomic_place(blob, dest_path)
+            written = True
+
+        with self._lock:
+            self.refs[ref_key] = digest
+            deferred = self._batch_depth > 0
+            if deferred:
+                self._refs_dirty = True
+        if not deferred:
+            self._save_refs()
+        return digest, written
+
+    def gc(self, referenced_paths):
+        """删除没有被任何已安装文件引用的内容，返回删除的哈希列表"""
+        referenced_paths = {normalize_path(path) for path in referenced_paths}
+        with self._lock:
+            # 注册表中已不存在的安装位置不再算作引用
+            self.refs = {path: digest for path, digest in self.refs.items()
+                         if path in referenced_paths and os.path.exists(path)}
+            live = set(self.refs.values())
+        for path in referenced_paths:
+            if path not in self.refs and os.path.exists(path):
+                live.add(hash_file(path))
+
+        removed = []
+        for prefix in os.listdir(self.blob_dir):
+            prefix_dir = os.path.join(self.blob_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for file_name in os.listdir(prefix_dir):
+                digest = os.path.splitext(file_name)[0]
+                if digest not in live:
+                    os.remove(os.path.join(prefix_dir, file_name))
+                    removed.append(digest)
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+        self._save_refs()
+        return removed
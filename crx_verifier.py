@@ -0,0 +1,337 @@
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from crx_parser import CrxError, CrxFile
+from crx_store import hash_file
+
+# 校验规则变化时递增，缓存中旧版本的结果不再使用
+VERIFIER_VERSION = 1
+
+# 计算签名摘要时每次读取的大小
+VERIFY_CHUNK_SIZE = 1024 * 1024
+
+# 批量校验时计算文件哈希的线程数
+HASH_WORKERS = 8
+
+# CRX3 签名覆盖的数据：前缀 + 签名数据长度 + 签名数据 + ZIP
+CRX3_SIGNATURE_CONTEXT = b"CRX3 SignedData\x00"
+
+# PKCS#1 v1.5 签名中摘要前的 DigestInfo
+_SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+_SHA1_DIGEST_INFO = bytes.fromhex("3021300906052b0e03021a05000414")
+
+# SubjectPublicKeyInfo 中的算法标识（DER编码的OID）
+_OID_RSA = bytes.fromhex("2a864886f70d010101")
+_OID_EC_PUBLIC_KEY = bytes.fromhex("2a8648ce3d0201")
+_OID_P256 = bytes.fromhex("2a8648ce3d030107")
+
+# NIST P-256 曲线参数
+_P256_P = 0xffffffff00000001000000000000000000000000ffffffffffffffffffffffff
+_P256_A = _P256_P - 3
+_P256_B = 0x5ac635d8aa3a93e7b3ebbd55769886bc651d06b0cc53b0f63bce3c3e27d2604b
+_P256_N = 0xffffffff00000000ffffffffffffffffbce6faada7179e84f3b9cac2fc632551
+_P256_G = (0x6b17d1f2e12c4247f8bce6e563a440f277037d812deb33a0f4a13945d898c296,
+           0x4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececbb6406837bf51f5)
+
+
+def _der_read(data, pos=0):
+    """读取一个DER元素，返回 (标签, 内容, 下一个元素的位置)"""
+    if pos + 2 > len(data):
+        raise CrxError("公钥或签名的DER编码被截断")
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7F
+        if count == 0 or count > 4 or pos + count > len(data):
+            raise CrxError("公钥或签名的DER长度无效")
+        length = int.from_bytes(data[pos:pos + count], 'big')
+        pos += count
+    if pos + length > len(data):
+        raise CrxError("公钥或签名的DER编码被截断")
+    return tag, data[pos:pos + length], pos + length
+
+
+def _der_items(content):
+    """依次读取 content 中的DER元素 [(标签, 内容)]"""
+    items = []
+    pos = 0
+    while pos < len(content):
+        tag, item, pos = _der_read(content, pos)
+        items.append((tag, item))
+    return items
+
+
+def _der_sequence(data):
+    """SEQUENCE 中的各元素 [(标签, 内容)]"""
+    tag, content, _ = _der_read(data)
+    if tag != 0x30:
+        raise CrxError("DER编码不是SEQUENCE")
+    return _der_items(content)
+
+
+def _parse_public_key(public_key):
+    """解析 SubjectPublicKeyInfo，返回 (算法, 公钥内容)"""
+    items = _der_sequence(public_key)
+    if len(items) != 2 or items[0][0] != 0x30 or items[1][0] != 0x03 or not items[1][1]:
+        raise CrxError("公钥格式无效")
+    algorithm = [item for tag, item in _der_items(items[0][1]) if tag == 0x06]
+    key_bits = items[1][1][1:]
+    if algorithm[:1] == [_OID_RSA]:
+        numbers = _der_sequence(key_bits)
+        if len(numbers) != 2 or any(tag != 0x02 for tag, _ in numbers):
+            raise CrxError("RSA公钥格式无效")
+        return "rsa", tuple(int.from_bytes(value, 'big') for _, value in numbers)
+    if algorithm[:1] == [_OID_EC_PUBLIC_KEY]:
+        if algorithm[1:] != [_OID_P256]:
+            raise CrxError("不支持的椭圆曲线")
+        if len(key_bits) != 65 or key_bits[0] != 4:
+            raise CrxError("ECDSA公钥格式无效")
+        point = (int.from_bytes(key_bits[1:33], 'big'), int.from_bytes(key_bits[33:], 'big'))
+        if (point[1] ** 2 - point[0] ** 3 - _P256_A * point[0] - _P256_B) % _P256_P:
+            raise CrxError("ECDSA公钥不在曲线上")
+        return "ecdsa", point
+    raise CrxError("不支持的公钥算法")
+
+
+def _rsa_verify(key, signature, digest, digest_info):
+    """RSASSA-PKCS1-v1_5 签名校验"""
+    modulus, exponent = key
+    size = (modulus.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    value = int.from_bytes(signature, 'big')
+    if value >= modulus:
+        return False
+    expected = digest_info + digest
+    padded = b"\x00\x01" + b"\xff" * (size - len(expected) - 3) + b"\x00" + expected
+    return hmac.compare_digest(pow(value, exponent, modulus).to_bytes(size, 'big'), padded)
+
+
+def _p256_add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a[0] == b[0]:
+        if (a[1] + b[1]) % _P256_P == 0:
+            return None
+        slope = (3 * a[0] * a[0] + _P256_A) * pow(2 * a[1], -1, _P256_P)
+    else:
+        slope = (b[1] - a[1]) * pow(b[0] - a[0], -1, _P256_P)
+    x = (slope * slope - a[0] - b[0]) % _P256_P
+    return x, (slope * (a[0] - x) - a[1]) % _P256_P
+
+
+def _p256_multiply_add(u1, point_a, u2, point_b):
+    """u1 * A + u2 * B，两个标量乘法共用一次倍加"""
+    both = _p256_add(point_a, point_b)
+    result = None
+    for bit in range(max(u1.bit_length(), u2.bit_length()) - 1, -1, -1):
+        result = _p256_add(result, result)
+        pick = ((u1 >> bit) & 1, (u2 >> bit) & 1)
+        if pick == (1, 1):
+            result = _p256_add(result, both)
+        elif pick == (1, 0):
+            result = _p256_add(result, point_a)
+        elif pick == (0, 1):
+            result = _p256_add(result, point_b)
+    return result
+
+
+def _ecdsa_verify(point, signature, digest):
+    """ECDSA P-256 签名校验，签名为DER编码的 (r, s)"""
+    numbers = _der_sequence(signature)
+    if len(numbers) != 2 or any(tag != 0x02 for tag, _ in numbers):
+        return False
+    r, s = (int.from_bytes(value, 'big') for _, value in numbers)
+    if not (0 < r < _P256_N and 0 < s < _P256_N):
+        return False
+    w = pow(s, -1, _P256_N)
+    e = int.from_bytes(digest, 'big')
+    result = _p256_multiply_add(e * w % _P256_N, _P256_G, r * w % _P256_N, point)
+    return result is not None and result[0] % _P256_N == r
+
+
+def _verify_proof(algorithm, public_key, signature, digest, digest_info=_SHA256_DIGEST_INFO):
+    """校验一个签名，返回错误信息，通过时返回空字符串"""
+    try:
+        key_type, key = _parse_public_key(public_key)
+    except CrxError as e:
+        return str(e)
+    if key_type != algorithm:
+        return f"公钥类型与签名算法不一致: {algorithm}"
+    try:
+        if key_type == "rsa":
+            valid = _rsa_verify(key, signature, digest, digest_info)
+        else:
+            valid = _ecdsa_verify(key, signature, digest)
+    except CrxError:
+        valid = False
+    return "" if valid else "签名无效"
+
+
+def _digest_file(crx, prefix):
+    """一次读取整个文件，返回 (文件SHA-256, 签名摘要)
+
+    签名摘要覆盖 prefix 和文件头之后的ZIP数据，CRX3 使用 SHA-256，CRX2 使用 SHA-1。
+    """
+    file_digest = hashlib.sha256()
+    signed_digest = hashlib.sha256() if crx.crx_version == 3 else hashlib.sha1()
+    signed_digest.update(prefix)
+    for start in range(0, crx.size, VERIFY_CHUNK_SIZE):
+        chunk = crx.read_at(start, min(VERIFY_CHUNK_SIZE, crx.size - start))
+        file_digest.update(chunk)
+        if start + len(chunk) > crx.payload_offset:
+            signed_digest.update(chunk[max(crx.payload_offset - start, 0):])
+    return file_digest.hexdigest(), signed_digest.digest()
+
+
+def verify_crx(crx_path):
+    """校验一个CRX文件的签名、扩展ID和ZIP内容
+
+    返回 {"path", "sha256", "extension_id", "crx_version", "valid", "errors"}。
+    在进程池中调用，只依赖参数和文件内容。
+    """
+    result = {"path": crx_path, "sha256": "", "extension_id": "", "crx_version": 0,
+              "valid": False, "errors": []}
+    errors = result["errors"]
+    try:
+        with CrxFile(crx_path) as crx:
+            result["extension_id"] = crx.extension_id
+            result["crx_version"] = crx.crx_version
+            if crx.payload_offset > crx.size:
+                raise CrxError("文件头长度超出文件大小，文件可能被截断")
+
+            if crx.crx_version == 3:
+                header = crx.signed_header_data
+                prefix = CRX3_SIGNATURE_CONTEXT + len(header).to_bytes(4, 'little') + header
+                result["sha256"], digest = _digest_file(crx, prefix)
+                if len(crx.crx_id) != 16:
+                    errors.append("文件头中没有扩展ID（signed_header_data）")
+                elif not any(hashlib.sha256(public_key).digest()[:16] == crx.crx_id
+                             for _, public_key, _ in crx.proofs):
+                    errors.append("扩展ID与签名公钥不一致")
+                if not crx.proofs:
+                    errors.append("文件头中没有签名")
+                for algorithm, public_key, signature in crx.proofs:
+                    error = _verify_proof(algorithm, public_key, signature, digest)
+                    if error:
+                        errors.append(f"{algorithm} 签名校验失败（公钥 {hashlib.sha256(public_key).hexdigest()[:16]}）: {error}")
+            else:
+                result["sha256"], digest = _digest_file(crx, b"")
+                error = _verify_proof("rsa", crx.public_key, crx.signature, digest, _SHA1_DIGEST_INFO)
+                if error:
+                    errors.append(f"rsa 签名校验失败: {error}")
+
+            if crx.zip_offset != crx.payload_offset:
+                errors.append("ZIP数据的位置与文件头不一致，文件可能被截断或拼接")
+            errors.extend(crx.check_entries())
+    except (CrxError, OSError, ValueError) as e:
+        errors.append(str(e))
+    if not result["sha256"]:
+        try:
+            result["sha256"] = hash_file(crx_path)
+        except OSError:
+            pass
+    result["valid"] = not errors
+    return result
+
+
+def format_result(result):
+    """一行校验结果"""
+    if result["valid"]:
+        return f"√ {result['extension_id']} <- {result['path']}"
+    return f"× {result['path']}: {'；'.join(result['errors'])}"
+
+
+class CrxVerifier:
+    """CRX文件校验，结果按文件内容的SHA-256缓存
+
+    verify_many() 先用线程计算文件哈希，缓存中没有的文件再分给进程池校验，
+    签名运算和ZIP解压可以用满所有CPU核心。指定扩展清单时结果同时保存在
+    清单中，文件内容不变就不会重复校验。
+    """
+
+    def __init__(self, inventory=None, max_workers=None):
+        self.inventory = inventory
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._results = {}  # {SHA-256: 不含路径的校验结果}
+
+    def _cached(self, hashes):
+        """从内存和扩展清单中查找已有的校验结果"""
+        found = {sha256: self._results[sha256] for sha256 in hashes if sha256 in self._results}
+        missing = [sha256 for sha256 in hashes if sha256 not in found]
+        if missing and self.inventory is not None:
+            try:
+                stored = self.inventory.verifications(missing, VERIFIER_VERSION)
+            except Exception as e:
+                print(f"× 读取校验缓存失败: {str(e)}")
+                stored = {}
+            self._results.update(stored)
+            found.update(stored)
+        return found
+
+    def _remember(self, results):
+        fresh = []
+        for result in results:
+            if result["sha256"] and result["sha256"] not in self._results:
+                self._results[result["sha256"]] = {key: value for key, value in result.items() if key != "path"}
+                fresh.append(result)
+        if fresh and self.inventory is not None:
+            try:
+                self.inventory.record_verifications(fresh, VERIFIER_VERSION)
+            except Exception as e:
+                print(f"× 保存校验结果失败: {str(e)}")
+
+    def verify(self, crx_path):
+        """校验一个文件，返回 verify_crx() 的结果"""
+        return self.verify_many([crx_path])[0]
+
+    def verify_many(self, crx_paths):
+        """批量校验，结果顺序与 crx_paths 相同"""
+        crx_paths = list(crx_paths)
+        hashes = {}
+
+        def hash_one(crx_path):
+            try:
+                return hash_file(crx_path)
+            except OSError:
+                return ""
+
+        with ThreadPoolExecutor(max_workers=min(HASH_WORKERS, len(crx_paths) or 1)) as executor:
+            hashes = dict(zip(crx_paths, executor.map(hash_one, crx_paths)))
+        cached = self._cached({sha256 for sha256 in hashes.values() if sha256})
+
+        # 内容相同的文件只校验一个
+        pending = {}
+        for crx_path, sha256 in hashes.items():
+            if sha256 not in cached:
+                pending.setdefault(sha256 or crx_path, crx_path)
+        to_check = list(pending.values())
+        # 线程中算出的哈希只用于查找缓存，校验时从同一次读取的数据重新计算，
+        # 文件在两次读取之间被替换时，结果按实际校验的内容保存
+        checked = None
+        if len(to_check) > 1 and self.max_workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(to_check))) as executor:
+                    checked = list(executor.map(verify_crx, to_check))
+            except (OSError, BrokenProcessPool) as e:
+                print(f"× 无法使用进程池校验，改为逐个校验: {str(e)}")
+        if checked is None:
+            checked = [verify_crx(crx_path) for crx_path in to_check]
+        self._remember(checked)
+        checked = {result["path"]: result for result in checked}
+
+        results = []
+        for crx_path in crx_paths:
+            sha256 = hashes[crx_path]
+            if sha256 in cached:
+                results.append(dict(cached[sha256], path=crx_path))
+            else:
+                result = checked[pending[sha256 or crx_path]]
+                results.append(dict(result, path=crx_path))
+        return results
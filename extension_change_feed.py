@@ -0,0 +1,115 @@
+import threading
+
+from extension_path_checker import STATUS_OK
+
+# 没有变化通知时轮询注册表的间隔（秒）；有通知时也按此间隔检查CRX文件
+CHANGE_POLL_INTERVAL = 5
+
+# 变化类型
+CHANGE_ADDED = "added"
+CHANGE_MODIFIED = "modified"
+CHANGE_REMOVED = "removed"
+
+
+class ExtensionChangeFeed:
+    """监视扩展的所有注册位置和CRX文件，只把发生变化的扩展ID交给调用方
+
+    注册表实现支持 watch() 时等待 HKCU 扩展项的变化通知（Windows 上为
+    RegNotifyChangeKeyValue，内存注册表在每次写入后通知），其余位置以及不支持
+    通知时每 poll_interval 秒检查一次。每次醒来后通过 core.scanner 读取所有位置，
+    比较各扩展的指纹（合并后的路径、版本号、注册位置和不一致之处，以及CRX文件的
+    状态、修改时间和大小），有差异的扩展以 {扩展ID: 变化类型} 的形式传给 on_changes。
+    CRX文件的状态通过 core.path_checker 获取，在其缓存有效期内不会重复访问文件。
+    """
+
+    def __init__(self, core, on_changes, poll_interval=CHANGE_POLL_INTERVAL):
+        self.core = core
+        self.on_changes = on_changes
+        self.poll_interval = poll_interval
+        self.fingerprints = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._watcher = None
+
+    def _snapshot(self):
+        """当前每个扩展的指纹"""
+        records = self.core.scanner.scan()
+        statuses = self.core.path_checker.check_many([record["path"] for record in records.values()])
+        snapshot = {}
+        for extension_id, record in records.items():
+            path = record["path"]
+            status = statuses[path]
+            file_stat = self.core.path_checker.stat(path) if status == STATUS_OK else None
+            registration = (path, record["version"], tuple(record["sources"]), tuple(record["conflicts"]))
+            snapshot[extension_id] = (registration, status, file_stat)
+        return snapshot
+
+    def reset(self):
+        """以当前状态作为比较的基准"""
+        self.fingerprints = self._snapshot()
+
+    def poll(self):
+        """比较当前状态与上一次的状态，返回 {扩展ID: 变化类型}"""
+        snapshot = self._snapshot()
+        previous = self.fingerprints
+        self.fingerprints = snapshot
+        if previous is None:
+            return {}
+        changes = {}
+        for extension_id, fingerprint in snapshot.items():
+            old_fingerprint = previous.get(extension_id)
+            if old_fingerprint is None:
+                changes[extension_id] = CHANGE_ADDED
+            elif old_fingerprint != fingerprint:
+                changes[extension_id] = CHANGE_MODIFIED
+        for extension_id in previous.keys() - snapshot.keys():
+            changes[extension_id] = CHANGE_REMOVED
+        return changes
+
+    def _wait(self):
+        """等待下一次检查，返回是否应当继续"""
+        if self._watcher is not None:
+            try:
+                self._watcher.wait(self.poll_interval)
+            except OSError as e:
+                print(f"注册表变化通知失败，改为定时轮询: {str(e)}")
+                self._watcher.close()
+                self._watcher = None
+        else:
+            self._stop.wait(self.poll_interval)
+        return not self._stop.is_set()
+
+    def run(self):
+        """在当前线程中监视，直到调用 stop()"""
+        self._watcher = self.core.registry.watch(self.core.root_key, self.core.reg_path)
+        try:
+            if self.fingerprints is None:
+                self.reset()
+            while self._wait():
+                try:
+                    changes = self.poll()
+                except Exception as e:
+                    print(f"检查扩展变化失败: {str(e)}")
+                    continue
+                if changes:
+                    self.on_changes(changes)
+        finally:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """在后台线程中开始监视"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
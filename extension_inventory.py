@@ -0,0 +1,442 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from extension_name_cache import ExtensionNameCache, SOURCE_LEGACY
+from extension_path_checker import STATUS_OK
+
+# 默认的清单数据库，与默认的名称缓存文件在同一目录
+DEFAULT_INVENTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extension_inventory.db")
+
+# 迁移旧缓存时每次写入数据库的记录数
+MIGRATE_BATCH_SIZE = 1000
+
+# 一次查询的扩展ID数量上限（SQLite 参数数量有限制）
+LOOKUP_CHUNK_SIZE = 500
+
+# 流式读取JSON文件时每次读取的字符数
+JSON_READ_CHUNK = 64 * 1024
+
+# 安装事件
+EVENT_INSTALL = "install"   # 安装工具复制文件并写入注册表
+EVENT_WRITE = "write"       # 管理工具添加或修改注册表项
+EVENT_REMOVE = "remove"     # 管理工具删除注册表项
+
+# 写入清单的程序
+TOOL_MANAGER = "manager"
+TOOL_INSTALLER = "installer"
+TOOL_GLOBAL_INSTALLER = "global_installer"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extensions (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL DEFAULT '',
+    version TEXT NOT NULL DEFAULT '',
+    sha256 TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS extensions_path ON extensions (path);
+CREATE INDEX IF NOT EXISTS extensions_sha256 ON extensions (sha256);
+CREATE TABLE IF NOT EXISTS names (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT '',
+    fetched_at REAL NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    retry_after REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS names_source ON names (source, fetched_at);
+CREATE TABLE IF NOT EXISTS crx_blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL DEFAULT 0,
+    extension_id TEXT NOT NULL DEFAULT '',
+    version TEXT NOT NULL DEFAULT '',
+    added_at REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS crx_blobs_extension ON crx_blobs (extension_id);
+CREATE TABLE IF NOT EXISTS install_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    at REAL NOT NULL,
+    extension_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    path TEXT NOT NULL DEFAULT '',
+    version TEXT NOT NULL DEFAULT '',
+    sha256 TEXT NOT NULL DEFAULT '',
+    tool TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS install_events_extension ON install_events (extension_id, at);
+CREATE TABLE IF NOT EXISTS crx_verifications (
+    sha256 TEXT PRIMARY KEY,
+    verifier_version INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    extension_id TEXT NOT NULL DEFAULT '',
+    crx_version INTEGER NOT NULL DEFAULT 0,
+    errors TEXT NOT NULL DEFAULT '[]',
+    checked_at REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS inventory_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 语句文本固定、参数用占位符，sqlite3 会缓存编译好的语句重复使用
+_SQL_UPSERT_NAME = """
+INSERT OR REPLACE INTO names (id, name, source, fetched_at, failures, retry_after)
+VALUES (?, ?, ?, ?, ?, ?)"""
+_SQL_DELETE_NAME = "DELETE FROM names WHERE id = ?"
+_SQL_SELECT_NAMES = """
+SELECT id, name, source, fetched_at, failures, retry_after FROM names ORDER BY fetched_at"""
+# 扫描结果没有变化时不改写行；没有哈希时保留已知的哈希
+_SQL_UPSERT_EXTENSION = """
+INSERT INTO extensions (id, path, version, sha256, status, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    path = excluded.path,
+    version = excluded.version,
+    sha256 = CASE WHEN excluded.sha256 != '' THEN excluded.sha256 ELSE extensions.sha256 END,
+    status = excluded.status,
+    updated_at = excluded.updated_at
+WHERE path != excluded.path OR version != excluded.version OR status != excluded.status
+    OR (excluded.sha256 != '' AND sha256 != excluded.sha256)"""
+_SQL_DELETE_EXTENSION = "DELETE FROM extensions WHERE id = ?"
+_SQL_SELECT_EXTENSION = "SELECT id, path, version, sha256, status, updated_at FROM extensions WHERE id = ?"
+_SQL_UPSERT_BLOB = """
+INSERT INTO crx_blobs (sha256, size, extension_id, version, added_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (sha256) DO NOTHING"""
+_SQL_INSERT_EVENT = """
+INSERT INTO install_events (at, extension_id, action, path, version, sha256, tool)
+VALUES (?, ?, ?, ?, ?, ?, ?)"""
+_SQL_SELECT_HASHES = "SELECT id, sha256 FROM extensions WHERE sha256 != '' AND id IN ({})"
+_SQL_UPSERT_VERIFICATION = """
+INSERT OR REPLACE INTO crx_verifications (sha256, verifier_version, valid, extension_id, crx_version, errors, checked_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)"""
+_SQL_SELECT_VERIFICATIONS = """
+SELECT sha256, valid, extension_id, crx_version, errors FROM crx_verifications
+WHERE verifier_version = ? AND sha256 IN ({})"""
+_SQL_SELECT_EVENTS = """
+SELECT at, action, path, version, sha256, tool FROM install_events WHERE extension_id = ? ORDER BY seq"""
+
+
+class _JsonStream:
+    """逐块读取JSON文件，按需解码对象中的每一项，不把整个文件读入内存"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(JSON_READ_CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """跳过空白，返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSON格式错误：位置 {self.pos} 处应为 {chars}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """解码下一个完整的值"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 值恰好在缓冲区末尾结束时，数字等可能还没读完
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        """逐个返回对象的键；调用方须在取下一个键之前用 value() 或 items() 读取对应的值"""
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(":")
+            # 调用方在此处读取值
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+
+def _iter_name_snapshot(cache_file):
+    """流式读取名称缓存快照，兼容旧版 {ID: 名称} 格式，返回 (扩展ID, 条目)"""
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        for key in stream.items():
+            if key == "entries":
+                for extension_id in stream.items():
+                    yield extension_id, stream.value()
+            else:
+                value = stream.value()
+                if key != "version" and isinstance(value, str):
+                    yield key, {"name": value, "source": SOURCE_LEGACY}
+
+
+def _name_row(extension_id, entry):
+    return (extension_id, str(entry.get("name") or ""), str(entry.get("source") or SOURCE_LEGACY),
+            float(entry.get("fetched_at") or 0), int(entry.get("failures") or 0),
+            float(entry.get("retry_after") or 0))
+
+
+class ExtensionInventory:
+    """本地扩展清单（SQLite，WAL模式）
+
+    extensions 记录每个扩展最近一次已知的路径、版本号、文件哈希和状态，
+    names 记录名称及其来源和获取时间，crx_blobs 记录安装过的CRX文件内容，
+    install_events 按时间顺序记录安装、修改和删除，crx_verifications 按文件
+    内容缓存CRX签名和完整性校验的结果。管理工具和两个安装工具
+    共用同一个数据库文件，各自只写入自己知道的信息。
+    """
+
+    def __init__(self, db_file=DEFAULT_INVENTORY_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        # 自动提交模式，多条写入由 _transaction() 放在一个事务中
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """在持有 _lock 时调用"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def checkpoint(self):
+        """把WAL中的内容写回数据库文件并截断WAL"""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # 名称
+
+    def load_names(self):
+        """返回 [(扩展ID, 条目)]，按获取时间从旧到新排列"""
+        with self._lock:
+            rows = self._conn.execute(_SQL_SELECT_NAMES).fetchall()
+        return [(extension_id, {"name": name, "source": source, "fetched_at": fetched_at,
+                                "failures": failures, "retry_after": retry_after})
+                for extension_id, name, source, fetched_at, failures, retry_after in rows]
+
+    def apply_name_records(self, records):
+        """在一个事务中写入名称缓存的修改记录 [{"op", "id", "entry"}]"""
+        latest = {}
+        for record in records:
+            latest[record["id"]] = record
+        upserts = [_name_row(extension_id, record["entry"])
+                   for extension_id, record in latest.items() if record["op"] == "set"]
+        deletes = [(extension_id,) for extension_id, record in latest.items() if record["op"] == "del"]
+        with self._lock, self._transaction() as conn:
+            conn.executemany(_SQL_UPSERT_NAME, upserts)
+            conn.executemany(_SQL_DELETE_NAME, deletes)
+
+    def migrate_name_cache(self, cache_file):
+        """把旧的JSON名称缓存（快照和日志）导入 names 表
+
+        快照逐项流式读取、日志逐行读取，整个迁移在一个事务中完成。
+        每个缓存文件只迁移一次，返回导入的条目数，已迁移过或没有旧文件时返回 None。
+        """
+        journal_file = cache_file + ".journal"
+        if not (os.path.exists(cache_file) or os.path.exists(journal_file)):
+            return None
+        marker = "migrated:" + os.path.normcase(os.path.abspath(cache_file))
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM inventory_info WHERE key = ?", (marker,)).fetchone():
+                return None
+
+        count = 0
+        with self._lock, self._transaction() as conn:
+            if os.path.exists(cache_file):
+                batch = []
+                for extension_id, entry in _iter_name_snapshot(cache_file):
+                    if not isinstance(entry, dict):
+                        continue
+                    batch.append(_name_row(extension_id, entry))
+                    if len(batch) >= MIGRATE_BATCH_SIZE:
+                        conn.executemany(_SQL_UPSERT_NAME, batch)
+                        count += len(batch)
+                        batch = []
+                conn.executemany(_SQL_UPSERT_NAME, batch)
+                count += len(batch)
+            if os.path.exists(journal_file):
+                with open(journal_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # 最后一行可能因崩溃而不完整
+                            break
+                        if record.get("op") == "set":
+                            conn.execute(_SQL_UPSERT_NAME, _name_row(record["id"], record["entry"]))
+                            count += 1
+                        elif record.get("op") == "del":
+                            conn.execute(_SQL_DELETE_NAME, (record["id"],))
+            conn.execute("INSERT OR REPLACE INTO inventory_info (key, value) VALUES (?, ?)",
+                         (marker, str(int(time.time()))))
+        return count
+
+    # 扩展、CRX文件和安装事件
+
+    def record_extensions(self, ext_infos):
+        """记录扫描到的扩展 [{"id", "path", "version", "status"}]，没有变化的行不改写"""
+        now = time.time()
+        rows = [(ext_info["id"], ext_info.get("path", ""), ext_info.get("version", ""),
+                 ext_info.get("sha256", ""), ext_info.get("status", ""), now) for ext_info in ext_infos]
+        with self._lock, self._transaction() as conn:
+            conn.executemany(_SQL_UPSERT_EXTENSION, rows)
+
+    def record_installs(self, installs, tool):
+        """记录安装工具安装的扩展 [{"id", "path", "version", "sha256", "size"}]
+
+        在一个事务中写入CRX文件、扩展的当前状态和安装事件。
+        """
+        now = time.time()
+        with self._lock, self._transaction() as conn:
+            for install in installs:
+                sha256 = install.get("sha256", "")
+                if sha256:
+                    conn.execute(_SQL_UPSERT_BLOB, (sha256, install.get("size", 0), install["id"],
+                                                    install.get("version", ""), now))
+                conn.execute(_SQL_UPSERT_EXTENSION, (install["id"], install["path"], install.get("version", ""),
+                                                     sha256, STATUS_OK, now))
+                conn.execute(_SQL_INSERT_EVENT, (now, install["id"], EVENT_INSTALL, install["path"],
+                                                 install.get("version", ""), sha256, tool))
+
+    def record_event(self, extension_id, action, path="", version="", tool=TOOL_MANAGER):
+        """记录一次添加、修改或删除；删除时同时移除扩展的当前状态"""
+        with self._lock, self._transaction() as conn:
+            conn.execute(_SQL_INSERT_EVENT, (time.time(), extension_id, action, path, version, "", tool))
+            if action == EVENT_REMOVE:
+                conn.execute(_SQL_DELETE_EXTENSION, (extension_id,))
+
+    def get_extension(self, extension_id):
+        """扩展的当前状态，没有记录时返回 None"""
+        with self._lock:
+            row = self._conn.execute(_SQL_SELECT_EXTENSION, (extension_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "path", "version", "sha256", "status", "updated_at"), row))
+
+    def hashes(self, extension_ids):
+        """已知的CRX文件哈希，返回 {扩展ID: SHA-256}"""
+        extension_ids = list(extension_ids)
+        results = {}
+        with self._lock:
+            for start in range(0, len(extension_ids), LOOKUP_CHUNK_SIZE):
+                chunk = extension_ids[start:start + LOOKUP_CHUNK_SIZE]
+                sql = _SQL_SELECT_HASHES.format(",".join("?" * len(chunk)))
+                results.update(self._conn.execute(sql, chunk))
+        return results
+
+    def verifications(self, hashes, verifier_version):
+        """已保存的CRX校验结果，返回 {SHA-256: {"sha256", "valid", "extension_id", "crx_version", "errors"}}"""
+        hashes = list(hashes)
+        results = {}
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+                chunk = hashes[start:start + LOOKUP_CHUNK_SIZE]
+                sql = _SQL_SELECT_VERIFICATIONS.format(",".join("?" * len(chunk)))
+                for sha256, valid, extension_id, crx_version, errors in self._conn.execute(
+                        sql, [verifier_version] + chunk):
+                    results[sha256] = {"sha256": sha256, "valid": bool(valid), "extension_id": extension_id,
+                                       "crx_version": crx_version, "errors": json.loads(errors)}
+        return results
+
+    def record_verifications(self, results, verifier_version):
+        """在一个事务中保存CRX校验结果，以文件的SHA-256为键"""
+        now = time.time()
+        with self._lock, self._transaction() as conn:
+            conn.executemany(_SQL_UPSERT_VERIFICATION, [
+                (result["sha256"], verifier_version, int(result["valid"]), result["extension_id"],
+                 result["crx_version"], json.dumps(result["errors"], ensure_ascii=False), now)
+                for result in results if result["sha256"]])
+
+    def events(self, extension_id):
+        """扩展的安装历史，按发生顺序排列"""
+        with self._lock:
+            rows = self._conn.execute(_SQL_SELECT_EVENTS, (extension_id,)).fetchall()
+        return [dict(zip(("at", "action", "path", "version", "sha256", "tool"), row)) for row in rows]
+
+
+class InventoryNameCache(ExtensionNameCache):
+    """保存在扩展清单 names 表中的名称缓存
+
+    启动时从数据库读入内存，查询不访问数据库；修改仍先记录在内存中，
+    flush() 时在一个事务中写入，compact() 只需整理WAL。
+    数据库就是名称的完整记录，默认不限制条目数，淘汰会删除数据库中的行。
+    """
+
+    def __init__(self, inventory, **kwargs):
+        kwargs.setdefault("cache_file", inventory.db_file)
+        kwargs.setdefault("max_entries", None)
+        super().__init__(**kwargs)
+        self.inventory = inventory
+
+    @property
+    def journal_file(self):
+        return None
+
+    @classmethod
+    def load(cls, inventory, **kwargs):
+        cache = cls(inventory, **kwargs)
+        for extension_id, entry in inventory.load_names():
+            cache._entries[extension_id] = entry
+        cache._evict()
+        cache.flush()
+        return cache
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                self.inventory.apply_name_records(pending)
+            except Exception:
+                # 写入失败时保留修改，下次 flush() 再试
+                with self._lock:
+                    self._pending[:0] = pending
+                raise
+
+    def compact(self):
+        self.flush()
+        self.inventory.checkpoint()
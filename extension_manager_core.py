@@ -0,0 +1,484 @@
+import os
+import re
+import threading
+from extension_name_cache import ExtensionNameCache, SOURCE_STORE
+from extension_inventory import ExtensionInventory, InventoryNameCache, EVENT_WRITE, EVENT_REMOVE
+from crx_parser import CrxFile
+from crx_verifier import CrxVerifier, format_result
+from extension_manifest import ManifestCache
+from extension_path_checker import PathStatusChecker, STATUS_OK
+from extension_scanner import ExtensionScanner, LOCATION_HKCU, LOCATION_FORCELIST, forcelist_path, forcelist_value
+from policy_list import PolicyList
+from registry_backend import HKEY_CURRENT_USER, get_registry_backend
+
+# 扫描注册表时每批交给调用方的扩展数量
+SCAN_BATCH_SIZE = 50
+
+# 扩展ID：32位字母
+EXTENSION_ID_PATTERN = r'^[a-zA-Z]{32}$'
+
+
+class ExtensionManagerCore:
+    """扩展管理的非界面部分：注册表读写、名称缓存和名称获取
+
+    图形界面（ChromeExtensionManager）和命令行（chrome_extension_cli）共用，
+    本模块不导入 tkinter。
+    """
+
+    def __init__(self, registry=None, cache_file=None):
+        # 注册表路径：新添加的扩展写入此处
+        self.reg_path = r"Software\Google\Chrome\Extensions"
+        self.root_key = HKEY_CURRENT_USER
+        self.registry = registry or get_registry_backend()
+        # 扫描 HKCU、HKLM、Wow6432Node 和两个策略列表
+        self.scanner = ExtensionScanner(self.registry)
+        
+        # 缓存文件路径
+        self.cache_file = cache_file or os.path.join(os.path.dirname(os.path.abspath(__file__)), "extension_names.json")
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        self.manifest_cache_file = os.path.join(cache_dir, "manifest_cache.json")
+        self.bundle_file = os.path.join(cache_dir, "extension_bundle.db")
+        self.inventory_file = os.path.join(cache_dir, "extension_inventory.db")
+        self.inventory = None
+        self.name_cache = self.load_name_cache()
+        self._manifest_cache = None
+        self._name_bundle = None
+        self._crx_verifier = None
+        self.path_checker = PathStatusChecker()
+        self._name_resolver = None
+        self._resolver_lock = threading.Lock()
+
+    @property
+    def name_resolver(self):
+        """第一次需要访问网络时才创建名称获取器"""
+        with self._resolver_lock:
+            if self._name_resolver is None:
+                from extension_name_resolver import ExtensionNameResolver
+                self._name_resolver = ExtensionNameResolver()
+            return self._name_resolver
+
+    @property
+    def manifest_cache(self):
+        """第一次需要读取manifest时才加载缓存文件"""
+        with self._resolver_lock:
+            if self._manifest_cache is None:
+                self._manifest_cache = ManifestCache.load(self.manifest_cache_file)
+            return self._manifest_cache
+
+    @property
+    def name_bundle(self):
+        """离线名称库，没有导入过数据包时为 None"""
+        with self._resolver_lock:
+            if self._name_bundle is None and os.path.exists(self.bundle_file):
+                from extension_name_bundle import NameBundle
+                self._name_bundle = NameBundle(self.bundle_file)
+            return self._name_bundle
+
+    @property
+    def crx_verifier(self):
+        """CRX文件校验，结果缓存在扩展清单中"""
+        with self._resolver_lock:
+            if self._crx_verifier is None:
+                self._crx_verifier = CrxVerifier(self.inventory)
+            return self._crx_verifier
+
+    def verify_crx(self, crx_path):
+        """校验CRX文件的签名、扩展ID和ZIP内容，返回校验结果"""
+        return self.crx_verifier.verify(crx_path)
+
+    def import_name_bundle(self, bundle_path, replace=True):
+        """把数据包导入离线名称库，返回 {"imported", "skipped"}"""
+        with self._resolver_lock:
+            if self._name_bundle is None:
+                from extension_name_bundle import NameBundle
+                self._name_bundle = NameBundle(self.bundle_file)
+        return self._name_bundle.import_file(bundle_path, replace=replace)
+
+    def get_bundle_names(self, extension_ids):
+        """从离线名称库中查找名称，返回 {扩展ID: 名称}"""
+        bundle = self.name_bundle
+        if bundle is None or not extension_ids:
+            return {}
+        try:
+            return {extension_id: record["name"]
+                    for extension_id, record in bundle.lookup_many(extension_ids).items()}
+        except Exception as e:
+            print(f"读取离线名称库失败: {str(e)}")
+            return {}
+
+    def save_manifest_cache(self):
+        if self._manifest_cache is None:
+            return
+        try:
+            self._manifest_cache.save()
+        except Exception as e:
+            print(f"保存manifest缓存失败: {str(e)}")
+
+    def load_name_cache(self):
+        """从扩展清单加载名称缓存，第一次运行时迁移旧的JSON缓存文件"""
+        try:
+            self.inventory = ExtensionInventory(self.inventory_file)
+            migrated = self.inventory.migrate_name_cache(self.cache_file)
+            if migrated is not None:
+                print(f"√ 已把 {self.cache_file} 中的 {migrated} 条名称迁移到扩展清单")
+            return InventoryNameCache.load(self.inventory)
+        except Exception as e:
+            print(f"加载扩展清单失败: {str(e)}")
+        # 数据库不可用时只在内存中缓存
+        return ExtensionNameCache()
+
+    def save_name_cache(self):
+        """保存名称缓存（写入扩展清单）"""
+        try:
+            self.name_cache.flush()
+        except Exception as e:
+            print(f"保存缓存文件失败: {str(e)}")
+
+    def compact_name_cache(self):
+        """整理扩展清单的WAL文件"""
+        try:
+            self.name_cache.compact()
+        except Exception as e:
+            print(f"保存缓存文件失败: {str(e)}")
+
+    def find_extension_id_in_name(self, name):
+        """从名称中查找32位连续字母作为扩展ID"""
+        matches = re.findall(r'[a-zA-Z]{32}', name)
+        return matches[0].lower() if matches else ""
+
+    def get_extension_name_from_store(self, extension_id):
+        """从扩展商店获取扩展名称"""
+        return self.name_resolver.resolve(extension_id)
+
+    def resolve_extension_names(self, extension_ids, on_result=None, cancel_event=None, force=False):
+        """并发获取一批扩展的名称，结果（包括失败）写入缓存
+
+        最近获取失败、仍在等待期内的扩展不会再次请求；force 为真时全部重新获取。
+        """
+        lookup_ids = [extension_id for extension_id in extension_ids
+                      if force or self.name_cache.should_lookup(extension_id)]
+
+        def record_result(extension_id, name):
+            if name:
+                self.name_cache.set(extension_id, name, SOURCE_STORE)
+            else:
+                self.name_cache.record_failure(extension_id)
+            if on_result:
+                on_result(extension_id, name)
+
+        if not lookup_ids:
+            # 名称都已缓存时不创建名称获取器，也就不导入 requests
+            return {}
+        resolved = self.name_resolver.resolve_many(lookup_ids, on_result=record_result,
+                                                   cancel_event=cancel_event)
+        self.save_name_cache()
+        return resolved
+
+    def refresh_stale_names(self):
+        """在后台线程中重新获取已过期的商店名称"""
+        stale_ids = self.name_cache.stale_ids()
+        if not stale_ids:
+            return None
+
+        def worker():
+            print(f"后台刷新 {len(stale_ids)} 个过期的扩展名称")
+            for extension_id, name in self.name_resolver.resolve_many(stale_ids).items():
+                if name:
+                    self.name_cache.set(extension_id, name, SOURCE_STORE)
+                else:
+                    self.name_cache.record_failure(extension_id)
+            self.save_name_cache()
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def get_manifest_info(self, extension_path):
+        """读取CRX文件的manifest信息（名称、版本号、描述、权限和图标），优先使用缓存"""
+        if not extension_path:
+            return None
+        # 扫描时已检查过文件状态，使用当时记录的修改时间和大小，不再访问文件
+        return self.manifest_cache.get(extension_path, self.path_checker.stat(extension_path))
+
+    def get_extension_name_from_manifest(self, extension_path):
+        """从扩展的manifest.json中读取名称，__MSG_*__ 按 _locales 中的文本替换"""
+        info = self.get_manifest_info(extension_path)
+        return info["name"] if info else ""
+
+    def get_crx_info(self, crx_path):
+        """从CRX文件中读取扩展信息"""
+        try:
+            extension_id = ""
+            version = ""
+            name = ""
+            
+            # 从CRX文件头的公钥计算扩展ID，并直接读取manifest.json
+            manifest_name = ""
+            info = self.manifest_cache.get(crx_path)
+            if info is not None:
+                extension_id = info["id"]
+                version = info["version"]
+                manifest_name = info["name"]
+                print(f"√ 从CRX文件头计算出扩展ID: {extension_id}")
+                if version:
+                    print(f"√ 从manifest.json读取到版本号: {version}")
+                self.save_manifest_cache()
+            else:
+                # manifest.json 无法读取时仍然尝试从文件头计算扩展ID
+                try:
+                    with CrxFile(crx_path) as crx:
+                        extension_id = crx.extension_id
+                        print(f"√ 从CRX文件头计算出扩展ID: {extension_id}")
+                except Exception as e:
+                    print(f"解析CRX文件失败: {str(e)}")
+            
+            if extension_id:
+                print(format_result(self.verify_crx(crx_path)))
+            else:
+                # 文件头无法解析时，从文件名中提取ID
+                file_name = os.path.basename(crx_path)
+                name_without_ext = os.path.splitext(file_name)[0]
+                print(f"\n检查文件名: {name_without_ext}")
+                extension_id = self.find_extension_id_in_name(name_without_ext)
+                if extension_id:
+                    print(f"√ 从文件名提取到扩展ID: {extension_id}")
+                else:
+                    print("× 文件名中未找到32位连续字母作为扩展ID")
+            
+            if extension_id:
+                # 首先使用缓存中的名称
+                cached_name = self.name_cache.get(extension_id)
+                if cached_name:
+                    name = cached_name
+                    print(f"√ 使用缓存中的名称: {cached_name}")
+                
+                # 其次使用manifest.json中的名称
+                if not name and manifest_name:
+                    name = manifest_name
+                    print(f"√ 从manifest.json读取到名称: {name}")
+                
+                # 然后查找离线名称库
+                if not name:
+                    name = self.get_bundle_names([extension_id]).get(extension_id, "")
+                    if name:
+                        print(f"√ 从离线名称库读取到名称: {name}")
+                
+                # 都没有时尝试从扩展商店获取
+                if not name:
+                    name = self.resolve_extension_names([extension_id]).get(extension_id, "")
+            
+            return extension_id, version, name
+            
+        except Exception as e:
+            print(f"处理CRX文件失败: {str(e)}")
+            return "", "", ""
+
+    def _build_ext_info(self, record, status=None):
+        """根据扫描得到的记录生成扩展信息，名称使用缓存中的名称或扩展ID
+
+        status 为 None 时检查文件状态（正常/文件缺失/无法访问/在线安装）。
+        """
+        extension_id = record["id"]
+        ext_info = {
+            "name": "",  # 初始化为空
+            "id": extension_id,
+            "path": record["path"],
+            "version": record["version"],
+            "status": status,
+            "source": ", ".join(record["sources"]),
+            "conflict": "；".join(record["conflicts"]),
+        }
+        
+        # 检查文件是否存在
+        if status is None:
+            ext_info["status"] = self.path_checker.check(ext_info["path"], force=True)
+        
+        # 首先使用缓存中的名称，没有时暂时使用扩展ID
+        cached_name = self.name_cache.get(extension_id)
+        if cached_name:
+            print(f"√ 使用缓存中的名称: {cached_name}")
+        ext_info["name"] = cached_name or extension_id
+        return ext_info
+
+    def get_registry_extension(self, extension_id):
+        """读取单个扩展在各注册位置的信息，都不存在时返回None"""
+        record = self.scanner.lookup(extension_id)
+        if record is None:
+            return None
+        return self._build_ext_info(record)
+
+    def _location(self, name):
+        """注册位置对应的 (根键, 路径)"""
+        for location_name, root_key, path, _ in self.scanner.locations:
+            if location_name == name:
+                return root_key, path
+        raise KeyError(name)
+
+    def write_extension(self, extension_id, path, version):
+        """写入扩展注册表项，空值不写入
+
+        已注册的扩展写入它所在的每个扩展项，否则写入 HKCU。强制安装列表中
+        指向本地文件的项随路径一起更新，避免与扩展项不一致。
+        """
+        values = {}
+        if path:
+            values["path"] = path
+        if version:
+            values["version"] = version
+        record = self.scanner.lookup(extension_id)
+        keys = dict(record["keys"]) if record else {}
+        for name, subkey in (keys or {LOCATION_HKCU: extension_id}).items():
+            root_key, key_path = self._location(name)
+            self.registry.write_values(root_key, f"{key_path}\\{subkey}", values)
+        forcelist = record["policies"].get(LOCATION_FORCELIST, []) if record else []
+        if path and any(forcelist_path(value) is not None for value in forcelist):
+            root_key, list_path = self._location(LOCATION_FORCELIST)
+            PolicyList(self.registry, root_key, list_path).upsert(extension_id, forcelist_value(extension_id, path))
+        self.registry.flush()
+        self.record_event(extension_id, EVENT_WRITE, path, version)
+
+    def delete_extension(self, extension_id):
+        """从所有注册位置（扩展项和策略列表）删除扩展
+
+        只要有一处删除成功即视为成功，全部失败时抛出第一个错误。
+        """
+        record = self.scanner.lookup(extension_id)
+        if record is None:
+            self.registry.delete_key(self.root_key, f"{self.reg_path}\\{extension_id}")
+            self.registry.flush()
+            self.record_event(extension_id, EVENT_REMOVE)
+            return
+
+        errors = []
+        removed = False
+        for name, subkey in record["keys"].items():
+            root_key, key_path = self._location(name)
+            try:
+                self.registry.delete_key(root_key, f"{key_path}\\{subkey}")
+                removed = True
+            except OSError as e:
+                print(f"× 删除 {name} 中的 {extension_id} 失败: {str(e)}")
+                errors.append(e)
+        for name in record["policies"]:
+            root_key, list_path = self._location(name)
+            try:
+                PolicyList(self.registry, root_key, list_path).remove_all(extension_id)
+                removed = True
+            except OSError as e:
+                print(f"× 从{name}删除 {extension_id} 失败: {str(e)}")
+                errors.append(e)
+        self.registry.flush()
+        if not removed and errors:
+            raise errors[0]
+        self.record_event(extension_id, EVENT_REMOVE)
+
+    def record_event(self, extension_id, action, path="", version=""):
+        """在扩展清单中记录一次添加、修改或删除，失败时只输出提示"""
+        if self.inventory is None:
+            return
+        try:
+            self.inventory.record_event(extension_id, action, path, version)
+        except Exception as e:
+            print(f"写入扩展清单失败: {str(e)}")
+
+    def get_inventory_hashes(self, extension_ids):
+        """扩展清单中记录的CRX文件哈希，返回 {扩展ID: SHA-256}"""
+        if self.inventory is None or not extension_ids:
+            return {}
+        try:
+            return self.inventory.hashes(extension_ids)
+        except Exception as e:
+            print(f"读取扩展清单失败: {str(e)}")
+            return {}
+
+    def record_extensions(self, extensions):
+        """在扩展清单中记录扫描到的扩展，失败时只输出提示"""
+        if self.inventory is None or not extensions:
+            return
+        try:
+            self.inventory.record_extensions(extensions)
+        except Exception as e:
+            print(f"写入扩展清单失败: {str(e)}")
+
+    def scan_registry_extensions(self, on_batch=None, batch_size=SCAN_BATCH_SIZE, cancel_event=None):
+        """扫描所有注册位置中的扩展，不访问网络
+
+        同一扩展在各位置的信息合并为一条，附带注册位置和不一致之处。
+        缓存中没有名称的扩展先以扩展ID作为名称，每扫描 batch_size 个扩展
+        调用一次 on_batch(扩展列表)。同一批扩展的文件状态并发检查。
+        返回 (所有扩展, 需要获取名称的扩展)。
+        """
+        extensions = []
+        unresolved = []
+        
+        # 并发读取所有注册位置，每个位置只读取一次
+        records = list(self.scanner.scan().values())
+        for start in range(0, len(records), batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            chunk = records[start:start + batch_size]
+            statuses = self.path_checker.check_many([record["path"] for record in chunk])
+            batch = []
+            for record in chunk:
+                extension_id = record["id"]
+                ext_info = self._build_ext_info(record, statuses[record["path"]])
+                if ext_info["status"] == STATUS_OK and not self.name_cache.get(extension_id):
+                    # 缓存中没有的名称稍后统一获取，暂时显示扩展ID
+                    unresolved.append(ext_info)
+                batch.append(ext_info)
+            
+            extensions.extend(batch)
+            if on_batch:
+                on_batch(batch)
+        
+        self.record_extensions(extensions)
+        return extensions, unresolved
+
+    def resolve_missing_names(self, unresolved, on_name=None, cancel_event=None):
+        """为扫描时缺少名称的扩展确定名称
+
+        依次尝试manifest.json（有磁盘缓存）、离线名称库、扩展商店，最后使用扩展ID。
+        每确定一个扩展的名称就调用 on_name(扩展信息)。
+        """
+        pending = {ext_info["id"]: ext_info for ext_info in unresolved}
+
+        def finish(extension_id, name):
+            ext_info = pending.pop(extension_id, None)
+            if ext_info is None:
+                return
+            # 最后才使用扩展ID作为名称
+            ext_info["name"] = name or extension_id
+            if on_name:
+                on_name(ext_info)
+
+        # 先从manifest.json中读取，文件没有变化时直接使用缓存
+        for extension_id, ext_info in list(pending.items()):
+            if cancel_event is not None and cancel_event.is_set():
+                self.save_manifest_cache()
+                return
+            name = self.get_extension_name_from_manifest(ext_info["path"])
+            if name:
+                finish(extension_id, name)
+        self.save_manifest_cache()
+        
+        # 再查找离线名称库，都没有时才访问网络
+        for extension_id, name in self.get_bundle_names(list(pending)).items():
+            finish(extension_id, name)
+
+        # 并发从扩展商店获取缺失的名称
+        self.resolve_extension_names(list(pending), on_result=finish, cancel_event=cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        
+        # 仍在失败等待期内、没有发起请求的扩展
+        for extension_id in list(pending):
+            finish(extension_id, "")
+
+    def get_registry_extensions(self):
+        extensions, unresolved = self.scan_registry_extensions()
+        self.resolve_missing_names(unresolved)
+        
+        # 过期的商店名称在后台更新，下次刷新时生效
+        self.refresh_stale_names()
+        
+        return extensions
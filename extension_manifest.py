@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import threading
+
+from crx_parser import CrxFile
+
+MANIFEST_CACHE_VERSION = 1
+
+# 解析 __MSG_*__ 时优先使用的语言，其后是扩展的 default_locale
+PREFERRED_LOCALES = ("zh_CN", "zh")
+
+# manifest 中可能使用 __MSG_*__ 的字段
+LOCALIZED_FIELDS = ("name", "short_name", "description")
+
+_MESSAGE_PATTERN = re.compile(r'__MSG_(\w+?)__')
+
+
+def _icon_path(manifest):
+    """尺寸最大的图标，没有 icons 时使用工具栏按钮的图标"""
+    icons = manifest.get("icons")
+    if not isinstance(icons, dict) or not icons:
+        action = manifest.get("action") or manifest.get("browser_action") or {}
+        icons = action.get("default_icon") if isinstance(action, dict) else None
+        if isinstance(icons, str):
+            return icons
+        if not isinstance(icons, dict) or not icons:
+            return ""
+
+    def size(key):
+        try:
+            return int(key)
+        except (TypeError, ValueError):
+            return 0
+    return icons[max(icons, key=size)]
+
+
+def _load_messages(crx, default_locale):
+    """读取 _locales/<语言>/messages.json，返回 {小写的消息名: 内容}
+
+    优先语言中没有的消息使用 default_locale 中的文本。
+    """
+    messages = {}
+    for locale in (default_locale,) + PREFERRED_LOCALES[::-1]:
+        if not locale:
+            continue
+        try:
+            data = json.loads(crx.read(f"_locales/{locale}/messages.json").decode('utf-8-sig'))
+        except (KeyError, ValueError):
+            continue
+        # 消息名不区分大小写
+        messages.update((key.lower(), value.get("message", "")) for key, value in data.items()
+                        if isinstance(value, dict))
+    return messages
+
+
+def read_manifest_info(crx):
+    """从已打开的 CrxFile 中读取 manifest 的主要信息，__MSG_*__ 替换为对应语言的文本"""
+    manifest = crx.manifest()
+    info = {
+        "id": crx.extension_id,
+        "name": manifest.get("name", ""),
+        "short_name": manifest.get("short_name", ""),
+        "version": manifest.get("version", ""),
+        "description": manifest.get("description", ""),
+        "permissions": list(manifest.get("permissions", [])) + list(manifest.get("host_permissions", [])),
+        "icon": _icon_path(manifest),
+        "default_locale": manifest.get("default_locale", ""),
+    }
+
+    if any(_MESSAGE_PATTERN.search(str(info[field])) for field in LOCALIZED_FIELDS):
+        messages = _load_messages(crx, info["default_locale"])
+        for field in LOCALIZED_FIELDS:
+            info[field] = _MESSAGE_PATTERN.sub(
+                lambda match: messages.get(match.group(1).lower(), ""), str(info[field])).strip()
+    return info
+
+
+class ManifestCache:
+    """CRX文件中 manifest 信息的磁盘缓存
+
+    以 (路径, 文件大小, 修改时间) 为键，文件没有变化时直接使用缓存的结果，
+    不打开CRX文件，也不访问网络。save() 通过临时文件加重命名写入。
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self._entries = {}  # 规范化的路径 -> {"size", "mtime", "info"}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, cache_file):
+        cache = cls(cache_file)
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cache
+        if data.get("version") == MANIFEST_CACHE_VERSION:
+            cache._entries = data.get("entries", {})
+        return cache
+
+    def save(self):
+        if not (self.cache_file and self._dirty):
+            return
+        with self._lock:
+            data = {"version": MANIFEST_CACHE_VERSION, "entries": dict(self._entries)}
+            self._dirty = False
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_file, self.cache_file)
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path, stat=None):
+        """返回CRX文件的 manifest 信息，文件不存在或读取失败时返回 None
+
+        stat 为 (修改时间, 大小)，不指定时调用 os.stat()。
+        """
+        try:
+            if stat is None:
+                st = os.stat(path)
+                stat = (st.st_mtime, st.st_size)
+        except OSError:
+            return None
+        mtime, size = stat
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry["size"] == size and entry["mtime"] == mtime:
+            return entry["info"]
+
+        try:
+            with CrxFile(path) as crx:
+                info = read_manifest_info(crx)
+        except Exception as e:
+            # 读取失败也记录下来，文件没有变化时不再重复读取
+            print(f"读取manifest.json失败: {str(e)}")
+            info = None
+        with self._lock:
+            self._entries[key] = {"size": size, "mtime": mtime, "info": info}
+            self._dirty = True
+        return info
@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# 导入时每次写入数据库的记录数
+IMPORT_BATCH_SIZE = 1000
+
+# 导入时SQLite页缓存的大小（负数表示KiB），按ID随机插入时可减少页面换出
+IMPORT_CACHE_SIZE = -32768
+
+# 一次查询的扩展ID数量上限（SQLite 参数数量有限制）
+LOOKUP_CHUNK_SIZE = 500
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+_ID_PATTERN = re.compile(r'^[a-z]{32}$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bundle_names (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL DEFAULT '',
+    publisher TEXT NOT NULL DEFAULT ''
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bundle_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _normalize(extension_id, name, version, publisher):
+    """检查并规范化一条记录，无效时返回 None"""
+    extension_id = str(extension_id or "").strip().lower()
+    name = str(name or "").strip()
+    if not (_ID_PATTERN.match(extension_id) and name):
+        return None
+    return extension_id, name, str(version or ""), str(publisher or "")
+
+
+def _read_jsonl(path, counts):
+    """逐行读取JSON Lines文件，每行 {"id", "name", "version", "publisher"}"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                row = _normalize(record.get("id"), record.get("name"),
+                                 record.get("version"), record.get("publisher"))
+            except (ValueError, AttributeError):
+                row = None
+            if row is None:
+                counts["skipped"] += 1
+                continue
+            yield row
+
+
+def _read_sqlite(path, counts):
+    """从SQLite文件中第一个包含 id 和 name 列的表逐行读取"""
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        table = None
+        columns = set()
+        for (table_name,) in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'"):
+            table_columns = {row[1].lower() for row in source.execute(f'PRAGMA table_info("{table_name}")')}
+            if {"id", "name"} <= table_columns:
+                table, columns = table_name, table_columns
+                break
+        if table is None:
+            raise ValueError("SQLite文件中没有包含 id 和 name 列的表")
+        fields = ", ".join(field if field in columns else "''" for field in ("id", "name", "version", "publisher"))
+        # 游标逐行返回结果，不会一次读入整个表
+        for record in source.execute(f'SELECT {fields} FROM "{table}"'):
+            row = _normalize(*record)
+            if row is None:
+                counts["skipped"] += 1
+                continue
+            yield row
+    finally:
+        source.close()
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class NameBundle:
+    """离线扩展名称库
+
+    从预先生成的数据包（JSON Lines 或 SQLite 文件，内容为 扩展ID -> 名称、版本号、
+    发布者）导入本地SQLite数据库，按扩展ID建有索引。导入时逐行读取数据包并分批
+    写入，整个导入在一个事务中完成，百万条记录也不需要全部读入内存，导入期间
+    其他连接看到的仍是旧内容。
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        # 自动提交模式，事务由 import_file() 显式控制
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM bundle_names").fetchone()[0]
+
+    def info(self):
+        """最近一次导入的来源、时间和记录数"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, value FROM bundle_info"))
+
+    def lookup(self, extension_id):
+        """返回 {"name", "version", "publisher"}，没有记录时返回 None"""
+        return self.lookup_many([extension_id]).get(extension_id)
+
+    def lookup_many(self, extension_ids):
+        """批量查找，返回 {扩展ID: {"name", "version", "publisher"}}"""
+        extension_ids = list(dict.fromkeys(extension_ids))
+        results = {}
+        with self._lock:
+            for start in range(0, len(extension_ids), LOOKUP_CHUNK_SIZE):
+                chunk = extension_ids[start:start + LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT id, name, version, publisher FROM bundle_names WHERE id IN ({placeholders})", chunk)
+                for extension_id, name, version, publisher in rows:
+                    results[extension_id] = {"name": name, "version": version, "publisher": publisher}
+        return results
+
+    def import_file(self, path, replace=True):
+        """导入数据包，replace 为真时替换现有内容，返回 {"imported", "skipped"}
+
+        文件以 SQLite 文件头开始时按SQLite读取，否则按JSON Lines读取。
+        """
+        with open(path, 'rb') as f:
+            is_sqlite = f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+        counts = {"imported": 0, "skipped": 0}
+        rows = _read_sqlite(path, counts) if is_sqlite else _read_jsonl(path, counts)
+
+        with self._lock:
+            default_cache_size = self._conn.execute("PRAGMA cache_size").fetchone()[0]
+            self._conn.execute(f"PRAGMA cache_size = {IMPORT_CACHE_SIZE}")
+            try:
+                self._conn.execute("BEGIN")
+                if replace:
+                    self._conn.execute("DELETE FROM bundle_names")
+                for batch in _batches(rows, IMPORT_BATCH_SIZE):
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO bundle_names (id, name, version, publisher) VALUES (?, ?, ?, ?)",
+                        batch)
+                    counts["imported"] += len(batch)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO bundle_info (key, value) VALUES (?, ?)",
+                    [("source", os.path.abspath(path)), ("imported_at", str(int(time.time()))),
+                     ("imported", str(counts["imported"]))])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._conn.execute(f"PRAGMA cache_size = {default_cache_size}")
+        return counts
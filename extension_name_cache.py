@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_FORMAT_VERSION = 2
+
+# 日志文件超过该大小时合并进快照
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+# 名称来源
+SOURCE_MANUAL = "manual"    # 用户在界面中手动填写
+SOURCE_STORE = "store"      # 从扩展商店获取
+SOURCE_LEGACY = "legacy"    # 旧版缓存文件迁移而来，来源未知
+SOURCE_IMPORT = "import"    # 从其他电脑导出的快照导入
+
+
+class ExtensionNameCache:
+    """扩展名称缓存
+
+    每个条目记录名称、来源和获取时间。获取失败的扩展会被记住一段时间
+    （失败次数越多等待越久），过期的商店名称可在后台重新获取，
+    条目数量超过上限时按最近最少使用的顺序淘汰。clock 返回当前时间（秒），
+    默认为 time.time。
+
+    持久化分为快照文件和追加写入的日志文件（<快照>.journal）：修改先记录在
+    内存中，flush() 时一次性追加到日志并 fsync，compact() 把当前内容原子地
+    写成新快照并清空日志。快照总是通过临时文件加重命名替换，不会被写坏。
+    """
+
+    def __init__(self, negative_ttl=3600, max_negative_ttl=7 * 24 * 3600,
+                 positive_ttl=30 * 24 * 3600, max_entries=5000,
+                 cache_file=None, journal_compact_bytes=JOURNAL_COMPACT_BYTES, clock=time.time):
+        self.negative_ttl = negative_ttl
+        self.max_negative_ttl = max_negative_ttl
+        self.positive_ttl = positive_ttl
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+        self.journal_compact_bytes = journal_compact_bytes
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._pending = []  # 尚未写入日志的修改
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+
+    @property
+    def journal_file(self):
+        return self.cache_file + ".journal" if self.cache_file else None
+
+    @classmethod
+    def load(cls, cache_file, **kwargs):
+        """从快照和日志加载缓存，兼容旧版 {ID: 名称} 格式"""
+        cache = cls(cache_file=cache_file, **kwargs)
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_FORMAT_VERSION:
+                for extension_id, entry in data.get("entries", {}).items():
+                    cache._entries[extension_id] = entry
+            else:
+                for extension_id, name in data.items():
+                    cache._entries[extension_id] = cls._make_entry(name, SOURCE_LEGACY, 0)
+        journal_intact = cache._replay_journal()
+        cache._evict()
+        cache._pending = []
+        if not journal_intact:
+            # 日志末尾不完整，立即合并，避免后续记录追加在残缺行之后
+            cache.compact()
+        return cache
+
+    def _replay_journal(self):
+        """重放日志，返回日志是否完整"""
+        journal_file = self.journal_file
+        if not journal_file or not os.path.exists(journal_file):
+            return True
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 最后一行可能因崩溃而不完整，忽略
+                    return False
+                if record.get("op") == "set":
+                    self._entries[record["id"]] = record["entry"]
+                    self._entries.move_to_end(record["id"])
+                elif record.get("op") == "del":
+                    self._entries.pop(record["id"], None)
+        return True
+
+    def _record(self, op, extension_id, entry=None):
+        record = {"op": op, "id": extension_id}
+        if entry is not None:
+            record["entry"] = dict(entry)
+        self._pending.append(record)
+
+    def flush(self):
+        """把积累的修改一次性追加到日志文件，日志过大时合并进快照"""
+        if not self.cache_file:
+            return
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if pending:
+                lines = "".join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+                                for record in pending)
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+            journal_size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        if journal_size > self.journal_compact_bytes:
+            self.compact()
+
+    def compact(self):
+        """把当前内容原子地写成新快照并删除日志"""
+        if not self.cache_file:
+            return
+        with self._io_lock:
+            with self._lock:
+                data = {"version": CACHE_FORMAT_VERSION, "entries": dict(self._entries)}
+                self._pending = []
+            temp_file = self.cache_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.cache_file)
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+
+    def save(self, cache_file=None):
+        """将缓存写入文件（写成完整快照）"""
+        if cache_file:
+            self.cache_file = cache_file
+        self.compact()
+
+    @staticmethod
+    def _make_entry(name, source, fetched_at, failures=0, retry_after=0):
+        return {
+            "name": name,
+            "source": source,
+            "fetched_at": fetched_at,
+            "failures": failures,
+            "retry_after": retry_after,
+        }
+
+    def _evict(self):
+        # max_entries 为 None 时不限制条目数
+        if self.max_entries is None:
+            return
+        while len(self._entries) > self.max_entries:
+            extension_id, _ = self._entries.popitem(last=False)
+            self._record("del", extension_id)
+
+    def get(self, extension_id, default=None):
+        """返回缓存的名称，获取失败的条目视为不存在"""
+        with self._lock:
+            entry = self._entries.get(extension_id)
+            if entry is None or not entry["name"]:
+                return default
+            self._entries.move_to_end(extension_id)
+            return entry["name"]
+
+    def get_entry(self, extension_id):
+        with self._lock:
+            entry = self._entries.get(extension_id)
+            return dict(entry) if entry else None
+
+    def set(self, extension_id, name, source=SOURCE_MANUAL):
+        """记录名称及其来源"""
+        with self._lock:
+            self._entries[extension_id] = self._make_entry(name, source, self.clock())
+            self._entries.move_to_end(extension_id)
+            self._record("set", extension_id, self._entries[extension_id])
+            self._evict()
+
+    def record_failure(self, extension_id):
+        """记录一次获取失败，按失败次数指数退避"""
+        with self._lock:
+            entry = self._entries.get(extension_id)
+            if entry and entry["name"]:
+                # 已有名称时保留旧名称，只推迟下次刷新
+                entry["retry_after"] = self.clock() + self.negative_ttl
+                self._record("set", extension_id, entry)
+                return
+            failures = (entry["failures"] if entry else 0) + 1
+            ttl = min(self.negative_ttl * (2 ** (failures - 1)), self.max_negative_ttl)
+            now = self.clock()
+            self._entries[extension_id] = self._make_entry("", SOURCE_STORE, now, failures, now + ttl)
+            self._entries.move_to_end(extension_id)
+            self._record("set", extension_id, self._entries[extension_id])
+            self._evict()
+
+    def should_lookup(self, extension_id):
+        """是否需要从扩展商店获取名称"""
+        with self._lock:
+            entry = self._entries.get(extension_id)
+            if entry is None:
+                return True
+            if entry["name"]:
+                return False
+            return self.clock() >= entry["retry_after"]
+
+    def stale_ids(self):
+        """返回已过期、需要在后台重新获取的商店名称"""
+        now = self.clock()
+        with self._lock:
+            return [extension_id for extension_id, entry in self._entries.items()
+                    if entry["name"] and entry["source"] == SOURCE_STORE
+                    and now - entry["fetched_at"] >= self.positive_ttl
+                    and now >= entry["retry_after"]]
+
+    def __contains__(self, extension_id):
+        """是否有该扩展的条目，包括获取失败的记录（此时 get() 返回 None）"""
+        with self._lock:
+            return extension_id in self._entries
+
+    def __getitem__(self, extension_id):
+        name = self.get(extension_id)
+        if name is None:
+            raise KeyError(extension_id)
+        return name
+
+    def __setitem__(self, extension_id, name):
+        self.set(extension_id, name, SOURCE_MANUAL)
+
+    def __delitem__(self, extension_id):
+        with self._lock:
+            del self._entries[extension_id]
+            self._record("del", extension_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
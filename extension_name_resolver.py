@@ -0,0 +1,404 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# 扩展商店地址模板，可替换为本地测试服务器
+CRXSOSO_URL = "https://www.crxsoso.com/webstore/detail/{}"
+WEBSTORE_URL = "https://chrome.google.com/webstore/detail/{}"
+
+# 熔断：连续失败次数达到阈值后暂停使用该来源，等待一段时间后放行一个试探请求
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+
+# 重试预算：每个请求积累的重试额度，以及额度上限
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MAX = 10
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 2.0
+
+# 自适应超时的下限，上限为构造时的 timeout
+MIN_TIMEOUT_SECONDS = 0.5
+
+# 还没有耗时数据时，等待多久后向下一个来源发出对冲请求
+DEFAULT_HEDGE_DELAY_SECONDS = 1.0
+
+# 每个来源保留的最近耗时样本数量
+LATENCY_SAMPLES = 1000
+
+
+class ProviderError(Exception):
+    """请求失败（超时、连接错误或服务器错误），可以重试"""
+
+
+class CircuitBreaker:
+    """连续失败 failure_threshold 次后断开，reset_seconds 秒后只放行一个试探请求"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.probing = True
+            return True
+
+    def release(self):
+        """放弃 allow() 放行但没有发出的试探请求"""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class RetryBudget:
+    """重试额度：每个请求增加 ratio，每次重试消耗 1，重试总量不超过请求量的 ratio 倍"""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, max_tokens=RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_retry(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE_SECONDS, cap=BACKOFF_MAX_SECONDS):
+    """第 attempt 次重试前的等待时间：指数退避加完全随机抖动"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class NameProvider:
+    """扩展名称的一个来源
+
+    fetch() 返回名称，找不到时返回空字符串，请求失败时抛出 ProviderError。
+    每个来源有自己的熔断器、重试预算、自适应超时和统计计数。
+    """
+
+    name = ""
+
+    def __init__(self, url_template):
+        self.url_template = url_template
+        self.breaker = CircuitBreaker()
+        self.retry_budget = RetryBudget()
+        self.latency_avg = None  # 耗时的指数滑动平均（秒）
+        self.latency_dev = 0.0   # 耗时偏差的指数滑动平均
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {"requests": 0, "hits": 0, "misses": 0, "failures": 0,
+                         "retries": 0, "hedges": 0, "short_circuits": 0}
+        self._lock = threading.Lock()
+
+    def fetch(self, get, extension_id, timeout):
+        raise NotImplementedError
+
+    def timeout(self, max_timeout):
+        """按最近的耗时计算超时（平均值加4倍偏差），没有数据时使用 max_timeout"""
+        with self._lock:
+            if self.latency_avg is None:
+                return max_timeout
+            return max(MIN_TIMEOUT_SECONDS, min(max_timeout, self.latency_avg + 4 * self.latency_dev))
+
+    def hedge_delay(self):
+        """等待多久没有结果时向下一个来源发出对冲请求（平均值加2倍偏差）"""
+        with self._lock:
+            if self.latency_avg is None:
+                return DEFAULT_HEDGE_DELAY_SECONDS
+            return self.latency_avg + 2 * self.latency_dev
+
+    def count(self, counter, latency=None):
+        with self._lock:
+            self.counters[counter] += 1
+            if latency is None:
+                return
+            self.latencies.append(latency)
+            if self.latency_avg is None:
+                self.latency_avg = latency
+                self.latency_dev = latency / 2
+            else:
+                self.latency_dev += 0.25 * (abs(latency - self.latency_avg) - self.latency_dev)
+                self.latency_avg += 0.125 * (latency - self.latency_avg)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.counters)
+        stats["circuit"] = self.breaker.state
+        for label, fraction in (("p50_ms", 0.50), ("p99_ms", 0.99)):
+            stats[label] = round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 1) \
+                if latencies else 0.0
+        return stats
+
+    @staticmethod
+    def _check_status(response):
+        if response.status_code == 429 or response.status_code >= 500:
+            raise ProviderError(f"HTTP {response.status_code}")
+
+
+class CrxsosoProvider(NameProvider):
+    name = "crxsoso"
+
+    def __init__(self, url_template=CRXSOSO_URL):
+        super().__init__(url_template)
+
+    def fetch(self, get, extension_id, timeout):
+        response = get(self.url_template.format(extension_id), timeout=timeout)
+        self._check_status(response)
+        if response.status_code != 200:
+            return ""
+        # 从页面中提取扩展名称，使用新的HTML结构
+        match = re.search(r'<div[^>]*class="name el2"[^>]*>(.*?)<!---->', response.text, re.DOTALL)
+        if match and match.group(1).strip():
+            name = match.group(1).strip()
+            print(f"√ 从crxsoso.com获取到名称: {name}")
+            return name
+
+        # 如果上面的正则没匹配到，尝试其他可能的模式
+        match = re.search(r'<div[^>]*class="name el2"[^>]*>(.*?)</div>', response.text, re.DOTALL)
+        if match and match.group(1).strip():
+            name = match.group(1).strip()
+            print(f"√ 从crxsoso.com获取到名称: {name}")
+            return name
+        return ""
+
+
+class WebstoreProvider(NameProvider):
+    name = "webstore"
+
+    def __init__(self, url_template=WEBSTORE_URL):
+        super().__init__(url_template)
+
+    def fetch(self, get, extension_id, timeout):
+        response = get(self.url_template.format(extension_id), timeout=timeout, allow_redirects=True)
+        self._check_status(response)
+        if response.status_code != 200:
+            return ""
+        # 从重定向后的URL中提取扩展名称
+        final_url = response.url
+        if '/detail/' in final_url:
+            parts = final_url.split('/detail/')
+            if len(parts) > 1:
+                name_part = parts[1].split('/')[0]
+                if name_part and name_part != extension_id:
+                    name = name_part.replace('-', ' ').title()
+                    print(f"√ 从Chrome Web Store URL获取到名称: {name}")
+                    return name
+
+        # 如果无法从URL获取，尝试从页面内容获取
+        match = re.search(r'<h1 class="e-f-w">(.*?)</h1>', response.text)
+        if match and match.group(1).strip():
+            name = match.group(1).strip()
+            print(f"√ 从Chrome Web Store页面获取到名称: {name}")
+            return name
+        return ""
+
+
+class ExtensionNameResolver:
+    """从扩展商店批量并发获取扩展名称
+
+    按顺序尝试各个来源（默认 crxsoso.com、Chrome Web Store），前一个来源找不到
+    名称时使用下一个；前一个来源在 hedge_delay() 内没有结果时，同时向下一个来源
+    发出对冲请求，先得到的名称为准。熔断中的来源直接跳过。
+    """
+
+    def __init__(self, max_workers=8, per_host_limit=4, timeout=5,
+                 crxsoso_url=CRXSOSO_URL, webstore_url=WEBSTORE_URL, providers=None):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.crxsoso_url = crxsoso_url
+        self.webstore_url = webstore_url
+        self.providers = providers or [CrxsosoProvider(crxsoso_url), WebstoreProvider(webstore_url)]
+
+        # requests 及其依赖导入较慢，只在真正需要访问网络时导入
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._request_error = requests.RequestException
+
+        # 共享的长连接会话，连接池大小与工作线程数一致
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # 每个主机的并发上限
+        self._host_semaphores = {}
+        self._host_lock = threading.Lock()
+
+        # 执行各来源请求的线程池，对冲时同一扩展会同时占用多个线程
+        self._provider_executor = ThreadPoolExecutor(max_workers=max_workers * len(self.providers))
+        self._closed = threading.Event()
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+    def _get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._host_semaphore(url):
+            try:
+                return self.session.get(url, **kwargs)
+            except self._request_error as e:
+                raise ProviderError(str(e)) from e
+
+    def _call_provider(self, provider, extension_id):
+        """向一个来源请求名称，失败时在重试预算内退避重试，最终失败返回 None"""
+        provider.retry_budget.record_request()
+        for attempt in range(MAX_ATTEMPTS):
+            if self._closed.is_set():
+                # 对冲中落后的请求在关闭后不再重试
+                return None
+            # 先问熔断器，断开期间不消耗重试额度
+            if attempt and not provider.breaker.allow():
+                break
+            if attempt and not provider.retry_budget.try_retry():
+                provider.breaker.release()
+                break
+            if attempt:
+                provider.count("retries")
+                time.sleep(backoff_delay(attempt - 1))
+            start = time.perf_counter()
+            provider.count("requests")
+            try:
+                name = provider.fetch(self._get, extension_id, provider.timeout(self.timeout))
+            except ProviderError as e:
+                if self._closed.is_set():
+                    return None
+                provider.breaker.record_failure()
+                provider.count("failures")
+                print(f"从{provider.name}获取名称失败: {str(e)}")
+                continue
+            except Exception as e:
+                # 页面内容无法解析，不重试
+                provider.breaker.record_success()
+                provider.count("misses")
+                print(f"从{provider.name}获取名称失败: {str(e)}")
+                return ""
+            provider.breaker.record_success()
+            provider.count("hits" if name else "misses", time.perf_counter() - start)
+            return name
+        return None
+
+    def resolve(self, extension_id):
+        """获取单个扩展的名称，失败时返回空字符串"""
+        remaining = list(self.providers)
+        running = {}  # future -> 来源
+        hedge_from = None  # 可以对冲的正在进行的请求所属的来源
+
+        def start_next(hedge=False):
+            while remaining:
+                provider = remaining.pop(0)
+                if not provider.breaker.allow():
+                    provider.count("short_circuits")
+                    continue
+                if hedge:
+                    provider.count("hedges")
+                running[self._provider_executor.submit(self._call_provider, provider, extension_id)] = provider
+                return provider
+            return None
+
+        try:
+            hedge_from = start_next()
+            while running:
+                timeout = hedge_from.hedge_delay() if hedge_from is not None and remaining else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # 当前来源响应慢，同时请求下一个来源
+                    hedge_from = start_next(hedge=True)
+                    continue
+                for future in done:
+                    running.pop(future)
+                    name = future.result()
+                    if name:
+                        return name
+                if not running:
+                    hedge_from = start_next()
+        except Exception as e:
+            print(f"从扩展商店获取名称失败: {str(e)}")
+        return ""
+
+    def resolve_many(self, extension_ids, on_result=None, cancel_event=None):
+        """并发获取一批扩展的名称
+
+        每得到一个结果就调用 on_result(extension_id, name)，
+        返回 {扩展ID: 名称} 字典，获取失败的名称为空字符串。
+        cancel_event 被设置后不再发起新的请求，已取消的扩展不出现在结果中。
+        """
+        pending = list(dict.fromkeys(extension_ids))
+        results = {}
+        if not pending:
+            return results
+
+        workers = min(self.max_workers, len(pending))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {executor.submit(self.resolve, extension_id): extension_id
+                       for extension_id in pending}
+            for future in as_completed(futures):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                extension_id = futures[future]
+                name = future.result()
+                results[extension_id] = name
+                if on_result:
+                    on_result(extension_id, name)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def stats(self):
+        """各来源的请求、命中、未找到、失败、重试、对冲和熔断跳过次数及耗时"""
+        return {provider.name: provider.stats() for provider in self.providers}
+
+    def close(self):
+        self._closed.set()
+        self._provider_executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
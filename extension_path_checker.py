@@ -0,0 +1,155 @@
+import os
+import queue
+import threading
+import time
+
+# 扩展文件状态
+STATUS_OK = "正常"
+STATUS_MISSING = "文件缺失"
+STATUS_UNREACHABLE = "无法访问"  # 检查超时，多见于无响应的网络共享
+STATUS_REMOTE = "在线安装"      # 强制安装列表中的更新地址，没有本地文件
+
+# 单个路径的检查超时（秒）
+PATH_CHECK_TIMEOUT = 2.0
+
+# 同时检查的路径数量
+PATH_CHECK_WORKERS = 16
+
+# 检查结果的有效期（秒），有效期内同一路径不再重复检查
+PATH_CHECK_INTERVAL = 60
+
+
+def share_of(path):
+    """UNC路径所在的共享（\\\\服务器\\共享），本地路径返回 None"""
+    normalized = path.replace("/", "\\")
+    if not normalized.startswith("\\\\"):
+        return None
+    parts = normalized[2:].split("\\")
+    return "\\\\" + "\\".join(parts[:2]).lower()
+
+
+class PathStatusChecker:
+    """并发检查扩展文件是否存在，带超时和结果缓存
+
+    每个路径的检查在后台线程中调用 os.stat()，超过 timeout 秒没有返回时
+    记为“无法访问”，卡住的线程会被替换，不影响其余路径的检查。同一网络共享
+    中已有路径超时后，该共享中尚未开始检查的路径直接记为“无法访问”。
+    检查结果连同文件的修改时间和大小按路径缓存，interval 秒内不再检查。
+    """
+
+    def __init__(self, timeout=PATH_CHECK_TIMEOUT, max_workers=PATH_CHECK_WORKERS,
+                 interval=PATH_CHECK_INTERVAL):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.interval = interval
+        self._cache = {}  # 路径 -> (检查时间, 状态, 修改时间, 大小)
+        self._lock = threading.Lock()
+
+    def stat(self, path):
+        """缓存中的 (修改时间, 大小)，文件不存在或未检查过时返回 None"""
+        with self._lock:
+            entry = self._cache.get(path)
+        if entry is None or entry[1] != STATUS_OK:
+            return None
+        return entry[2], entry[3]
+
+    def invalidate(self, path=None):
+        """删除一个路径的缓存结果，不指定路径时清空缓存"""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(path, None)
+
+    def check(self, path, force=False):
+        return self.check_many([path], force=force)[path]
+
+    def check_many(self, paths, force=False):
+        """检查一批路径，返回 {路径: 状态}"""
+        results = {}
+        pending = []
+        now = time.monotonic()
+        with self._lock:
+            for path in dict.fromkeys(paths):
+                entry = self._cache.get(path)
+                if not path:
+                    results[path] = STATUS_MISSING
+                elif "://" in path:
+                    results[path] = STATUS_REMOTE
+                elif not force and entry is not None and now - entry[0] < self.interval:
+                    results[path] = entry[1]
+                else:
+                    pending.append(path)
+        if pending:
+            results.update(self._check_pending(pending))
+        return results
+
+    def _check_pending(self, paths):
+        tasks = queue.Queue()
+        for path in paths:
+            tasks.put(path)
+        done = queue.Queue()
+        started = {}  # 路径 -> 开始检查的时间
+        started_lock = threading.Lock()
+
+        def worker():
+            while True:
+                try:
+                    path = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                with started_lock:
+                    if path in results:
+                        # 所在的共享已超时
+                        continue
+                    started[path] = time.monotonic()
+                try:
+                    st = os.stat(path)
+                    done.put((path, STATUS_OK, st.st_mtime, st.st_size))
+                except OSError:
+                    done.put((path, STATUS_MISSING, None, None))
+
+        def start_worker():
+            # 守护线程：卡在无响应的网络路径上时不会阻止程序退出
+            threading.Thread(target=worker, daemon=True).start()
+
+        results = {}
+        timed_out_shares = set()
+        for _ in range(min(self.max_workers, len(paths))):
+            start_worker()
+
+        while len(results) < len(paths):
+            try:
+                path, status, mtime, size = done.get(timeout=0.05)
+            except queue.Empty:
+                path = None
+            now = time.monotonic()
+            with started_lock:
+                if path is not None and started.pop(path, None) is not None:
+                    results[path] = status
+                    self._store(path, status, mtime, size)
+                # started 中只剩正在检查的路径，数量不超过线程数
+                new_shares = set()
+                for started_path, started_at in list(started.items()):
+                    if now - started_at < self.timeout:
+                        continue
+                    del started[started_path]
+                    results[started_path] = STATUS_UNREACHABLE
+                    self._store(started_path, STATUS_UNREACHABLE, None, None)
+                    share = share_of(started_path)
+                    if share and share not in timed_out_shares:
+                        new_shares.add(share)
+                    # 替换卡住的线程
+                    start_worker()
+                if new_shares:
+                    timed_out_shares |= new_shares
+                    for pending_path in paths:
+                        if pending_path not in results and pending_path not in started \
+                                and share_of(pending_path) in new_shares:
+                            results[pending_path] = STATUS_UNREACHABLE
+                            self._store(pending_path, STATUS_UNREACHABLE, None, None)
+        return results
+
+    def _store(self, path, status, mtime, size):
+        with self._lock:
+            self._cache[path] = (time.monotonic(), status, mtime, size)
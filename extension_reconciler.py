@@ -0,0 +1,321 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from crx_parser import CrxFile
+from crx_store import hash_file
+from extension_inventory import EVENT_REMOVE, TOOL_INSTALLER
+from policy_list import PolicyList
+from registry_backend import HKEY_CURRENT_USER, HKEY_LOCAL_MACHINE
+
+# 期望状态文件中的注册表位置
+HIVE_HKLM = "HKLM"
+HIVE_HKCU = "HKCU"
+
+# 计划中的操作
+ACTION_ADD = "add"
+ACTION_UPDATE = "update"
+ACTION_REMOVE = "remove"
+
+# 计划中操作的对象
+TARGET_FILE = "file"
+TARGET_KEY = "key"
+TARGET_FORCELIST = "forcelist"
+TARGET_ALLOWLIST = "allowlist"
+
+ACTION_SYMBOLS = {ACTION_ADD: "+", ACTION_UPDATE: "~", ACTION_REMOVE: "-"}
+
+_ID_PATTERN = re.compile(r'^[a-z]{32}$')
+
+
+def load_desired_state(path):
+    """读取期望状态文件
+
+    格式为 {"prune": true, "hives": ["HKLM"], "extensions": [{"crx", "id", "version",
+    "hives", "force", "allow"}]}。crx 为必填项，相对路径相对于期望状态文件所在目录；
+    id 和 version 默认从CRX文件中读取；hives 默认为 ["HKLM"]；force 和 allow 默认为 true。
+    prune 必须明确写为 true 才会删除文件中没有列出的扩展，默认为 false。
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get("extensions"), list):
+        raise ValueError("期望状态文件中缺少 extensions 列表")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for index, item in enumerate(data["extensions"], start=1):
+        if not isinstance(item, dict) or not item.get("crx"):
+            raise ValueError(f"第 {index} 个扩展缺少 crx")
+        hives = [str(hive).upper() for hive in item.get("hives", [HIVE_HKLM])]
+        for hive in hives:
+            if hive not in (HIVE_HKLM, HIVE_HKCU):
+                raise ValueError(f"第 {index} 个扩展的 hives 只能是 {HIVE_HKLM} 或 {HIVE_HKCU}：{hive}")
+        entries.append({
+            "crx": os.path.join(base_dir, item["crx"]),
+            "id": str(item.get("id") or "").lower(),
+            "version": str(item.get("version") or ""),
+            "hives": hives,
+            "force": bool(item.get("force", True)),
+            "allow": bool(item.get("allow", True)),
+        })
+
+    managed_hives = [str(hive).upper() for hive in data.get("hives", [])]
+    for entry in entries:
+        managed_hives.extend(entry["hives"])
+    return {
+        "extensions": entries,
+        "prune": data.get("prune", False) is True,
+        "hives": list(dict.fromkeys(managed_hives)) or [HIVE_HKLM],
+    }
+
+
+def _same_content(src_path, dest_path):
+    """安装位置的文件与CRX文件内容相同时返回 True，先比较大小"""
+    try:
+        if os.path.getsize(src_path) != os.path.getsize(dest_path):
+            return False
+    except OSError:
+        return False
+    return hash_file(src_path) == hash_file(dest_path)
+
+
+class ExtensionReconciler:
+    """把注册表调整为期望状态文件描述的扩展集合
+
+    plan() 只读取一次注册表中的扩展项和两个策略列表，与期望状态比较后返回
+    最少的添加、更新和删除操作，不写入注册表；apply() 执行这些操作。
+    已经处于期望状态时计划为空，重复运行不会产生任何写入。
+    文件复制、注册和策略列表的写法与 ChromeExtensionInstaller 相同。
+    """
+
+    def __init__(self, installer, max_workers=8):
+        self.installer = installer
+        self.registry = installer.registry
+        self.max_workers = max_workers
+        self.hive_keys = {
+            HIVE_HKLM: list(installer.registry_paths['chrome_extensions']),
+            HIVE_HKCU: [(HKEY_CURRENT_USER, r"Software\Google\Chrome\Extensions")],
+        }
+        self.policy_keys = {
+            TARGET_FORCELIST: installer.registry_paths['policies'][0],
+            TARGET_ALLOWLIST: installer.registry_paths['policies'][1],
+        }
+        self.policy_lists = {}
+
+    def snapshot(self, hives):
+        """读取指定位置的扩展项和策略列表，返回 {(根键, 路径): {扩展ID: 值}}"""
+        keys = {}
+        for hive in hives:
+            for root_key, path in self.hive_keys[hive]:
+                keys[(root_key, path)] = {extension_id.lower(): values for extension_id, values
+                                          in self.registry.read_subkey_values(root_key, path).items()}
+        self.policy_lists = {target: PolicyList(self.registry, root_key, path)
+                             for target, (root_key, path) in self.policy_keys.items()}
+        return keys
+
+    def _inspect(self, entry):
+        """读取CRX文件的扩展ID和版本号，确定安装位置并检查是否需要复制"""
+        entry = dict(entry, error="")
+        try:
+            if not (entry["id"] and entry["version"]):
+                with CrxFile(entry["crx"]) as crx:
+                    entry["id"] = entry["id"] or crx.extension_id
+                    if not entry["version"]:
+                        entry["version"] = crx.manifest().get('version', '') or "1.0"
+            if not _ID_PATTERN.match(entry["id"]):
+                raise ValueError(f"扩展ID格式不正确：{entry['id']}")
+            entry["dest"] = os.path.join(self.installer._extension_dir(), os.path.basename(entry["crx"]))
+            entry["copy"] = not _same_content(entry["crx"], entry["dest"])
+        except Exception as e:
+            entry["error"] = str(e)
+        return entry
+
+    def plan(self, desired):
+        """返回 (操作列表, 错误列表)；有错误时不应执行计划"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            entries = list(executor.map(self._inspect, desired["extensions"]))
+        checks = self.installer.verify_files([entry["crx"] for entry in entries if not entry["error"]])
+        for entry in entries:
+            check = checks.get(entry["crx"])
+            if entry["error"] or check is None:
+                continue
+            if not check["valid"]:
+                entry["error"] = "；".join(check["errors"])
+            elif check["extension_id"] != entry["id"]:
+                entry["error"] = f"扩展ID与CRX文件不一致：{entry['id']} != {check['extension_id']}"
+        errors = [f"{entry['crx']}: {entry['error']}" for entry in entries if entry["error"]]
+        ids = [entry["id"] for entry in entries if not entry["error"]]
+        errors.extend(f"扩展ID重复：{extension_id}" for extension_id in sorted(
+            {extension_id for extension_id in ids if ids.count(extension_id) > 1}))
+        # 安装位置只取CRX文件名，不同目录下的同名文件会互相覆盖
+        dests = {}
+        for entry in entries:
+            if not entry["error"]:
+                dests.setdefault(os.path.normcase(entry["dest"]), []).append(entry["crx"])
+        errors.extend(f"安装位置重复：{', '.join(crx_paths)} 都会复制到 {os.path.basename(crx_paths[0])}"
+                      for crx_paths in dests.values() if len(crx_paths) > 1)
+        if errors:
+            return [], errors
+
+        keys = self.snapshot(desired["hives"])
+        steps = []
+        wanted_keys = {key: set() for key in keys}
+        wanted_policies = {TARGET_FORCELIST: set(), TARGET_ALLOWLIST: set()}
+        for entry in entries:
+            extension_id = entry["id"]
+            if entry["copy"]:
+                steps.append({"action": ACTION_UPDATE if os.path.exists(entry["dest"]) else ACTION_ADD,
+                              "target": TARGET_FILE, "id": extension_id, "crx": entry["crx"],
+                              "dest": entry["dest"], "version": entry["version"]})
+
+            values = {"path": entry["dest"], "version": entry["version"]}
+            for hive in entry["hives"]:
+                for key in self.hive_keys[hive]:
+                    wanted_keys[key].add(extension_id)
+                    current = keys[key].get(extension_id)
+                    if current is None:
+                        steps.append({"action": ACTION_ADD, "target": TARGET_KEY, "id": extension_id,
+                                      "key": key, "values": values, "old": {}})
+                    elif any(current.get(name) != value for name, value in values.items()):
+                        steps.append({"action": ACTION_UPDATE, "target": TARGET_KEY, "id": extension_id,
+                                      "key": key, "values": values, "old": current})
+
+            policy_values = {
+                TARGET_FORCELIST: self.installer._forcelist_value(extension_id, entry["dest"]) if entry["force"] else None,
+                TARGET_ALLOWLIST: extension_id if entry["allow"] else None,
+            }
+            for target, value in policy_values.items():
+                if value is None:
+                    continue
+                wanted_policies[target].add(extension_id)
+                current = self.policy_lists[target].get(extension_id)
+                if current != value:
+                    steps.append({"action": ACTION_ADD if current is None else ACTION_UPDATE,
+                                  "target": target, "id": extension_id, "value": value, "old": current})
+
+        if desired["prune"]:
+            for key, subkeys in keys.items():
+                for extension_id in sorted(subkeys.keys() - wanted_keys[key]):
+                    steps.append({"action": ACTION_REMOVE, "target": TARGET_KEY, "id": extension_id,
+                                  "key": key, "old": subkeys[extension_id]})
+            for target, policy_list in self.policy_lists.items():
+                for extension_id, value in policy_list.items():
+                    if extension_id not in wanted_policies[target]:
+                        steps.append({"action": ACTION_REMOVE, "target": target, "id": extension_id,
+                                      "old": value})
+        return steps, []
+
+    def apply(self, steps):
+        """按 文件 -> 扩展项 -> 策略列表 的顺序执行计划，返回失败的操作数"""
+        failures = 0
+        installs = {}
+        removed = set()
+        failed_ids = set()
+        file_steps = [step for step in steps if step["target"] == TARGET_FILE]
+        if file_steps:
+            # 引用记录在所有文件复制完成后只写入一次
+            with self.installer._get_store().batch():
+                for step in file_steps:
+                    try:
+                        dest, digest = self.installer._copy_extension_file(step["crx"])
+                        installs[step["id"]] = {"id": step["id"], "path": dest, "version": step["version"],
+                                                "sha256": digest, "size": os.path.getsize(dest)}
+                    except Exception as e:
+                        print(f"× 复制 {step['crx']} 失败: {str(e)}")
+                        failures += 1
+                        failed_ids.add(step["id"])
+        # 文件复制失败的扩展不写入扩展项和策略列表，避免注册表指向旧文件或不存在的文件
+        for extension_id in sorted(failed_ids):
+            print(f"× 跳过 {extension_id} 的注册表修改")
+        steps = [step for step in steps if step["id"] not in failed_ids]
+
+        for step in steps:
+            if step["target"] != TARGET_KEY:
+                continue
+            root_key, path = step["key"]
+            try:
+                if step["action"] == ACTION_REMOVE:
+                    self.registry.delete_key(root_key, f"{path}\\{step['id']}")
+                    removed.add(step["id"])
+                else:
+                    self.registry.write_values(root_key, f"{path}\\{step['id']}", step["values"])
+            except OSError as e:
+                print(f"× {format_step(step)} 失败: {str(e)}")
+                failures += 1
+
+        for target, policy_list in self.policy_lists.items():
+            target_steps = [step for step in steps if step["target"] == target]
+            try:
+                policy_list.upsert_many([(step["id"], step["value"]) for step in target_steps
+                                         if step["action"] != ACTION_REMOVE])
+                for step in target_steps:
+                    if step["action"] == ACTION_REMOVE:
+                        policy_list.remove_all(step["id"])
+            except OSError as e:
+                print(f"× 写入 {policy_list.path} 失败: {str(e)}")
+                failures += 1
+        self.registry.flush()
+
+        if installs:
+            self.installer._record_installs(list(installs.values()))
+        for extension_id in sorted(removed):
+            try:
+                self.installer._get_inventory().record_event(extension_id, EVENT_REMOVE, tool=TOOL_INSTALLER)
+            except Exception as e:
+                print(f"× 写入扩展清单失败: {str(e)}")
+        return failures
+
+
+def format_step(step):
+    """计划中一项操作的可读描述"""
+    symbol = ACTION_SYMBOLS[step["action"]]
+    if step["target"] == TARGET_FILE:
+        return f"{symbol} {step['id']} 文件 {step['dest']} <- {step['crx']}"
+    if step["target"] == TARGET_KEY:
+        root_key, path = step["key"]
+        root_name = HIVE_HKLM if root_key == HKEY_LOCAL_MACHINE else HIVE_HKCU
+        text = f"{symbol} {step['id']} {root_name}\\{path}"
+        if step["action"] == ACTION_REMOVE:
+            return text
+        changes = [f"{name}: {step['old'].get(name, '')} -> {value}" if step["old"] else f"{name}={value}"
+                   for name, value in step["values"].items() if step["old"].get(name) != value]
+        return f"{text} ({', '.join(changes)})"
+    list_name = "强制安装列表" if step["target"] == TARGET_FORCELIST else "允许列表"
+    if step["action"] == ACTION_REMOVE:
+        return f"{symbol} {step['id']} {list_name} ({step['old']})"
+    return f"{symbol} {step['id']} {list_name} ({step['value']})"
+
+
+def reconcile(installer, desired_path, dry_run=False):
+    """读取期望状态文件，输出计划并执行；dry_run 为真时只输出计划。返回是否成功"""
+    try:
+        desired = load_desired_state(desired_path)
+    except (OSError, ValueError) as e:
+        print(f"× 读取期望状态文件失败: {str(e)}")
+        return False
+
+    reconciler = ExtensionReconciler(installer)
+    steps, errors = reconciler.plan(desired)
+    for error in errors:
+        print(f"× {error}")
+    if errors:
+        print("期望状态文件中有错误，未做任何修改")
+        return False
+    if not steps:
+        print("√ 已处于期望状态，无需修改")
+        return True
+
+    for step in steps:
+        print(format_step(step))
+    counts = {action: sum(1 for step in steps if step["action"] == action) for action in ACTION_SYMBOLS}
+    print(f"\n计划：添加 {counts[ACTION_ADD]} 项，更新 {counts[ACTION_UPDATE]} 项，删除 {counts[ACTION_REMOVE]} 项")
+    if dry_run:
+        return True
+
+    failures = reconciler.apply(steps)
+    if failures:
+        print(f"× {failures} 项操作失败")
+        return False
+    print("√ 已按计划完成修改")
+    return True
@@ -0,0 +1,184 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import url2pathname
+
+from policy_list import PolicyList
+from registry_backend import HKEY_CURRENT_USER, HKEY_LOCAL_MACHINE
+
+# 扩展可能注册的位置，同时作为界面中“注册位置”列显示的名称
+LOCATION_HKCU = "HKCU"
+LOCATION_HKLM = "HKLM"
+LOCATION_WOW64 = "HKLM(32位)"
+LOCATION_FORCELIST = "强制安装列表"
+LOCATION_ALLOWLIST = "允许列表"
+
+KIND_KEY = "key"        # 每个扩展一个子键，值为 path 和 version
+KIND_POLICY = "policy"  # 编号的值列表，值以扩展ID开头
+
+# (位置, 根键, 路径, 类型)，同一扩展有多个路径时按此顺序取第一个
+SCAN_LOCATIONS = (
+    (LOCATION_HKCU, HKEY_CURRENT_USER, r"Software\Google\Chrome\Extensions", KIND_KEY),
+    (LOCATION_HKLM, HKEY_LOCAL_MACHINE, r"Software\Google\Chrome\Extensions", KIND_KEY),
+    (LOCATION_WOW64, HKEY_LOCAL_MACHINE, r"Software\Wow6432Node\Google\Chrome\Extensions", KIND_KEY),
+    (LOCATION_FORCELIST, HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\ExtensionInstallForcelist", KIND_POLICY),
+    (LOCATION_ALLOWLIST, HKEY_LOCAL_MACHINE, r"Software\Policies\Google\Chrome\ExtensionInstallAllowlist", KIND_POLICY),
+)
+
+
+def forcelist_value(extension_id, crx_path):
+    """强制安装列表中指向本地CRX文件的值，与安装工具写入的格式相同"""
+    return f"{extension_id};file://{crx_path.replace(os.sep, '/')}"
+
+
+def forcelist_path(value_data):
+    """强制安装列表的值中的本地文件路径，更新地址不是 file:// 时返回 None"""
+    _, _, url = str(value_data).partition(';')
+    url = url.strip()
+    if not url.lower().startswith("file:"):
+        return None
+    path = url[len("file:"):]
+    if path.startswith("//"):
+        path = path[2:]
+    # file:///C:/... 去掉盘符前的斜杠
+    if re.match(r'^/[A-Za-z]:', path):
+        path = path[1:]
+    return url2pathname(path)
+
+
+def forcelist_url(value_data):
+    _, _, url = str(value_data).partition(';')
+    return url.strip()
+
+
+def _same_path(path_a, path_b):
+    return os.path.normcase(os.path.normpath(path_a)) == os.path.normcase(os.path.normpath(path_b))
+
+
+class ExtensionScanner:
+    """一次读取所有注册位置，按扩展ID合并
+
+    HKCU、HKLM 和 HKLM\\Wow6432Node 下的扩展项以及强制安装列表、允许列表
+    在线程池中并发读取，每个位置只读取一次。同一扩展在各位置的信息合并为
+    一条记录，列出它出现的位置，并检查各位置的路径、版本号和强制安装列表中的
+    文件地址是否一致。
+    """
+
+    def __init__(self, registry, locations=SCAN_LOCATIONS):
+        self.registry = registry
+        self.locations = locations
+
+    def _read_location(self, location):
+        _, root_key, path, kind = location
+        if kind == KIND_KEY:
+            return self.registry.read_subkey_values(root_key, path)
+        try:
+            return self.registry.read_values(root_key, path)
+        except OSError:
+            return {}
+
+    def read_all(self):
+        """并发读取所有位置，返回 {位置: 读取结果}"""
+        with ThreadPoolExecutor(max_workers=len(self.locations)) as executor:
+            results = list(executor.map(self._read_location, self.locations))
+        return {location[0]: result for location, result in zip(self.locations, results)}
+
+    def scan(self):
+        """返回 {扩展ID: 记录}，按扩展首次出现的位置排列"""
+        return self.merge(self.read_all())
+
+    def lookup(self, extension_id):
+        """只读取一个扩展的各位置，返回记录，所有位置都没有时返回 None"""
+        raw = {}
+        for location in self.locations:
+            name, root_key, path, kind = location
+            if kind == KIND_KEY:
+                try:
+                    raw[name] = {extension_id: self.registry.read_values(root_key, f"{path}\\{extension_id}")}
+                except OSError:
+                    raw[name] = {}
+            else:
+                raw[name] = self._read_location(location)
+        return self.merge(raw).get(extension_id.lower())
+
+    def count(self):
+        """扩展数量，扩展项只枚举键名"""
+        extension_ids = set()
+        for location in self.locations:
+            name, root_key, path, kind = location
+            if kind == KIND_KEY:
+                try:
+                    extension_ids.update(subkey.lower() for subkey in self.registry.list_subkeys(root_key, path))
+                except OSError:
+                    continue
+            else:
+                extension_ids.update(PolicyList.extension_id_of(value)
+                                     for value_name, value in self._read_location(location).items()
+                                     if value_name.isdigit() and int(value_name) > 0)
+        return len(extension_ids)
+
+    def merge(self, raw):
+        """把各位置的读取结果合并为 {扩展ID: 记录}
+
+        记录包含 id、path、version、sources（出现的位置）、conflicts（不一致之处）、
+        keys（{位置: 子键名}）和 policies（{位置: [值]}）。
+        """
+        records = {}
+
+        def record_of(extension_id):
+            extension_id = extension_id.lower()
+            if extension_id not in records:
+                records[extension_id] = {"id": extension_id, "keys": {}, "key_values": {}, "policies": {}}
+            return records[extension_id]
+
+        for name, _, _, kind in self.locations:
+            data = raw.get(name) or {}
+            if kind == KIND_KEY:
+                for subkey, values in data.items():
+                    record = record_of(subkey)
+                    record["keys"][name] = subkey
+                    record["key_values"][name] = values
+            else:
+                for value_name, value in data.items():
+                    if not value_name.isdigit() or int(value_name) <= 0:
+                        continue
+                    extension_id = PolicyList.extension_id_of(value)
+                    if extension_id:
+                        record_of(extension_id)["policies"].setdefault(name, []).append(value)
+
+        for record in records.values():
+            self._finish(record)
+        return records
+
+    def _finish(self, record):
+        """确定记录的路径和版本号，检查各位置是否一致"""
+        key_values = record.pop("key_values")
+        sources = [name for name, _, _, _ in self.locations
+                   if name in record["keys"] or name in record["policies"]]
+        paths = [(name, values.get("path", "")) for name, values in key_values.items() if values.get("path")]
+        versions = {values.get("version", "") for values in key_values.values() if values.get("version")}
+        conflicts = []
+
+        if any(not _same_path(path, paths[0][1]) for _, path in paths[1:]):
+            conflicts.append("路径不一致：" + "，".join(f"{name}={path}" for name, path in paths))
+        if len(versions) > 1:
+            conflicts.append("版本号不一致：" + "，".join(sorted(versions)))
+
+        path = paths[0][1] if paths else ""
+        for value in record["policies"].get(LOCATION_FORCELIST, []):
+            file_path = forcelist_path(value)
+            if file_path is None:
+                # 从更新地址安装，没有本地文件
+                path = path or forcelist_url(value)
+            elif not path:
+                path = file_path
+            elif not _same_path(file_path, path):
+                conflicts.append(f"{LOCATION_FORCELIST}中的文件与扩展项不一致：{file_path}")
+        for name, values in record["policies"].items():
+            if len(values) > 1:
+                conflicts.append(f"{name}中重复 {len(values)} 次")
+
+        record["path"] = path
+        record["version"] = next((values["version"] for values in key_values.values() if values.get("version")), "")
+        record["sources"] = sources
+        record["conflicts"] = conflicts
@@ -0,0 +1,173 @@
+import bisect
+import re
+from collections import defaultdict
+
+# 参与搜索的字段
+SEARCH_FIELDS = ("name", "id", "path", "version", "source")
+
+# 短于该长度的搜索词按词的前缀匹配，其余按三字母组（trigram）匹配任意位置
+TRIGRAM_SIZE = 3
+
+# 分词：字母数字连续的部分为一个词，中文每个字起始的后缀都作为词，以便按前缀匹配词中间的字
+_TOKEN_PATTERN = re.compile(r'[0-9a-z]+|[^\x00-\x7f]+')
+_CJK_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+
+
+def _tokens(text):
+    tokens = set()
+    for token in _TOKEN_PATTERN.findall(text):
+        tokens.add(token)
+        if _CJK_PATTERN.search(token):
+            tokens.update(token[i:] for i in range(1, len(token)))
+    return tokens
+
+
+def _trigrams(text):
+    return {text[i:i + TRIGRAM_SIZE] for i in range(len(text) - TRIGRAM_SIZE + 1)}
+
+
+class ExtensionSearchIndex:
+    """扩展列表的增量搜索索引
+
+    对名称、ID、路径和版本号建立两种索引：词的有序列表（用于1~2个字符的前缀
+    匹配）和三字母组倒排表（用于3个字符以上的任意位置匹配，候选结果再做一次
+    子串校验）。update() / remove() 只修改变化的扩展对应的索引项。
+    多个以空格分隔的搜索词之间为“并且”关系，不区分大小写。
+    """
+
+    def __init__(self):
+        self.fields = {}                     # 扩展ID -> (小写的各字段值)
+        self.trigram_postings = defaultdict(set)
+        self.token_postings = defaultdict(set)
+        self.sorted_tokens = []              # 所有词，有序，用于前缀查找
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __contains__(self, extension_id):
+        return extension_id in self.fields
+
+    def update(self, ext):
+        """添加或更新一个扩展，字段没有变化时不做任何事"""
+        extension_id = ext["id"]
+        fields = tuple(str(ext.get(field, "")).lower() for field in SEARCH_FIELDS)
+        old_fields = self.fields.get(extension_id)
+        if old_fields == fields:
+            return
+        old_trigrams, old_tokens = self._terms(old_fields) if old_fields else (set(), set())
+        new_trigrams, new_tokens = self._terms(fields)
+        self.fields[extension_id] = fields
+
+        for trigram in old_trigrams - new_trigrams:
+            self._discard(self.trigram_postings, trigram, extension_id)
+        for trigram in new_trigrams - old_trigrams:
+            self.trigram_postings[trigram].add(extension_id)
+        for token in old_tokens - new_tokens:
+            if self._discard(self.token_postings, token, extension_id):
+                del self.sorted_tokens[bisect.bisect_left(self.sorted_tokens, token)]
+        for token in new_tokens - old_tokens:
+            postings = self.token_postings[token]
+            if not postings:
+                bisect.insort(self.sorted_tokens, token)
+            postings.add(extension_id)
+
+    def set_field(self, extension_id, field, value):
+        """只更新一个字段"""
+        fields = self.fields.get(extension_id)
+        if fields is None:
+            return
+        ext = dict(zip(SEARCH_FIELDS, fields), id=extension_id)
+        ext[field] = value
+        self.update(ext)
+
+    def remove(self, extension_id):
+        fields = self.fields.pop(extension_id, None)
+        if fields is None:
+            return
+        trigrams, tokens = self._terms(fields)
+        for trigram in trigrams:
+            self._discard(self.trigram_postings, trigram, extension_id)
+        for token in tokens:
+            if self._discard(self.token_postings, token, extension_id):
+                del self.sorted_tokens[bisect.bisect_left(self.sorted_tokens, token)]
+
+    def clear(self):
+        self.fields = {}
+        self.trigram_postings = defaultdict(set)
+        self.token_postings = defaultdict(set)
+        self.sorted_tokens = []
+
+    @staticmethod
+    def _terms(fields):
+        trigrams = set()
+        tokens = set()
+        for text in fields:
+            trigrams |= _trigrams(text)
+            tokens |= _tokens(text)
+        return trigrams, tokens
+
+    @staticmethod
+    def _discard(postings, key, extension_id):
+        """从倒排表中删除，返回该键是否已没有任何扩展"""
+        ids = postings.get(key)
+        if ids is None:
+            return False
+        ids.discard(extension_id)
+        if ids:
+            return False
+        del postings[key]
+        return True
+
+    def _selectivity(self, term):
+        """估计搜索词匹配的扩展数量，用于决定求交集的顺序"""
+        if len(term) >= TRIGRAM_SIZE:
+            return min(len(self.trigram_postings.get(trigram, ())) for trigram in _trigrams(term))
+        return len(self.fields)
+
+    def _candidates(self, term, within=None):
+        """返回可能匹配的扩展ID集合，以及结果是否还需要逐个校验"""
+        if len(term) >= TRIGRAM_SIZE:
+            candidates = within
+            # 从最短的倒排表开始求交集
+            for trigram in sorted(_trigrams(term), key=lambda t: len(self.trigram_postings.get(t, ()))):
+                ids = self.trigram_postings.get(trigram)
+                if not ids:
+                    return set(), False
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    break
+            # 三字母组都出现不代表整个词出现
+            return candidates, True
+
+        if _TOKEN_PATTERN.fullmatch(term):
+            matches = set()
+            index = bisect.bisect_left(self.sorted_tokens, term)
+            while index < len(self.sorted_tokens) and self.sorted_tokens[index].startswith(term):
+                matches |= self.token_postings[self.sorted_tokens[index]]
+                index += 1
+            return matches, False
+
+        # 含分隔符的短词（如 "1."）无法通过索引查找，直接匹配
+        return {extension_id for extension_id, fields in self.fields.items()
+                if any(term in text for text in fields)}, False
+
+    def search(self, query):
+        """返回匹配的扩展ID集合，搜索内容为空时返回 None（表示不过滤）"""
+        terms = query.lower().split()
+        if not terms:
+            return None
+        result = None
+        unverified = []
+        # 先用索引求出所有搜索词候选结果的交集，最后只校验剩下的扩展；
+        # 匹配数量少的词先处理，之后的交集都在较小的集合上进行
+        for term in sorted(terms, key=self._selectivity):
+            candidates, needs_check = self._candidates(term, result)
+            result = candidates if result is None else result & candidates
+            if not result:
+                return set()
+            if needs_check:
+                unverified.append(term)
+        if unverified:
+            result = {extension_id for extension_id in result
+                      if all(any(term in text for text in self.fields[extension_id]) for term in unverified)}
+        return result
@@ -0,0 +1,191 @@
+import json
+import re
+import struct
+
+from extension_name_cache import SOURCE_IMPORT
+from extension_scanner import KIND_KEY, LOCATION_ALLOWLIST, LOCATION_FORCELIST, LOCATION_HKCU, forcelist_value
+from policy_list import PolicyList
+
+# 快照记录的字段，二进制快照按此顺序存储
+SNAPSHOT_FIELDS = ("id", "name", "path", "version", "status", "hive", "sha256")
+
+# 二进制快照的文件头
+SNAPSHOT_MAGIC = b"CRXSNAP\x01"
+
+# 导入时每批写入注册表的记录数
+IMPORT_BATCH_SIZE = 500
+
+_RECORD_LENGTH = struct.Struct("<I")
+_FIELD_LENGTH = struct.Struct("<H")
+
+_ID_PATTERN = re.compile(r'^[a-z]{32}$')
+
+
+def snapshot_record(ext_info, sha256=""):
+    """把扩展信息转换为快照记录，hive 为逗号分隔的注册位置"""
+    return {
+        "id": ext_info["id"],
+        "name": ext_info["name"],
+        "path": ext_info["path"],
+        "version": ext_info["version"],
+        "status": ext_info["status"],
+        "hive": ext_info.get("source", ""),
+        "sha256": sha256,
+    }
+
+
+class BinarySnapshotWriter:
+    """二进制快照
+
+    文件头之后每条记录为 4 字节长度 + 内容，内容依次为 SNAPSHOT_FIELDS 中各字段的
+    2 字节长度 + UTF-8 文本（均为小端），最后以长度为 0 的记录结束。
+    与 RecordWriter 接口相同，逐条写入，不在内存中积累记录。
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.stream.write(SNAPSHOT_MAGIC)
+
+    def write(self, record):
+        parts = []
+        for field in SNAPSHOT_FIELDS:
+            data = str(record.get(field) or "").encode('utf-8')
+            if len(data) > 0xFFFF:
+                raise ValueError(f"{record.get('id')} 的 {field} 过长，无法写入二进制快照")
+            parts.append(_FIELD_LENGTH.pack(len(data)))
+            parts.append(data)
+        payload = b"".join(parts)
+        self.stream.write(_RECORD_LENGTH.pack(len(payload)) + payload)
+
+    def close(self):
+        self.stream.write(_RECORD_LENGTH.pack(0))
+        self.stream.flush()
+
+
+def _read_binary(f):
+    while True:
+        header = f.read(_RECORD_LENGTH.size)
+        if len(header) < _RECORD_LENGTH.size:
+            raise ValueError("快照文件不完整：缺少结束标记")
+        (length,) = _RECORD_LENGTH.unpack(header)
+        if length == 0:
+            return
+        payload = f.read(length)
+        if len(payload) < length:
+            raise ValueError("快照文件不完整：记录被截断")
+        record = {}
+        pos = 0
+        try:
+            for field in SNAPSHOT_FIELDS:
+                (size,) = _FIELD_LENGTH.unpack_from(payload, pos)
+                pos += _FIELD_LENGTH.size
+                if pos + size > length:
+                    raise ValueError(f"快照文件已损坏：{field} 字段超出记录长度")
+                record[field] = payload[pos:pos + size].decode('utf-8')
+                pos += size
+        except struct.error as e:
+            # 字段长度与记录长度不一致，说明文件被截断后又拼接或内容损坏
+            raise ValueError(f"快照文件已损坏：{str(e)}") from e
+        yield record
+
+
+def _read_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line.decode('utf-8-sig'))
+        if isinstance(record, dict):
+            yield record
+
+
+def read_snapshot(path):
+    """逐条读取快照文件，以文件头区分二进制快照和NDJSON"""
+    with open(path, 'rb') as f:
+        if f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC:
+            yield from _read_binary(f)
+        else:
+            f.seek(0)
+            yield from _read_ndjson(f)
+
+
+class SnapshotImporter:
+    """把快照记录分批写入注册表、名称缓存和扩展清单
+
+    每积累 batch_size 条记录写入一批：扩展项逐个写入，两个策略列表各只写入
+    一次（PolicyList.upsert_many），名称缓存和扩展清单各一个事务。所有批次
+    完成后才调用一次 registry.flush()。内存中最多保留一批记录。
+    hive 中列出的位置决定写入何处，没有扩展项位置时写入 HKCU。
+    """
+
+    def __init__(self, core, batch_size=IMPORT_BATCH_SIZE):
+        self.core = core
+        self.batch_size = batch_size
+        self.locations = {name: (root_key, path, kind) for name, root_key, path, kind in core.scanner.locations}
+        self.policy_lists = {}
+        self.pending = []
+        self.counts = {"imported": 0, "skipped": 0}
+
+    def _policy_list(self, name):
+        if name not in self.policy_lists:
+            root_key, path, _ = self.locations[name]
+            self.policy_lists[name] = PolicyList(self.core.registry, root_key, path)
+        return self.policy_lists[name]
+
+    def add(self, record):
+        extension_id = str(record.get("id") or "").strip().lower()
+        if not _ID_PATTERN.match(extension_id):
+            self.counts["skipped"] += 1
+            return
+        self.pending.append(dict(record, id=extension_id))
+        if len(self.pending) >= self.batch_size:
+            self.flush_batch()
+
+    def flush_batch(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        policy_items = {LOCATION_FORCELIST: [], LOCATION_ALLOWLIST: []}
+        for record in batch:
+            extension_id = record["id"]
+            path = record.get("path") or ""
+            hives = [name.strip() for name in str(record.get("hive") or "").split(",")
+                     if name.strip() in self.locations]
+            key_hives = [name for name in hives if self.locations[name][2] == KIND_KEY] or [LOCATION_HKCU]
+            values = {name: record[name] for name in ("path", "version") if record.get(name)}
+            for name in key_hives:
+                root_key, key_path, _ = self.locations[name]
+                self.core.registry.write_values(root_key, f"{key_path}\\{extension_id}", values)
+            if LOCATION_FORCELIST in hives and path:
+                value = f"{extension_id};{path}" if "://" in path else forcelist_value(extension_id, path)
+                policy_items[LOCATION_FORCELIST].append((extension_id, value))
+            if LOCATION_ALLOWLIST in hives:
+                policy_items[LOCATION_ALLOWLIST].append((extension_id, extension_id))
+
+            name = record.get("name") or ""
+            if name and name != extension_id:
+                self.core.name_cache.set(extension_id, name, SOURCE_IMPORT)
+
+        for name, items in policy_items.items():
+            if items:
+                self._policy_list(name).upsert_many(items)
+        self.core.save_name_cache()
+        self.core.record_extensions([{"id": record["id"], "path": record.get("path") or "",
+                                      "version": record.get("version") or "",
+                                      "sha256": record.get("sha256") or "", "status": ""}
+                                     for record in batch])
+        self.counts["imported"] += len(batch)
+
+    def finish(self):
+        """写入最后一批并刷新注册表，返回 {"imported", "skipped"}"""
+        self.flush_batch()
+        self.core.registry.flush()
+        return dict(self.counts)
+
+
+def import_snapshot(core, path, batch_size=IMPORT_BATCH_SIZE):
+    """导入快照文件（NDJSON或二进制），返回 {"imported", "skipped"}"""
+    importer = SnapshotImporter(core, batch_size)
+    for record in read_snapshot(path):
+        importer.add(record)
+    return importer.finish()
@@ -1,10 +1,13 @@
 import os
 import sys
-import winreg
-import shutil
 import json
 from tkinter import Tk, filedialog
 from pathlib import Path
+from policy_list import PolicyList
+from registry_backend import HKEY_LOCAL_MACHINE, get_registry_backend
+from crx_store import CrxStore
+from crx_verifier import CrxVerifier, format_result
+from extension_inventory import ExtensionInventory, TOOL_GLOBAL_INSTALLER
 
 def select_crx_file():
     root = Tk()
@@ -20,47 +23,43 @@ def get_extension_id(crx_path):
     extension_id = os.path.splitext(os.path.basename(crx_path))[0]
     return extension_id
 
-def install_global_extension(crx_path):
+def install_global_extension(crx_path, registry=None, inventory=None):
     if not crx_path or not os.path.exists(crx_path):
         print("错误：未选择有效的扩展文件")
         return False
 
     try:
-        # 获取扩展ID
-        extension_id = get_extension_id(crx_path)
+        # 校验签名和ZIP内容，扩展ID以签名公钥计算出的为准
+        check = verify_crx_file(crx_path, inventory)
+        if not check["valid"]:
+            print(f"错误：扩展文件校验失败 - {format_result(check)}")
+            return False
+        extension_id = check["extension_id"]
+        if get_extension_id(crx_path) != extension_id:
+            print(f"文件名不是扩展ID，使用签名中的扩展ID: {extension_id}")
         
         # 创建存储扩展的目录
         app_data = os.environ.get('LOCALAPPDATA')
         extension_dir = os.path.join(app_data, 'Chrome_Extensions')
         os.makedirs(extension_dir, exist_ok=True)
         
-        # 复制扩展文件到指定目录
+        # 复制扩展文件到指定目录，内容未变化时不重复复制
         dest_path = os.path.join(extension_dir, f"{extension_id}.crx")
-        shutil.copy2(crx_path, dest_path)
+        store = CrxStore(os.path.join(extension_dir, ".store"))
+        digest, written = store.place(crx_path, dest_path)
+        if not written:
+            print("扩展文件内容未变化，跳过复制")
         
         # 修改注册表
         key_path = r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"
         
         try:
-            # 尝试创建或打开注册表项
-            key = winreg.CreateKeyEx(winreg.HKEY_LOCAL_MACHINE, key_path, 0, 
-                                   winreg.KEY_ALL_ACCESS)
-            
-            # 获取现有值的数量
-            try:
-                count = 0
-                while True:
-                    winreg.EnumValue(key, count)
-                    count += 1
-            except WindowsError:
-                pass
-            
-            # 添加新的扩展
-            value_name = str(count + 1)
+            # 尝试创建或打开注册表项，已存在的扩展原位更新
             value_data = f"{extension_id};file://{dest_path.replace(os.sep, '/')}"
-            
-            winreg.SetValueEx(key, value_name, 0, winreg.REG_SZ, value_data)
-            winreg.CloseKey(key)
+            registry = registry or get_registry_backend()
+            PolicyList(registry, HKEY_LOCAL_MACHINE, key_path).upsert(extension_id, value_data)
+            registry.flush()
+            record_install(extension_id, dest_path, digest, inventory)
             
             print(f"成功：扩展已添加到全局安装列表")
             print(f"扩展ID: {extension_id}")
@@ -76,6 +75,24 @@ def install_global_extension(crx_path):
         print(f"错误：安装过程中出现异常 - {str(e)}")
         return False
 
+def verify_crx_file(crx_path, inventory=None):
+    # 校验结果保存在扩展清单中，清单无法打开时只是不缓存
+    try:
+        inventory = inventory or ExtensionInventory()
+    except Exception as e:
+        print(f"警告：打开扩展清单失败 - {str(e)}")
+        inventory = None
+    return CrxVerifier(inventory).verify(crx_path)
+
+def record_install(extension_id, dest_path, digest, inventory=None):
+    # 在扩展清单中记录安装，失败时不影响安装结果
+    try:
+        inventory = inventory or ExtensionInventory()
+        inventory.record_installs([{"id": extension_id, "path": dest_path, "sha256": digest,
+                                    "size": os.path.getsize(dest_path)}], TOOL_GLOBAL_INSTALLER)
+    except Exception as e:
+        print(f"警告：写入扩展清单失败 - {str(e)}")
+
 def main():
     print("Chrome扩展全局安装工具")
     print("请选择要安装的.crx扩展文件...")
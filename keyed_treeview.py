@@ -0,0 +1,511 @@
+import re
+
+# 行数据中对应Treeview各列的字段
+ROW_FIELDS = ("name", "id", "path", "version", "status", "source", "conflict")
+
+# 虚拟列表在可见行之外额外保留的行数
+VIRTUAL_BUFFER_ROWS = 2
+# 鼠标滚轮每格滚动的行数
+WHEEL_SCROLL_ROWS = 3
+
+
+def row_values(ext):
+    """将扩展信息转换为Treeview中一行的值"""
+    return tuple(ext[field] for field in ROW_FIELDS)
+
+
+def diff_rows(current_order, current_values, extensions):
+    """比较当前显示的行与新的扩展列表
+
+    返回 (删除的ID列表, 新增的[(位置, ID, 值)], 更新的[(ID, 值)])。
+    """
+    new_ids = {ext["id"] for ext in extensions}
+    deletes = [extension_id for extension_id in current_order if extension_id not in new_ids]
+    inserts = []
+    updates = []
+    for index, ext in enumerate(extensions):
+        values = row_values(ext)
+        old_values = current_values.get(ext["id"])
+        if old_values is None:
+            inserts.append((index, ext["id"], values))
+        elif old_values != values:
+            updates.append((ext["id"], values))
+    return deletes, inserts, updates
+
+
+def sort_key(value):
+    """排序用的键：忽略大小写，数字按数值比较（版本号 1.10 排在 1.9 之后）"""
+    return [int(part) if part.isdigit() else part.casefold()
+            for part in re.split(r'(\d+)', str(value))]
+
+
+def sorted_ids(order, values, field, reverse=False):
+    """按某一列对扩展ID排序"""
+    column = ROW_FIELDS.index(field)
+    return sorted(order, key=lambda extension_id: sort_key(values[extension_id][column]), reverse=reverse)
+
+
+class KeyedTreeview:
+    """以扩展ID为键维护Treeview中的行
+
+    只对新增、修改和删除的行调用Tk，选中项和滚动位置得以保留，
+    交替行颜色只在行的位置发生变化后重新计算。设置过滤条件后，
+    不匹配的行从Treeview中摘下（detach）而不是删除。
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.order = []     # 显示顺序中的扩展ID
+        self.values = {}    # 扩展ID -> 当前显示的值
+        self.tags = {}      # 扩展ID -> 当前的行颜色标签
+        self.sort_field = None
+        self.sort_reverse = False
+        self.filter_ids = None  # 匹配过滤条件的扩展ID，None 表示不过滤
+        self._dirty_from = None
+        self._needs_sync = False
+
+    def __contains__(self, extension_id):
+        return extension_id in self.values
+
+    def __len__(self):
+        return len(self.order)
+
+    def _mark_dirty(self, index):
+        if self._dirty_from is None or index < self._dirty_from:
+            self._dirty_from = index
+
+    def upsert(self, ext, index=None):
+        """插入或更新一行，index 为 None 时新行追加到末尾、已有行位置不变"""
+        extension_id = ext["id"]
+        values = row_values(ext)
+
+        if self.filter_ids is not None:
+            self._upsert_filtered(extension_id, values, index)
+            return
+
+        if extension_id not in self.values:
+            if index is None or index > len(self.order):
+                index = len(self.order)
+            self.tree.insert("", index, iid=extension_id, values=values)
+            self.order.insert(index, extension_id)
+            self.values[extension_id] = values
+            self._mark_dirty(index)
+            return
+
+        if self.values[extension_id] != values:
+            self.tree.item(extension_id, values=values)
+            self.values[extension_id] = values
+
+        if index is None:
+            return
+        index = min(index, len(self.order) - 1)
+        if self.order[index] == extension_id:
+            return
+
+        # Tk按移动前的子项列表确定插入位置
+        old_index = self.order.index(extension_id)
+        self.tree.move(extension_id, "", index if old_index > index else index + 1)
+        self.order.pop(old_index)
+        self.order.insert(index, extension_id)
+        self._mark_dirty(min(index, old_index))
+
+    def _upsert_filtered(self, extension_id, values, index):
+        """有过滤条件时只更新 order，Treeview 中的位置在 retag() 时统一调整"""
+        if extension_id not in self.values:
+            if index is None or index > len(self.order):
+                index = len(self.order)
+            self.tree.insert("", "end", iid=extension_id, values=values)
+            self.order.insert(index, extension_id)
+            self.values[extension_id] = values
+            self._needs_sync = True
+            return
+        if self.values[extension_id] != values:
+            self.tree.item(extension_id, values=values)
+            self.values[extension_id] = values
+        if index is not None:
+            index = min(index, len(self.order) - 1)
+            if self.order[index] != extension_id:
+                self.order.remove(extension_id)
+                self.order.insert(index, extension_id)
+                self._needs_sync = True
+
+    def _shown(self):
+        if self.filter_ids is None:
+            return self.order
+        return [extension_id for extension_id in self.order if extension_id in self.filter_ids]
+
+    def _sync(self):
+        """让Treeview中显示的行与 order 和过滤条件一致，只移动位置不对的行"""
+        target = self._shown()
+        target_set = set(target)
+        current = list(self.tree.get_children())
+        hidden = [extension_id for extension_id in current if extension_id not in target_set]
+        if hidden:
+            self.tree.detach(*hidden)
+        current = [extension_id for extension_id in current if extension_id in target_set]
+        attached = set(current)
+        for index, extension_id in enumerate(target):
+            if index < len(current) and current[index] == extension_id:
+                continue
+            # 前 index 行已就位，要移动的行一定在 index 之后（或尚未显示）
+            self.tree.move(extension_id, "", index)
+            if extension_id in attached:
+                current.remove(extension_id)
+            else:
+                attached.add(extension_id)
+            current.insert(index, extension_id)
+
+    def set_filter(self, extension_ids):
+        """只显示指定的扩展，None 表示显示全部"""
+        self.filter_ids = None if extension_ids is None else set(extension_ids)
+        self._needs_sync = True
+        self.retag()
+
+    def set_field(self, extension_id, field, value):
+        """只更新一行中的一个字段"""
+        values = self.values.get(extension_id)
+        if values is None:
+            return
+        column = ROW_FIELDS.index(field)
+        if values[column] == value:
+            return
+        values = values[:column] + (value,) + values[column + 1:]
+        self.values[extension_id] = values
+        self.tree.item(extension_id, values=values)
+
+    def remove(self, extension_ids):
+        """删除多行"""
+        removed = [extension_id for extension_id in extension_ids if extension_id in self.values]
+        if not removed:
+            return
+        removed_set = set(removed)
+        first_index = min(self.order.index(extension_id) for extension_id in removed)
+        self.tree.delete(*removed)
+        self.order = [extension_id for extension_id in self.order if extension_id not in removed_set]
+        for extension_id in removed:
+            del self.values[extension_id]
+            self.tags.pop(extension_id, None)
+        self._mark_dirty(first_index)
+
+    def apply(self, extensions):
+        """使显示内容与扩展列表一致，只应用差异，返回 diff_rows 的结果"""
+        diff = diff_rows(self.order, self.values, extensions)
+        self.remove(diff[0])
+        for index, ext in enumerate(extensions):
+            self.upsert(ext, index)
+        self.retag()
+        return diff
+
+    def retag(self):
+        """重新计算位置变化之后各行的交替颜色"""
+        if self._needs_sync:
+            self._sync()
+            self._needs_sync = False
+            self._mark_dirty(0)
+        if self._dirty_from is None:
+            return
+        shown = self._shown()
+        # 有过滤条件时行在Treeview中的位置与 order 中的位置不同，全部重新计算
+        start = self._dirty_from if self.filter_ids is None else 0
+        for index in range(start, len(shown)):
+            extension_id = shown[index]
+            tag = 'oddrow' if index % 2 == 0 else 'evenrow'
+            if self.tags.get(extension_id) != tag:
+                self.tree.item(extension_id, tags=(tag,))
+                self.tags[extension_id] = tag
+        self._dirty_from = None
+
+    def sort(self, field, reverse=False):
+        """按某一列排序，逐行移动已有的项"""
+        self.sort_field = field
+        self.sort_reverse = reverse
+        self.order = sorted_ids(self.order, self.values, field, reverse)
+        self._needs_sync = True
+        self.retag()
+
+    def selection(self):
+        """选中行的扩展ID，被过滤掉的行不算"""
+        return [extension_id for extension_id in self.tree.selection()
+                if self.filter_ids is None or extension_id in self.filter_ids]
+
+    def get_values(self, extension_id):
+        return self.values.get(extension_id)
+
+    def clear(self):
+        self.tree.delete(*self.order)
+        self.order = []
+        self.values = {}
+        self.tags = {}
+        self._dirty_from = None
+        self._needs_sync = False
+
+
+class VirtualTreeview:
+    """虚拟列表：所有行只保存在内存中，Treeview 里只有可见的几行
+
+    Treeview 中的项（slot0、slot1…）在滚动时重复使用，只更新其中的值，
+    因此扩展数量再多也只有几十个Tk项。滚动条、鼠标滚轮和方向键由本类处理，
+    选中状态按扩展ID保存，滚出可见范围后仍然保留。排序和过滤只改变内存中的
+    顺序。接口与 KeyedTreeview 相同。
+    """
+
+    def __init__(self, tree, scrollbar, buffer_rows=VIRTUAL_BUFFER_ROWS):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.buffer_rows = buffer_rows
+        self.order = []      # 显示顺序中的扩展ID
+        self.values = {}     # 扩展ID -> 行的值
+        self.selected = set()
+        self.sort_field = None
+        self.sort_reverse = False
+        self.filter_ids = None  # 匹配过滤条件的扩展ID，None 表示不过滤
+        self.top = 0         # 第一个可见行在显示列表中的位置
+        self.focus_index = None
+        self.slots = []      # Treeview 中实际存在的项
+        self.slot_ids = {}   # 项 -> 当前显示的扩展ID
+        self.slot_state = {}  # 项 -> 当前显示的 (值, 标签)
+        self._shown = None      # 过滤后的显示列表
+        self._positions = None  # 扩展ID -> 在显示列表中的位置
+        self._render_pending = False
+
+        scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", lambda event: self.schedule_render())
+        tree.bind("<<TreeviewSelect>>", self._on_select)
+        tree.bind("<MouseWheel>", self._on_mousewheel)
+        tree.bind("<Button-4>", lambda event: self.scroll(-WHEEL_SCROLL_ROWS))
+        tree.bind("<Button-5>", lambda event: self.scroll(WHEEL_SCROLL_ROWS))
+        for key, step in (("<Up>", -1), ("<Down>", 1)):
+            tree.bind(key, lambda event, step=step: self._move_focus(step))
+        tree.bind("<Prior>", lambda event: self._move_focus(-self.visible_rows()))
+        tree.bind("<Next>", lambda event: self._move_focus(self.visible_rows()))
+        tree.bind("<Home>", lambda event: self._move_focus(-len(self.order)))
+        tree.bind("<End>", lambda event: self._move_focus(len(self.order)))
+
+    def __contains__(self, extension_id):
+        return extension_id in self.values
+
+    def __len__(self):
+        return len(self.order)
+
+    def shown(self):
+        """过滤后的显示列表"""
+        if self._shown is None:
+            if self.filter_ids is None:
+                self._shown = self.order
+            else:
+                self._shown = [extension_id for extension_id in self.order if extension_id in self.filter_ids]
+        return self._shown
+
+    def _position_map(self):
+        if self._positions is None:
+            self._positions = {extension_id: index for index, extension_id in enumerate(self.shown())}
+        return self._positions
+
+    def _order_changed(self):
+        self._shown = None
+        self._positions = None
+        self.schedule_render()
+
+    def set_filter(self, extension_ids):
+        """只显示指定的扩展，None 表示显示全部"""
+        self.filter_ids = None if extension_ids is None else set(extension_ids)
+        self.top = 0
+        self.focus_index = None
+        self._order_changed()
+
+    def upsert(self, ext, index=None):
+        """插入或更新一行，index 为 None 时新行追加到末尾、已有行位置不变"""
+        extension_id = ext["id"]
+        is_new = extension_id not in self.values
+        self.values[extension_id] = row_values(ext)
+        if is_new:
+            if index is None or index >= len(self.order):
+                # 追加到末尾时直接更新显示列表，分批加载大量行时不必重建索引
+                self.order.append(extension_id)
+                if self.filter_ids is None or extension_id in self.filter_ids:
+                    if self._shown is not None and self._shown is not self.order:
+                        self._shown.append(extension_id)
+                    if self._positions is not None:
+                        self._positions[extension_id] = len(self.shown()) - 1
+                self.schedule_render()
+            else:
+                self.order.insert(index, extension_id)
+                self._order_changed()
+            return
+        if index is not None:
+            index = min(index, len(self.order) - 1)
+            if self.order[index] != extension_id:
+                self.order.remove(extension_id)
+                self.order.insert(index, extension_id)
+                self._order_changed()
+                return
+        self.schedule_render()
+
+    def set_field(self, extension_id, field, value):
+        """只更新一行中的一个字段"""
+        values = self.values.get(extension_id)
+        if values is None:
+            return
+        column = ROW_FIELDS.index(field)
+        if values[column] == value:
+            return
+        self.values[extension_id] = values[:column] + (value,) + values[column + 1:]
+        position = self._position_map().get(extension_id)
+        if position is not None and self.top <= position < self.top + len(self.slots):
+            self.schedule_render()
+
+    def remove(self, extension_ids):
+        """删除多行"""
+        removed = {extension_id for extension_id in extension_ids if extension_id in self.values}
+        if not removed:
+            return
+        self.order = [extension_id for extension_id in self.order if extension_id not in removed]
+        for extension_id in removed:
+            del self.values[extension_id]
+        self.selected -= removed
+        self.focus_index = None
+        self._order_changed()
+
+    def apply(self, extensions):
+        """使内容与扩展列表一致，返回 diff_rows 的结果"""
+        diff = diff_rows(self.order, self.values, extensions)
+        self.order = [ext["id"] for ext in extensions]
+        self.values = {ext["id"]: row_values(ext) for ext in extensions}
+        self.selected &= set(self.values)
+        self._order_changed()
+        return diff
+
+    def retag(self):
+        # 交替颜色在显示时按位置计算
+        self.schedule_render()
+
+    def sort(self, field, reverse=False):
+        """按某一列排序，只重排内存中的顺序"""
+        self.sort_field = field
+        self.sort_reverse = reverse
+        self.order = sorted_ids(self.order, self.values, field, reverse)
+        self.focus_index = None
+        self._order_changed()
+
+    def selection(self):
+        """选中行的扩展ID，按显示顺序，被过滤掉的行不算"""
+        positions = self._position_map()
+        return sorted((extension_id for extension_id in self.selected if extension_id in positions),
+                      key=positions.get)
+
+    def get_values(self, extension_id):
+        return self.values.get(extension_id)
+
+    def clear(self):
+        self.order = []
+        self.values = {}
+        self.selected = set()
+        self.top = 0
+        self.focus_index = None
+        self._order_changed()
+
+    def visible_rows(self):
+        """Treeview 当前高度能显示的行数"""
+        row_height = int(self.tree.tk.call("ttk::style", "lookup", "Treeview", "-rowheight") or 20)
+        header_height = row_height
+        if self.slots:
+            bbox = self.tree.bbox(self.slots[0])
+            if bbox:
+                header_height = bbox[1]
+        return max(1, (self.tree.winfo_height() - header_height) // row_height)
+
+    def schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.tree.after_idle(self.render)
+
+    def render(self):
+        """把从 top 开始的行写入 Treeview 中的项"""
+        self._render_pending = False
+        visible = self.visible_rows()
+        shown = self.shown()
+        self.top = max(0, min(self.top, len(shown) - visible))
+        window = shown[self.top:self.top + visible + self.buffer_rows]
+
+        # 项的数量随窗口大小增减，内容不变的项不调用Tk
+        while len(self.slots) < len(window):
+            slot = f"slot{len(self.slots)}"
+            self.tree.insert("", "end", iid=slot)
+            self.slots.append(slot)
+        while len(self.slots) > len(window):
+            slot = self.slots.pop()
+            self.tree.delete(slot)
+            self.slot_ids.pop(slot, None)
+            self.slot_state.pop(slot, None)
+
+        selected_slots = []
+        for offset, (slot, extension_id) in enumerate(zip(self.slots, window)):
+            index = self.top + offset
+            state = (self.values[extension_id], 'oddrow' if index % 2 == 0 else 'evenrow')
+            if self.slot_state.get(slot) != state:
+                self.tree.item(slot, values=state[0], tags=(state[1],))
+                self.slot_state[slot] = state
+            self.slot_ids[slot] = extension_id
+            if extension_id in self.selected:
+                selected_slots.append(slot)
+
+        if set(self.tree.selection()) != set(selected_slots):
+            self.tree.selection_set(selected_slots)
+        if self.focus_index is not None and self.top <= self.focus_index < self.top + len(self.slots):
+            self.tree.focus(self.slots[self.focus_index - self.top])
+        # 所有项都在Treeview的可见范围内，它自身不应滚动
+        self.tree.yview_moveto(0)
+        self._update_scrollbar(visible)
+
+    def _update_scrollbar(self, visible):
+        total = len(self.shown())
+        if total <= visible:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+
+    def scroll(self, rows):
+        top = max(0, min(self.top + rows, len(self.shown()) - self.visible_rows()))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+
+    def yview(self, *args):
+        """滚动条的回调"""
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.shown()))
+            self.render()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.scroll(amount * self.visible_rows() if args[2] == "pages" else amount)
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-WHEEL_SCROLL_ROWS if event.delta > 0 else WHEEL_SCROLL_ROWS)
+
+    def _on_select(self, event):
+        """把Treeview中的选择同步到按扩展ID保存的选中状态"""
+        window_ids = {self.slot_ids[slot] for slot in self.slots if slot in self.slot_ids}
+        tree_selected = {self.slot_ids[slot] for slot in self.tree.selection() if slot in self.slot_ids}
+        self.selected = (self.selected - window_ids) | tree_selected
+        focus = self.tree.focus()
+        if focus in self.slot_ids:
+            self.focus_index = self.slots.index(focus) + self.top
+
+    def _move_focus(self, step):
+        """方向键移动焦点，移出可见范围时滚动列表"""
+        shown = self.shown()
+        if not shown:
+            return "break"
+        if self.focus_index is None:
+            self.focus_index = self.top
+        else:
+            self.focus_index = max(0, min(self.focus_index + step, len(shown) - 1))
+        visible = self.visible_rows()
+        if self.focus_index < self.top:
+            self.top = self.focus_index
+        elif self.focus_index >= self.top + visible:
+            self.top = self.focus_index - visible + 1
+        self.selected = {shown[self.focus_index]}
+        self.render()
+        return "break"
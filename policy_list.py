@@ -0,0 +1,165 @@
+import heapq
+
+
+class PolicyList:
+    """Chrome 扩展策略列表（ExtensionInstallForcelist / ExtensionInstallAllowlist）
+
+    列表中的值以 "1"、"2"… 编号，值的内容以扩展ID开头（强制安装列表为
+    "ID;更新地址"）。创建时一次性读取整个列表并建立 扩展ID -> 编号 的索引，
+    之后的更新和删除不再枚举注册表；新项优先使用编号中的空缺。
+    """
+
+    def __init__(self, registry, root, path):
+        self.registry = registry
+        self.root = root
+        self.path = path
+        self.slots = {}        # 编号 -> 值
+        self.index = {}        # 扩展ID -> 编号
+        self.duplicates = []   # 同一扩展ID的多余编号
+        self.other_names = []  # 不是数字编号的值名称
+        self._free = []        # 删除后空出、位于 _gap_cursor 之前的编号（最小堆）
+        self._gap_cursor = 1   # 从这里向上查找加载时已有的空缺
+        self._next_slot = 1
+        self._load()
+
+    @staticmethod
+    def extension_id_of(value_data):
+        return str(value_data).split(';', 1)[0].strip().lower()
+
+    def _load(self):
+        try:
+            values = self.registry.read_values(self.root, self.path)
+        except FileNotFoundError:
+            values = {}
+        for name, data in values.items():
+            if not name.isdigit() or int(name) <= 0:
+                self.other_names.append(name)
+                continue
+            slot = int(name)
+            self.slots[slot] = data
+            extension_id = self.extension_id_of(data)
+            if extension_id in self.index:
+                self.duplicates.append(slot)
+            else:
+                self.index[extension_id] = slot
+
+        # 编号中的空缺在分配时才逐个查找，编号很大时也不会生成很长的空缺列表
+        self._next_slot = max(self.slots, default=0) + 1
+        self._gap_cursor = 1
+        self._free = []
+
+    def __contains__(self, extension_id):
+        return extension_id.lower() in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, extension_id):
+        slot = self.index.get(extension_id.lower())
+        return None if slot is None else self.slots[slot]
+
+    def items(self):
+        """按编号顺序返回 [(扩展ID, 值)]"""
+        return [(extension_id, self.slots[slot])
+                for extension_id, slot in sorted(self.index.items(), key=lambda item: item[1])]
+
+    def _take_slot(self):
+        """返回最小的空闲编号"""
+        if self._free:
+            return heapq.heappop(self._free)
+        while self._gap_cursor < self._next_slot:
+            slot = self._gap_cursor
+            self._gap_cursor += 1
+            if slot not in self.slots:
+                return slot
+        slot = self._next_slot
+        self._next_slot += 1
+        self._gap_cursor = self._next_slot
+        return slot
+
+    def _release_slot(self, slot):
+        # _gap_cursor 之后的空缺会被向上查找时找到，不放入堆中以免重复分配
+        if slot < self._gap_cursor:
+            heapq.heappush(self._free, slot)
+
+    def upsert(self, extension_id, value_data=None):
+        """添加或更新一项，值相同时不写注册表，返回是否写入"""
+        extension_id = extension_id.lower()
+        if value_data is None:
+            value_data = extension_id
+        slot = self.index.get(extension_id)
+        if slot is not None and self.slots[slot] == value_data:
+            return False
+        if slot is None:
+            slot = self._take_slot()
+            self.index[extension_id] = slot
+        self.registry.write_values(self.root, self.path, {str(slot): value_data})
+        self.slots[slot] = value_data
+        return True
+
+    def upsert_many(self, items):
+        """批量添加或更新 [(扩展ID, 值)]，只写入有变化的项，返回写入数量"""
+        changed = {}
+        for extension_id, value_data in items:
+            extension_id = extension_id.lower()
+            slot = self.index.get(extension_id)
+            if slot is not None and self.slots[slot] == value_data:
+                continue
+            if slot is None:
+                slot = self._take_slot()
+                self.index[extension_id] = slot
+            self.slots[slot] = value_data
+            changed[str(slot)] = value_data
+        if changed:
+            self.registry.write_values(self.root, self.path, changed)
+        return len(changed)
+
+    def remove(self, extension_id):
+        """删除一项，空出的编号留给后续新增项"""
+        slot = self.index.pop(extension_id.lower(), None)
+        if slot is None:
+            return False
+        self.registry.delete_value(self.root, self.path, str(slot))
+        del self.slots[slot]
+        self._release_slot(slot)
+        return True
+
+    def remove_all(self, extension_id):
+        """删除一项及其重复项，返回删除的数量"""
+        extension_id = extension_id.lower()
+        removed = int(self.remove(extension_id))
+        for slot in [slot for slot in self.duplicates if self.extension_id_of(self.slots[slot]) == extension_id]:
+            self.registry.delete_value(self.root, self.path, str(slot))
+            del self.slots[slot]
+            self.duplicates.remove(slot)
+            self._release_slot(slot)
+            removed += 1
+        return removed
+
+    def compact(self):
+        """删除重复项并把编号重排为连续的 1..n，返回写入的值数量"""
+        for slot in self.duplicates:
+            self.registry.delete_value(self.root, self.path, str(slot))
+            del self.slots[slot]
+        self.duplicates = []
+
+        ordered = sorted(self.index.items(), key=lambda item: item[1])
+        new_slots = {}
+        changed = {}
+        for new_slot, (extension_id, old_slot) in enumerate(ordered, start=1):
+            value_data = self.slots[old_slot]
+            new_slots[new_slot] = value_data
+            self.index[extension_id] = new_slot
+            if old_slot != new_slot:
+                changed[str(new_slot)] = value_data
+        if changed:
+            self.registry.write_values(self.root, self.path, changed)
+        for old_slot in self.slots:
+            if old_slot not in new_slots:
+                self.registry.delete_value(self.root, self.path, str(old_slot))
+
+        self.slots = new_slots
+        self._next_slot = len(new_slots) + 1
+        self._gap_cursor = self._next_slot
+        self._free = []
+        return len(changed)
@@ -0,0 +1,518 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import winreg
+except ImportError:
+    # 非Windows系统只能使用内存/文件注册表
+    winreg = None
+
+# 根键名称，与具体实现无关
+HKEY_CURRENT_USER = "HKEY_CURRENT_USER"
+HKEY_LOCAL_MACHINE = "HKEY_LOCAL_MACHINE"
+
+# 指定该环境变量时使用JSON文件模拟注册表
+REGISTRY_FILE_ENV = "CHROME_EXTENSION_REGISTRY"
+
+# RegNotifyChangeKeyValue 的参数
+REG_NOTIFY_CHANGE_NAME = 0x00000001
+REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
+WAIT_OBJECT_0 = 0
+
+# 枚举子键或值到末尾时的错误码，其他错误（如键已被删除）不能当作枚举结束
+ERROR_NO_MORE_ITEMS = 259
+
+# 缓存的键句柄数量上限，超出时关闭最久未使用的句柄
+HANDLE_CACHE_SIZE = 64
+
+
+class RegistryBackend:
+    """注册表访问接口
+
+    路径使用反斜杠分隔，不存在的键或值抛出 OSError（Windows上即 WindowsError）。
+    所有值按字符串（REG_SZ）读写。
+    """
+
+    def list_subkeys(self, root, path):
+        raise NotImplementedError
+
+    def read_values(self, root, path):
+        """读取一个键下的所有值，返回 {名称: 值}"""
+        raise NotImplementedError
+
+    def read_value(self, root, path, name):
+        values = self.read_values(root, path)
+        if name not in values:
+            raise FileNotFoundError(f"注册表值不存在: {path}\\{name}")
+        return values[name]
+
+    def read_subkey_values(self, root, path):
+        """一次读取所有子键的值，返回 {子键名: {名称: 值}}，键不存在时返回空字典"""
+        try:
+            subkeys = self.list_subkeys(root, path)
+        except OSError:
+            return {}
+        result = {}
+        for subkey in subkeys:
+            try:
+                result[subkey] = self.read_values(root, f"{path}\\{subkey}")
+            except OSError:
+                continue
+        return result
+
+    def write_values(self, root, path, values):
+        """写入多个值，键不存在时创建"""
+        raise NotImplementedError
+
+    def delete_value(self, root, path, name):
+        raise NotImplementedError
+
+    def delete_key(self, root, path):
+        raise NotImplementedError
+
+    def watch(self, root, path):
+        """监视一个键及其子键的变化，返回带 wait(超时秒数) 方法的对象
+
+        wait() 在超时前发生变化时返回 True，否则返回 False。
+        不支持变化通知时返回 None，调用方只能定时轮询。
+        """
+        return None
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class WinRegistryWatcher:
+    """通过 RegNotifyChangeKeyValue 等待注册表键的变化
+
+    收到通知后立即重新注册，调用方在之后读取注册表，两次通知之间的修改不会遗漏。
+    """
+
+    def __init__(self, root_handle, path):
+        import ctypes
+        from ctypes import wintypes
+        self._wintypes = wintypes
+        self._advapi32 = ctypes.WinDLL("advapi32")
+        self._kernel32 = ctypes.WinDLL("kernel32")
+        self._kernel32.CreateEventW.restype = wintypes.HANDLE
+        self._kernel32.CreateEventW.argtypes = [ctypes.c_void_p, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+        self._kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+        self._kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self._advapi32.RegNotifyChangeKeyValue.argtypes = [
+            wintypes.HKEY, wintypes.BOOL, wintypes.DWORD, wintypes.HANDLE, wintypes.BOOL]
+
+        self._key = winreg.OpenKey(root_handle, path, 0, winreg.KEY_NOTIFY)
+        self._event = self._kernel32.CreateEventW(None, False, False, None)
+        if not self._event:
+            self._key.Close()
+            raise OSError("创建事件失败")
+        try:
+            self._register()
+        except OSError:
+            self.close()
+            raise
+
+    def _register(self):
+        result = self._advapi32.RegNotifyChangeKeyValue(
+            self._wintypes.HKEY(int(self._key)), True,
+            REG_NOTIFY_CHANGE_NAME | REG_NOTIFY_CHANGE_LAST_SET, self._event, True)
+        if result != 0:
+            raise OSError(f"RegNotifyChangeKeyValue 失败: {result}")
+
+    def wait(self, timeout):
+        if self._kernel32.WaitForSingleObject(self._event, int(timeout * 1000)) != WAIT_OBJECT_0:
+            return False
+        self._register()
+        return True
+
+    def close(self):
+        if self._key is not None:
+            self._key.Close()
+            self._key = None
+        if self._event:
+            self._kernel32.CloseHandle(self._event)
+            self._event = None
+
+
+def _enum_keys(key):
+    subkeys = []
+    i = 0
+    while True:
+        try:
+            subkeys.append(winreg.EnumKey(key, i))
+        except OSError as e:
+            if getattr(e, "winerror", None) == ERROR_NO_MORE_ITEMS:
+                return subkeys
+            raise
+        i += 1
+
+
+def _enum_values(key):
+    values = {}
+    i = 0
+    while True:
+        try:
+            name, data, _ = winreg.EnumValue(key, i)
+        except OSError as e:
+            if getattr(e, "winerror", None) == ERROR_NO_MORE_ITEMS:
+                return values
+            raise
+        values[name] = data
+        i += 1
+
+
+class WinRegistryBackend(RegistryBackend):
+    """基于 winreg 的实现
+
+    最近使用的 HANDLE_CACHE_SIZE 个键句柄会被缓存复用（主要是扩展键和策略列表这些
+    上级键），超出时关闭最久未使用的句柄。缓存的句柄只在持有 _lock 时使用，不会
+    在使用中被另一个线程关闭。键被其他进程删除或重建后句柄失效，操作失败时丢弃
+    该句柄并重新打开一次。
+    """
+
+    def __init__(self):
+        if winreg is None:
+            raise OSError("当前系统不支持 winreg")
+        self._roots = {
+            HKEY_CURRENT_USER: winreg.HKEY_CURRENT_USER,
+            HKEY_LOCAL_MACHINE: winreg.HKEY_LOCAL_MACHINE,
+        }
+        self._handles = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _open_key(self, root, path, write=False):
+        if write:
+            return winreg.CreateKeyEx(self._roots[root], path, 0, winreg.KEY_ALL_ACCESS)
+        return winreg.OpenKey(self._roots[root], path, 0, winreg.KEY_READ)
+
+    def _call(self, root, path, write, operation):
+        """用缓存的句柄执行 operation(句柄)，句柄失效时重新打开一次"""
+        cache_key = (root, path.lower(), write)
+        with self._lock:
+            handle = self._handles.get(cache_key)
+            if handle is not None:
+                self._handles.move_to_end(cache_key)
+                try:
+                    return operation(handle)
+                except OSError:
+                    # 键可能已被其他进程删除或重建，丢弃旧句柄后重试
+                    del self._handles[cache_key]
+                    winreg.CloseKey(handle)
+            handle = self._open_key(root, path, write)
+            self._handles[cache_key] = handle
+            while len(self._handles) > HANDLE_CACHE_SIZE:
+                winreg.CloseKey(self._handles.popitem(last=False)[1])
+            return operation(handle)
+
+    def _forget(self, root, path):
+        """关闭某个键及其子键的缓存句柄"""
+        prefix = path.lower()
+        with self._lock:
+            for cache_key in list(self._handles):
+                key_root, key_path, _ = cache_key
+                if key_root == root and (key_path == prefix or key_path.startswith(prefix + "\\")):
+                    winreg.CloseKey(self._handles.pop(cache_key))
+
+    def list_subkeys(self, root, path):
+        return self._call(root, path, False, _enum_keys)
+
+    def read_values(self, root, path):
+        return self._call(root, path, False, _enum_values)
+
+    def read_value(self, root, path, name):
+        return self._call(root, path, False, lambda key: winreg.QueryValueEx(key, name)[0])
+
+    def read_subkey_values(self, root, path):
+        # 扫描期间不持有 _lock，父键和子键都使用本次扫描自己打开的句柄，不放入缓存
+        try:
+            parent = self._open_key(root, path)
+        except OSError:
+            return {}
+        result = {}
+        with parent:
+            try:
+                subkeys = _enum_keys(parent)
+            except OSError:
+                return {}
+            for subkey in subkeys:
+                try:
+                    with winreg.OpenKey(parent, subkey, 0, winreg.KEY_READ) as key:
+                        result[subkey] = _enum_values(key)
+                except OSError:
+                    continue
+        return result
+
+    def write_values(self, root, path, values):
+        def write(key):
+            for name, data in values.items():
+                winreg.SetValueEx(key, name, 0, winreg.REG_SZ, data)
+        self._call(root, path, True, write)
+
+    def delete_value(self, root, path, name):
+        self._call(root, path, True, lambda key: winreg.DeleteValue(key, name))
+
+    def delete_key(self, root, path):
+        self._forget(root, path)
+        winreg.DeleteKey(self._roots[root], path)
+
+    def watch(self, root, path):
+        try:
+            return WinRegistryWatcher(self._roots[root], path)
+        except (OSError, AttributeError):
+            return None
+
+    def close(self):
+        with self._lock:
+            for handle in self._handles.values():
+                winreg.CloseKey(handle)
+            self._handles = OrderedDict()
+
+
+class MemoryRegistryWatcher:
+    """内存注册表的变化通知，每次修改都会唤醒监视该键或其上级键的 wait()"""
+
+    def __init__(self, backend, root, path):
+        self.backend = backend
+        self.root = root
+        self.prefix = path.lower().strip("\\")
+        self.changes = 0  # 尚未被 wait() 取走的修改次数
+
+    def matches(self, root, path):
+        path = path.lower().strip("\\")
+        return root == self.root and (path == self.prefix or path.startswith(self.prefix + "\\")
+                                      or self.prefix.startswith(path + "\\"))
+
+    def wait(self, timeout):
+        with self.backend._changed:
+            self.backend._changed.wait_for(lambda: self.changes, timeout)
+            changed = self.changes > 0
+            self.changes = 0
+        return changed
+
+    def close(self):
+        with self.backend._changed:
+            if self in self.backend._watchers:
+                self.backend._watchers.remove(self)
+
+
+class MemoryRegistryBackend(RegistryBackend):
+    """内存中的注册表，键名和值名不区分大小写，用于测试和性能分析
+
+    watch() 返回的对象在每次修改后收到通知，可以在没有 winreg 的系统上
+    测试依赖变化通知的逻辑。
+    """
+
+    def __init__(self, data=None):
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._watchers = []
+        self._roots = {}
+        if data:
+            for root, tree in data.items():
+                self._roots[root] = self._from_dict(tree)
+
+    @staticmethod
+    def _new_node(name=""):
+        return {"name": name, "values": {}, "subkeys": {}}
+
+    @classmethod
+    def _from_dict(cls, tree, name=""):
+        node = cls._new_node(name)
+        for value_name, data in tree.get("values", {}).items():
+            node["values"][value_name.lower()] = (value_name, data)
+        for subkey, child in tree.get("subkeys", {}).items():
+            node["subkeys"][subkey.lower()] = cls._from_dict(child, subkey)
+        return node
+
+    @classmethod
+    def _to_dict(cls, node):
+        return {
+            "values": dict(node["values"].values()),
+            "subkeys": {child["name"]: cls._to_dict(child) for child in node["subkeys"].values()},
+        }
+
+    def to_dict(self):
+        with self._lock:
+            return {root: self._to_dict(node) for root, node in self._roots.items()}
+
+    def _find(self, root, path, create=False):
+        node = self._roots.get(root)
+        if node is None:
+            if not create:
+                raise FileNotFoundError(f"注册表项不存在: {root}\\{path}")
+            node = self._roots[root] = self._new_node(root)
+        for part in path.split("\\"):
+            if not part:
+                continue
+            child = node["subkeys"].get(part.lower())
+            if child is None:
+                if not create:
+                    raise FileNotFoundError(f"注册表项不存在: {root}\\{path}")
+                child = node["subkeys"][part.lower()] = self._new_node(part)
+            node = child
+        return node
+
+    def _notify(self, root, path):
+        """通知监视该键的对象，调用时须持有 _lock"""
+        notified = False
+        for watcher in self._watchers:
+            if watcher.matches(root, path):
+                watcher.changes += 1
+                notified = True
+        if notified:
+            self._changed.notify_all()
+
+    def watch(self, root, path):
+        watcher = MemoryRegistryWatcher(self, root, path)
+        with self._lock:
+            self._watchers.append(watcher)
+        return watcher
+
+    def list_subkeys(self, root, path):
+        with self._lock:
+            return [child["name"] for child in self._find(root, path)["subkeys"].values()]
+
+    def read_values(self, root, path):
+        with self._lock:
+            return dict(self._find(root, path)["values"].values())
+
+    def read_value(self, root, path, name):
+        with self._lock:
+            entry = self._find(root, path)["values"].get(name.lower())
+        if entry is None:
+            raise FileNotFoundError(f"注册表值不存在: {path}\\{name}")
+        return entry[1]
+
+    def read_subkey_values(self, root, path):
+        with self._lock:
+            try:
+                node = self._find(root, path)
+            except OSError:
+                return {}
+            return {child["name"]: dict(child["values"].values())
+                    for child in node["subkeys"].values()}
+
+    def write_values(self, root, path, values):
+        with self._lock:
+            node = self._find(root, path, create=True)
+            for name, data in values.items():
+                node["values"][name.lower()] = (name, data)
+            self._notify(root, path)
+
+    def delete_value(self, root, path, name):
+        with self._lock:
+            node = self._find(root, path)
+            if node["values"].pop(name.lower(), None) is None:
+                raise FileNotFoundError(f"注册表值不存在: {path}\\{name}")
+            self._notify(root, path)
+
+    def delete_key(self, root, path):
+        parent_path, _, name = path.rpartition("\\")
+        with self._lock:
+            parent = self._find(root, parent_path)
+            child = parent["subkeys"].get(name.lower())
+            if child is None:
+                raise FileNotFoundError(f"注册表项不存在: {root}\\{path}")
+            if child["subkeys"]:
+                # 与 winreg.DeleteKey 一致，不能删除含子键的键
+                raise PermissionError(f"注册表项包含子项: {root}\\{path}")
+            del parent["subkeys"][name.lower()]
+            self._notify(root, path)
+
+
+class FileRegistryBackend(MemoryRegistryBackend):
+    """保存在JSON文件中的注册表，写入在 flush() 或 close() 时落盘
+
+    没有未保存的修改时，读取前会检查文件是否被其他进程修改过，修改过则重新加载。
+    其他进程的修改没有变化通知，watch() 返回 None，由调用方轮询。
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        super().__init__(self._read_file())
+        self._dirty = False
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_file(self):
+        self._loaded_mtime = self._file_mtime()
+        if self._loaded_mtime is None:
+            return None
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _reload_if_changed(self):
+        with self._lock:
+            if self._dirty or self._file_mtime() == self._loaded_mtime:
+                return
+            data = self._read_file() or {}
+            self._roots = {root: self._from_dict(tree) for root, tree in data.items()}
+
+    def watch(self, root, path):
+        return None
+
+    def list_subkeys(self, root, path):
+        self._reload_if_changed()
+        return super().list_subkeys(root, path)
+
+    def read_values(self, root, path):
+        self._reload_if_changed()
+        return super().read_values(root, path)
+
+    def read_subkey_values(self, root, path):
+        self._reload_if_changed()
+        return super().read_subkey_values(root, path)
+
+    def write_values(self, root, path, values):
+        super().write_values(root, path, values)
+        self._dirty = True
+
+    def delete_value(self, root, path, name):
+        super().delete_value(root, path, name)
+        self._dirty = True
+
+    def delete_key(self, root, path):
+        super().delete_key(root, path)
+        self._dirty = True
+
+    def flush(self):
+        if not self._dirty:
+            return
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(temp_path, self.file_path)
+        self._loaded_mtime = self._file_mtime()
+        self._dirty = False
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def get_registry_backend():
+    """返回进程共用的注册表实现
+
+    设置了 CHROME_EXTENSION_REGISTRY 环境变量时使用该JSON文件，
+    否则在Windows上使用 winreg，其他系统使用内存注册表。
+    """
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            file_path = os.environ.get(REGISTRY_FILE_ENV)
+            if file_path:
+                _default_backend = FileRegistryBackend(file_path)
+            elif winreg is not None:
+                _default_backend = WinRegistryBackend()
+            else:
+                _default_backend = MemoryRegistryBackend()
+        return _default_backend
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import time
+
+# 启动到首次显示扩展列表的时间预算（毫秒）
+STARTUP_BUDGET_MS = 1000
+
+# 进程开始的近似时间：本模块应当是主程序最先导入的模块之一
+PROCESS_START = time.perf_counter()
+
+
+class StartupTrace:
+    """记录启动过程中各阶段的耗时
+
+    mark() 记录从进程开始到当前的时间，report() 输出各阶段耗时并与时间预算比较，
+    指定 output_file 时同时写入JSON文件（打包成无控制台的exe时只能通过文件查看）。
+    """
+
+    def __init__(self, output_file=None, budget_ms=STARTUP_BUDGET_MS):
+        self.output_file = output_file
+        self.budget_ms = budget_ms
+        self.marks = []
+        self.reported = False
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - PROCESS_START) * 1000))
+
+    def elapsed_ms(self, name):
+        for mark_name, elapsed in self.marks:
+            if mark_name == name:
+                return elapsed
+        return None
+
+    def report(self, budget_mark="first_paint"):
+        """输出各阶段耗时，只输出一次"""
+        if self.reported:
+            return
+        self.reported = True
+        print("\n=== 启动耗时 ===")
+        previous = 0.0
+        for name, elapsed in self.marks:
+            print(f"{name:<14} {elapsed:8.1f} ms  (+{elapsed - previous:.1f} ms)")
+            previous = elapsed
+
+        total = self.elapsed_ms(budget_mark)
+        within_budget = total is not None and total <= self.budget_ms
+        if total is None:
+            print(f"× 未记录到 {budget_mark}")
+        elif within_budget:
+            print(f"√ {budget_mark} 用时 {total:.1f} ms，在预算 {self.budget_ms} ms 以内")
+        else:
+            print(f"× {budget_mark} 用时 {total:.1f} ms，超出预算 {self.budget_ms} ms")
+
+        if self.output_file:
+            data = {
+                "frozen": bool(getattr(sys, "frozen", False)),
+                "budget_ms": self.budget_ms,
+                "within_budget": within_budget,
+                "marks": [{"name": name, "elapsed_ms": round(elapsed, 3)} for name, elapsed in self.marks],
+            }
+            with open(self.output_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            print(f"启动耗时已写入: {os.path.abspath(self.output_file)}")
+        return within_budget
+
+
+def parse_startup_trace_args(argv):
+    """从命令行参数中取出 --startup-trace[=文件]，返回 (StartupTrace或None, 其余参数)"""
+    trace = None
+    remaining = []
+    for arg in argv:
+        if arg == "--startup-trace":
+            trace = StartupTrace()
+        elif arg.startswith("--startup-trace="):
+            trace = StartupTrace(arg.split("=", 1)[1])
+        else:
+            remaining.append(arg)
+    return trace, remaining
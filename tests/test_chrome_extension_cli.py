@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+import chrome_extension_cli
+import registry_backend
+from extension_name_bundle import SQLITE_HEADER
+
+
+@pytest.fixture
+def isolated_registry(tmp_path, monkeypatch):
+    # 命令行使用进程共用的注册表，测试时换成临时JSON文件
+    monkeypatch.setenv(registry_backend.REGISTRY_FILE_ENV, str(tmp_path / "registry.json"))
+    monkeypatch.setattr(registry_backend, "_default_backend", None)
+    return tmp_path
+
+
+def test_import_bundle_reports_corrupt_sqlite_file(isolated_registry, capsys):
+    bundle = isolated_registry / "names.db"
+    bundle.write_bytes(SQLITE_HEADER + b"\x00garbage" * 512)
+    cache_file = str(isolated_registry / "extension_names.json")
+
+    exit_code = chrome_extension_cli.main(["--cache-file", cache_file, "import-bundle", str(bundle)])
+
+    assert exit_code == 1
+    record = json.loads(capsys.readouterr().out.strip())
+    assert record["path"] == str(bundle)
+    assert record["error"]
@@ -0,0 +1,101 @@
+import os
+import random
+
+import pytest
+
+from benchmark import make_crx
+from chrome_extension_installer import ChromeExtensionInstaller
+from extension_inventory import EVENT_INSTALL, ExtensionInventory
+from policy_list import PolicyList
+from registry_backend import HKEY_LOCAL_MACHINE, MemoryRegistryBackend
+
+EXTENSIONS_KEY = r"Software\Google\Chrome\Extensions"
+FORCELIST = r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"
+ALLOWLIST = r"Software\Policies\Google\Chrome\ExtensionInstallAllowlist"
+
+
+@pytest.fixture
+def installer(tmp_path):
+    return ChromeExtensionInstaller(registry=MemoryRegistryBackend(), extension_dir=str(tmp_path / "Extensions"),
+                                    inventory=ExtensionInventory(str(tmp_path / "inventory.db")))
+
+
+def _crx(tmp_path, relative_path, rng):
+    path = str(tmp_path / relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path, make_crx(path, 4, rng, os.path.basename(path))
+
+
+def _registered_ids(registry):
+    return set(registry.read_subkey_values(HKEY_LOCAL_MACHINE, EXTENSIONS_KEY))
+
+
+def test_install_batch_rejects_same_basename_from_different_directories(tmp_path, installer):
+    rng = random.Random(1)
+    first, first_id = _crx(tmp_path, "one/ext.crx", rng)
+    second, second_id = _crx(tmp_path, "two/ext.crx", rng)
+    other, other_id = _crx(tmp_path, "other.crx", rng)
+
+    results = installer.install_batch([first, second, other])
+
+    assert [result["crx_path"] for result in results] == [first, second, other]
+    assert "ext.crx" in results[0]["error"] and "ext.crx" in results[1]["error"]
+    assert results[2]["error"] == ""
+    assert _registered_ids(installer.registry) == {other_id}
+    assert not os.path.exists(os.path.join(installer.extension_dir, "ext.crx"))
+    assert first_id not in PolicyList(installer.registry, HKEY_LOCAL_MACHINE, FORCELIST)
+    assert second_id not in PolicyList(installer.registry, HKEY_LOCAL_MACHINE, FORCELIST)
+    assert PolicyList(installer.registry, HKEY_LOCAL_MACHINE, ALLOWLIST).items() == [(other_id, other_id)]
+
+
+def test_install_batch_allows_same_file_listed_twice(tmp_path, installer):
+    path, extension_id = _crx(tmp_path, "ext.crx", random.Random(2))
+
+    results = installer.install_batch([path, os.path.join(str(tmp_path), ".", "ext.crx")])
+
+    assert [result["error"] for result in results] == ["", ""]
+    assert _registered_ids(installer.registry) == {extension_id}
+
+
+def test_install_batch_with_failed_and_good_crx(tmp_path, installer):
+    rng = random.Random(3)
+    good_one, good_one_id = _crx(tmp_path, "good1.crx", rng)
+    good_two, good_two_id = _crx(tmp_path, "good2.crx", rng)
+    tampered, tampered_id = _crx(tmp_path, "tampered.crx", rng)
+    data = bytearray(open(tampered, 'rb').read())
+    data[-100] ^= 0xFF  # 修改ZIP数据，签名不再有效
+    with open(tampered, 'wb') as f:
+        f.write(data)
+    garbage = str(tmp_path / "garbage.crx")
+    with open(garbage, 'wb') as f:
+        f.write(b"not a crx file")
+    missing = str(tmp_path / "missing.crx")
+
+    results = installer.install_batch([good_one, tampered, garbage, missing, good_two], max_workers=4)
+
+    assert [result["crx_path"] for result in results] == [good_one, tampered, garbage, missing, good_two]
+    assert [bool(result["error"]) for result in results] == [False, True, True, True, False]
+    assert results[1]["id"] == tampered_id
+    assert [result["id"] for result in results if not result["error"]] == [good_one_id, good_two_id]
+
+    registry = installer.registry
+    good_ids = {good_one_id, good_two_id}
+    for path in (EXTENSIONS_KEY, r"Software\Wow6432Node\Google\Chrome\Extensions"):
+        keys = registry.read_subkey_values(HKEY_LOCAL_MACHINE, path)
+        assert set(keys) == good_ids
+        assert keys[good_one_id]["path"] == os.path.join(installer.extension_dir, "good1.crx")
+    forcelist = PolicyList(registry, HKEY_LOCAL_MACHINE, FORCELIST)
+    assert set(dict(forcelist.items())) == good_ids
+    assert forcelist.get(good_two_id).startswith(f"{good_two_id};")
+    assert set(dict(PolicyList(registry, HKEY_LOCAL_MACHINE, ALLOWLIST).items())) == good_ids
+
+    assert sorted(name for name in os.listdir(installer.extension_dir) if name.endswith(".crx")) == [
+        "good1.crx", "good2.crx"]
+    inventory = installer._get_inventory()
+    for result in results:
+        recorded = inventory.get_extension(result["id"]) if result["id"] else None
+        if result["error"]:
+            assert recorded is None
+        else:
+            assert recorded["sha256"] == result["sha256"]
+            assert [event["action"] for event in inventory.events(result["id"])] == [EVENT_INSTALL]
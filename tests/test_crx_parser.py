@@ -0,0 +1,131 @@
+import hashlib
+import io
+import json
+import random
+import struct
+import zipfile
+
+import pytest
+
+from benchmark import make_crx, make_rsa_key, rsa_public_key_der
+from crx_parser import (CRX3_SHA256_WITH_ECDSA, CRX3_SHA256_WITH_RSA, CRX3_SIGNED_HEADER_DATA, CrxError, CrxFile,
+                        extension_id_from_public_key, parse_crx)
+
+MANIFEST = {"manifest_version": 3, "name": "Parser Test", "version": "1.2.3"}
+
+
+def _varint(value):
+    data = b""
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data += bytes([byte | 0x80])
+        else:
+            return data + bytes([byte])
+
+
+def _field(number, value):
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _proof(public_key):
+    return _field(1, public_key) + _field(2, b"signature")
+
+
+def _zip_payload():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps(MANIFEST))
+        archive.writestr("background.js", "console.log('hi');" * 100)
+    return buffer.getvalue()
+
+
+def _crx2(public_key, payload):
+    signature = b"s" * 64
+    return b"Cr24" + struct.pack("<III", 2, len(public_key), len(signature)) + public_key + signature + payload
+
+
+def _crx3(header, payload):
+    return b"Cr24" + struct.pack("<II", 3, len(header)) + header + payload
+
+
+def _write(tmp_path, data, name="test.crx"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_crx2(tmp_path):
+    public_key = b"developer public key"
+    path = _write(tmp_path, _crx2(public_key, _zip_payload()))
+    with CrxFile(path) as crx:
+        assert crx.crx_version == 2
+        assert crx.extension_id == extension_id_from_public_key(public_key)
+        assert crx.zip_offset == crx.payload_offset
+        assert crx.manifest() == MANIFEST
+        assert crx.check_entries() == []
+
+
+def test_crx3_uses_developer_key_not_publisher_key(tmp_path):
+    rng = random.Random(3)
+    path = str(tmp_path / "store.crx")
+    extension_id = make_crx(path, 1, rng, publisher_key=make_rsa_key(rng, 1024))
+    with CrxFile(path) as crx:
+        assert crx.crx_version == 3
+        assert [algorithm for algorithm, _, _ in crx.proofs] == ["ecdsa", "rsa"]
+        assert crx.extension_id == extension_id
+    assert parse_crx(path)[0] == extension_id
+
+
+def test_crx3_with_mismatched_crx_id_raises(tmp_path):
+    rng = random.Random(4)
+    publisher_key = rsa_public_key_der(make_rsa_key(rng, 1024))
+    header = (_field(CRX3_SHA256_WITH_ECDSA, _proof(b"some developer key"))
+              + _field(CRX3_SHA256_WITH_RSA, _proof(publisher_key))
+              + _field(CRX3_SIGNED_HEADER_DATA, _field(1, hashlib.sha256(b"other key").digest()[:16])))
+    path = _write(tmp_path, _crx3(header, _zip_payload()))
+    with pytest.raises(CrxError):
+        CrxFile(path)
+
+
+def test_crx3_without_crx_id(tmp_path):
+    single = _write(tmp_path, _crx3(_field(CRX3_SHA256_WITH_RSA, _proof(b"only key")), _zip_payload()), "single.crx")
+    with CrxFile(single) as crx:
+        assert crx.extension_id == extension_id_from_public_key(b"only key")
+
+    # 有多个公钥时无法判断哪个是开发者公钥
+    header = _field(CRX3_SHA256_WITH_ECDSA, _proof(b"key one")) + _field(CRX3_SHA256_WITH_RSA, _proof(b"key two"))
+    with pytest.raises(CrxError):
+        CrxFile(_write(tmp_path, _crx3(header, _zip_payload()), "two.crx"))
+
+
+@pytest.mark.parametrize("data", [
+    b"Cr24",                                                   # 版本号被截断
+    b"Cr24" + struct.pack("<II", 3, 1000) + b"\x0a\x05abc",    # 文件头长度超出文件
+    b"Cr24" + struct.pack("<III", 2, 5000, 64) + b"key",        # 公钥长度超出文件
+    b"Cr24" + struct.pack("<II", 3, 3) + b"\x12\x10a",          # protobuf 字段被截断
+    b"Cr24" + struct.pack("<II", 3, 0),                         # 没有公钥
+    b"PK\x03\x04" + b"\x00" * 20,                               # 不是CRX文件
+    b"Cr24" + struct.pack("<II", 4, 0),                         # 不支持的版本
+])
+def test_truncated_or_invalid_header_raises(tmp_path, data):
+    with pytest.raises(CrxError):
+        CrxFile(_write(tmp_path, data))
+
+
+def test_truncated_central_directory_raises_crx_error(tmp_path):
+    # 中央目录记录只有开头的签名，字段不完整
+    directory = b"PK\x01\x02" + b"\x00" * 10
+    eocd = struct.pack("<4sHHHHIIH", b"PK\x05\x06", 0, 0, 1, 1, len(directory), 0, 0)
+    path = _write(tmp_path, _crx2(b"key", directory + eocd))
+    with CrxFile(path) as crx:
+        with pytest.raises(CrxError):
+            crx.namelist()
+
+
+def test_missing_end_of_central_directory(tmp_path):
+    path = _write(tmp_path, _crx2(b"key", _zip_payload()[:-30]))
+    with CrxFile(path) as crx:
+        with pytest.raises(CrxError):
+            crx.manifest()
@@ -0,0 +1,68 @@
+import json
+import os
+
+from chrome_extension_installer import ChromeExtensionInstaller
+from crx_store import CrxStore
+from extension_inventory import ExtensionInventory
+from registry_backend import HKEY_LOCAL_MACHINE, MemoryRegistryBackend
+
+FORCELIST = r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"
+EXTENSION_ID = "a" * 32
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_gc_keeps_blob_referenced_only_by_drive_letter_forcelist_url(tmp_path, monkeypatch):
+    # 全局安装工具写入 "ID;file://C:/..."，只有强制安装列表引用这个文件
+    if os.name == 'nt':
+        dest = str(tmp_path / "Chrome_Extensions" / f"{EXTENSION_ID}.crx")
+    else:
+        # 非Windows系统上用名为 "C:" 的相对目录得到同样形式的地址
+        monkeypatch.chdir(tmp_path)
+        dest = os.path.join("C:", "Chrome_Extensions", f"{EXTENSION_ID}.crx")
+    url = "file://" + dest.replace(os.sep, "/")
+    assert url.startswith("file://C:/")
+
+    source = str(tmp_path / "source.crx")
+    _write(source, b"crx content")
+    store_dir = os.path.join(os.path.dirname(dest), ".store")
+    digest, _ = CrxStore(store_dir).place(source, dest)
+
+    registry = MemoryRegistryBackend()
+    registry.write_values(HKEY_LOCAL_MACHINE, FORCELIST, {"1": f"{EXTENSION_ID};{url}"})
+    installer = ChromeExtensionInstaller(registry=registry, extension_dir=str(tmp_path / "Extensions"),
+                                         inventory=ExtensionInventory(str(tmp_path / "inventory.db")))
+
+    references = {path.replace("\\", "/").lower() for path in installer.collect_crx_references()}
+    assert dest.replace("\\", "/").lower() in references
+
+    installer.gc_store([store_dir])
+    store = CrxStore(store_dir)
+    assert os.path.exists(store.blob_path(digest))
+    assert list(store.refs.values()) == [digest]
+
+
+def test_batch_writes_refs_once(tmp_path, monkeypatch):
+    store = CrxStore(str(tmp_path / ".store"))
+    saves = []
+    original = store._save_refs
+    monkeypatch.setattr(store, "_save_refs", lambda: (saves.append(1), original()))
+
+    with store.batch():
+        for i in range(20):
+            source = str(tmp_path / f"src{i}.crx")
+            _write(source, f"content {i}".encode())
+            store.place(source, str(tmp_path / "ext" / f"e{i}.crx"))
+        assert saves == []
+
+    assert len(saves) == 1
+    with open(store.refs_file, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)) == 20
+
+    # batch() 之外仍每次写入
+    store.place(str(tmp_path / "src0.crx"), str(tmp_path / "ext" / "copy.crx"))
+    assert len(saves) == 2
@@ -0,0 +1,57 @@
+import random
+
+import crx_verifier
+from benchmark import make_crx, make_rsa_key
+from crx_store import hash_file
+from crx_verifier import CrxVerifier, verify_crx
+
+
+def _corpus(tmp_path, count=3):
+    rng = random.Random(7)
+    publisher_key = make_rsa_key(rng, 1024)
+    paths = []
+    for i in range(count):
+        path = str(tmp_path / f"ext{i}.crx")
+        make_crx(path, 64, rng, f"Extension {i}", publisher_key)
+        paths.append(path)
+    return paths
+
+
+def test_verify_crx_hashes_the_verified_bytes(tmp_path):
+    (path,) = _corpus(tmp_path, 1)
+    result = verify_crx(path)
+    assert result["valid"], result["errors"]
+    assert result["sha256"] == hash_file(path)
+
+
+def test_verify_many_caches_under_verified_content(tmp_path, monkeypatch):
+    paths = _corpus(tmp_path)
+    real_hashes = [hash_file(path) for path in paths]
+    stale_hash = "0" * 64
+    original_hash_file = crx_verifier.hash_file
+
+    def stale_hash_file(path, *args, **kwargs):
+        # 文件在计算哈希之后被替换：线程中的哈希与校验时读到的内容不一致
+        if path == paths[0]:
+            return stale_hash
+        return original_hash_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(crx_verifier, "hash_file", stale_hash_file)
+    verifier = CrxVerifier(max_workers=1)
+    results = verifier.verify_many(paths)
+
+    assert [result["sha256"] for result in results] == real_hashes
+    assert stale_hash not in verifier._results
+    assert sorted(verifier._results) == sorted(real_hashes)
+
+
+def test_verify_many_skips_cached_files(tmp_path, monkeypatch):
+    paths = _corpus(tmp_path)
+    verifier = CrxVerifier(max_workers=1)
+    first = verifier.verify_many(paths)
+    assert all(result["valid"] for result in first)
+
+    checked = []
+    monkeypatch.setattr(crx_verifier, "verify_crx", lambda path: checked.append(path))
+    assert verifier.verify_many(paths) == first
+    assert checked == []
@@ -0,0 +1,118 @@
+import queue
+import threading
+
+import pytest
+
+from extension_change_feed import CHANGE_ADDED, CHANGE_MODIFIED, CHANGE_REMOVED, ExtensionChangeFeed
+from extension_manager_core import ExtensionManagerCore
+from extension_path_checker import PathStatusChecker
+from registry_backend import HKEY_LOCAL_MACHINE, MemoryRegistryBackend
+
+FORCELIST = r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"
+ID_A = "a" * 32
+ID_B = "b" * 32
+
+
+@pytest.fixture
+def core(tmp_path):
+    core = ExtensionManagerCore(registry=MemoryRegistryBackend(), cache_file=str(tmp_path / "extension_names.json"))
+    # 每次都重新检查文件，测试文件的变化
+    core.path_checker = PathStatusChecker(interval=0)
+    return core
+
+
+def _write(core, extension_id, **values):
+    core.registry.write_values(core.root_key, f"{core.reg_path}\\{extension_id}", values)
+
+
+def test_poll_reports_added_modified_and_removed(core, tmp_path):
+    crx_path = tmp_path / "a.crx"
+    feed = ExtensionChangeFeed(core, on_changes=None)
+    assert feed.poll() == {}  # 第一次只建立基准
+
+    _write(core, ID_A, path=str(crx_path), version="1.0")
+    _write(core, ID_B, path="", version="1.0")
+    assert feed.poll() == {ID_A: CHANGE_ADDED, ID_B: CHANGE_ADDED}
+    assert feed.poll() == {}
+
+    _write(core, ID_A, version="1.1")
+    assert feed.poll() == {ID_A: CHANGE_MODIFIED}
+
+    # CRX文件出现、内容变化
+    crx_path.write_bytes(b"v1")
+    assert feed.poll() == {ID_A: CHANGE_MODIFIED}
+    crx_path.write_bytes(b"version 2")
+    assert feed.poll() == {ID_A: CHANGE_MODIFIED}
+
+    # 同一扩展出现在策略列表中也算修改
+    core.registry.write_values(HKEY_LOCAL_MACHINE, FORCELIST, {"1": f"{ID_B};https://example.com/update.xml"})
+    assert feed.poll() == {ID_B: CHANGE_MODIFIED}
+
+    core.registry.delete_key(core.root_key, f"{core.reg_path}\\{ID_A}")
+    assert feed.poll() == {ID_A: CHANGE_REMOVED}
+
+
+def _run_feed(feed):
+    changes = queue.Queue()
+    feed.on_changes = changes.put
+    thread = threading.Thread(target=feed.run, daemon=True)
+    thread.start()
+    return changes, thread
+
+
+def _stop(feed, core, thread):
+    feed.stop()
+    # 唤醒正在等待变化通知的线程
+    _write(core, "z" * 32, version="1")
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_watch_wakes_on_registry_write(core):
+    feed = ExtensionChangeFeed(core, on_changes=None, poll_interval=30)
+    feed.reset()
+    changes, thread = _run_feed(feed)
+    try:
+        _write(core, ID_A, path="", version="1.0")
+        # 轮询间隔为30秒，收到变化说明是被通知唤醒的
+        assert changes.get(timeout=5) == {ID_A: CHANGE_ADDED}
+    finally:
+        _stop(feed, core, thread)
+
+
+def test_polls_without_watch_support(core, monkeypatch):
+    monkeypatch.setattr(core.registry, "watch", lambda root, path: None)
+    feed = ExtensionChangeFeed(core, on_changes=None, poll_interval=0.05)
+    feed.reset()
+    changes, thread = _run_feed(feed)
+    try:
+        _write(core, ID_A, path="", version="1.0")
+        assert changes.get(timeout=5) == {ID_A: CHANGE_ADDED}
+    finally:
+        feed.stop()
+        thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_failed_watcher_falls_back_to_polling(core, monkeypatch):
+    class BrokenWatcher:
+        closed = False
+
+        def wait(self, timeout):
+            raise OSError("通知失败")
+
+        def close(self):
+            BrokenWatcher.closed = True
+
+    monkeypatch.setattr(core.registry, "watch", lambda root, path: BrokenWatcher())
+    feed = ExtensionChangeFeed(core, on_changes=None, poll_interval=0.05)
+    feed.reset()
+    changes, thread = _run_feed(feed)
+    try:
+        _write(core, ID_B, path="", version="2.0")
+        assert changes.get(timeout=5) == {ID_B: CHANGE_ADDED}
+        assert BrokenWatcher.closed
+    finally:
+        feed.stop()
+        thread.join(5)
+    assert not thread.is_alive()
@@ -0,0 +1,29 @@
+from extension_inventory import ExtensionInventory, InventoryNameCache
+from extension_name_cache import ExtensionNameCache
+
+
+def _extension_id(i):
+    return "".join("abcdefghijklmnop"[int(d)] for d in f"{i:032d}")
+
+
+def test_inventory_name_cache_keeps_every_name(tmp_path):
+    inventory = ExtensionInventory(str(tmp_path / "inventory.db"))
+    count = 6000
+    cache = InventoryNameCache.load(inventory)
+    for i in range(count):
+        cache.set(_extension_id(i), f"Extension {i}")
+    cache.flush()
+    assert len(inventory.load_names()) == count
+
+    # 重新加载时也不能淘汰并删除数据库中的行
+    reloaded = InventoryNameCache.load(inventory)
+    assert reloaded.get(_extension_id(0)) == "Extension 0"
+    assert len(inventory.load_names()) == count
+
+
+def test_file_name_cache_still_bounded():
+    cache = ExtensionNameCache(max_entries=3)
+    for i in range(5):
+        cache.set(_extension_id(i), f"Extension {i}")
+    assert cache.get(_extension_id(0)) is None
+    assert cache.get(_extension_id(4)) == "Extension 4"
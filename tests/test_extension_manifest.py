@@ -0,0 +1,112 @@
+import io
+import json
+import os
+import struct
+import zipfile
+
+import pytest
+
+import extension_manifest
+from crx_parser import CrxFile, extension_id_from_public_key
+from extension_manifest import ManifestCache, read_manifest_info
+
+PUBLIC_KEY = b"manifest test key"
+
+
+def _write_crx(path, manifest, files=None):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False))
+        for name, content in (files or {}).items():
+            archive.writestr(name, json.dumps(content, ensure_ascii=False))
+    header = b"Cr24" + struct.pack("<III", 2, len(PUBLIC_KEY), 4) + PUBLIC_KEY + b"sign"
+    with open(path, 'wb') as f:
+        f.write(header + buffer.getvalue())
+    return str(path)
+
+
+def _messages(**messages):
+    return {key: {"message": value} for key, value in messages.items()}
+
+
+def _info(tmp_path, manifest, files=None):
+    with CrxFile(_write_crx(tmp_path / "ext.crx", manifest, files)) as crx:
+        return read_manifest_info(crx)
+
+
+def test_plain_manifest(tmp_path):
+    info = _info(tmp_path, {"name": "Plain", "version": "1.2", "permissions": ["tabs"],
+                            "host_permissions": ["https://*/*"], "icons": {"16": "i16.png", "128": "i128.png",
+                                                                           "48": "i48.png"}})
+    assert info["id"] == extension_id_from_public_key(PUBLIC_KEY)
+    assert (info["name"], info["version"], info["icon"]) == ("Plain", "1.2", "i128.png")
+    assert info["permissions"] == ["tabs", "https://*/*"]
+
+
+def test_localized_name_prefers_chinese_and_falls_back_to_default_locale(tmp_path):
+    manifest = {"name": "__MSG_appName__", "short_name": "Short", "description": "__MSG_appDesc__ (beta)",
+                "default_locale": "en", "version": "1.0"}
+    files = {
+        "_locales/en/messages.json": _messages(appName="English Name", appDesc="English description"),
+        "_locales/zh/messages.json": _messages(appName="中文名称"),
+        "_locales/zh_CN/messages.json": _messages(APPNAME="简体中文名称"),
+    }
+    info = _info(tmp_path, manifest, files)
+    # 消息名不区分大小写，zh_CN 优先于 zh，缺少的消息使用 default_locale
+    assert info["name"] == "简体中文名称"
+    assert info["description"] == "English description (beta)"
+    assert info["short_name"] == "Short"
+
+
+def test_missing_message_resolves_to_empty(tmp_path):
+    info = _info(tmp_path, {"name": "__MSG_missing__", "default_locale": "fr", "version": "1"},
+                 {"_locales/fr/messages.json": _messages(other="x")})
+    assert info["name"] == ""
+
+
+@pytest.mark.parametrize("manifest, icon", [
+    ({"action": {"default_icon": "button.png"}}, "button.png"),
+    ({"browser_action": {"default_icon": {"19": "b19.png", "38": "b38.png"}}}, "b38.png"),
+    ({"icons": {}, "action": {}}, ""),
+    ({}, ""),
+])
+def test_icon_fallbacks(tmp_path, manifest, icon):
+    assert _info(tmp_path, dict(manifest, name="x", version="1"))["icon"] == icon
+
+
+def test_manifest_cache_reuses_result_until_file_changes(tmp_path, monkeypatch):
+    path = _write_crx(tmp_path / "ext.crx", {"name": "Cached", "version": "1"})
+    opened = []
+
+    class CountingCrxFile(CrxFile):
+        def __init__(self, crx_path):
+            opened.append(crx_path)
+            super().__init__(crx_path)
+
+    monkeypatch.setattr(extension_manifest, "CrxFile", CountingCrxFile)
+    cache_file = str(tmp_path / "manifest_cache.json")
+    cache = ManifestCache(cache_file)
+    assert cache.get(path)["name"] == "Cached"
+    assert cache.get(path)["name"] == "Cached"
+    assert len(opened) == 1
+
+    cache.save()
+    reloaded = ManifestCache.load(cache_file)
+    assert reloaded.get(path)["name"] == "Cached"
+    assert len(opened) == 1
+
+    _write_crx(tmp_path / "ext.crx", {"name": "Changed name", "version": "2"})
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert reloaded.get(path)["name"] == "Changed name"
+    assert len(opened) == 2
+
+
+def test_manifest_cache_remembers_failures(tmp_path, capsys):
+    path = tmp_path / "broken.crx"
+    path.write_bytes(b"not a crx")
+    cache = ManifestCache()
+    assert cache.get(str(path)) is None
+    assert cache.get(str(path)) is None
+    assert capsys.readouterr().out.count("读取manifest.json失败") == 1
+    assert cache.get(str(tmp_path / "missing.crx")) is None
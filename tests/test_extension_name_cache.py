@@ -0,0 +1,181 @@
+import json
+import os
+
+import pytest
+
+from extension_inventory import ExtensionInventory
+from extension_name_cache import (CACHE_FORMAT_VERSION, SOURCE_LEGACY, SOURCE_MANUAL, SOURCE_STORE,
+                                  ExtensionNameCache)
+
+ID_A = "a" * 32
+ID_B = "b" * 32
+ID_C = "c" * 32
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_failed_lookup_backs_off_exponentially(clock):
+    cache = ExtensionNameCache(negative_ttl=60, max_negative_ttl=200, clock=clock)
+    assert cache.should_lookup(ID_A)
+
+    cache.record_failure(ID_A)
+    assert not cache.should_lookup(ID_A)
+    clock.now += 59
+    assert not cache.should_lookup(ID_A)
+    clock.now += 1
+    assert cache.should_lookup(ID_A)
+
+    cache.record_failure(ID_A)
+    assert cache.get_entry(ID_A)["failures"] == 2
+    assert cache.get_entry(ID_A)["retry_after"] == clock.now + 120
+    # 等待时间不超过 max_negative_ttl
+    cache.record_failure(ID_A)
+    assert cache.get_entry(ID_A)["retry_after"] == clock.now + 200
+
+
+def test_negative_entry_is_contained_but_has_no_name(clock):
+    cache = ExtensionNameCache(clock=clock)
+    cache.record_failure(ID_A)
+
+    assert ID_A in cache
+    assert cache.get(ID_A) is None
+    assert cache.get(ID_A, "默认") == "默认"
+    with pytest.raises(KeyError):
+        cache[ID_A]
+    del cache[ID_A]
+    assert ID_A not in cache
+
+
+def test_failure_keeps_existing_name(clock):
+    cache = ExtensionNameCache(negative_ttl=60, clock=clock)
+    cache.set(ID_A, "Old Name", SOURCE_STORE)
+    cache.record_failure(ID_A)
+
+    assert cache.get(ID_A) == "Old Name"
+    assert not cache.should_lookup(ID_A)
+    assert cache.get_entry(ID_A)["retry_after"] == clock.now + 60
+
+
+def test_stale_ids_only_lists_expired_store_names(clock):
+    cache = ExtensionNameCache(positive_ttl=100, negative_ttl=30, clock=clock)
+    cache.set(ID_A, "Store Name", SOURCE_STORE)
+    cache.set(ID_B, "Manual Name", SOURCE_MANUAL)
+    cache.record_failure(ID_C)
+
+    clock.now += 99
+    assert cache.stale_ids() == []
+    clock.now += 1
+    assert cache.stale_ids() == [ID_A]
+
+    # 刷新失败后推迟到 retry_after 才再次列出
+    cache.record_failure(ID_A)
+    assert cache.stale_ids() == []
+    clock.now += 30
+    assert cache.stale_ids() == [ID_A]
+
+
+def test_evicts_least_recently_used(clock):
+    cache = ExtensionNameCache(max_entries=2, clock=clock)
+    cache.set(ID_A, "A")
+    cache.set(ID_B, "B")
+    assert cache.get(ID_A) == "A"  # 访问后 A 变为最近使用
+
+    cache.set(ID_C, "C")
+    assert len(cache) == 2
+    assert ID_B not in cache
+    assert cache.get(ID_A) == "A" and cache.get(ID_C) == "C"
+
+
+def _journal_lines(cache):
+    with open(cache.journal_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_flush_appends_and_load_replays(tmp_path):
+    cache_file = str(tmp_path / "names.json")
+    cache = ExtensionNameCache.load(cache_file)
+    cache.set(ID_A, "A")
+    cache.set(ID_B, "B")
+    cache.flush()
+    del cache[ID_A]
+    cache.flush()
+
+    assert not os.path.exists(cache_file)
+    assert [(record["op"], record["id"]) for record in _journal_lines(cache)] == [
+        ("set", ID_A), ("set", ID_B), ("del", ID_A)]
+
+    reloaded = ExtensionNameCache.load(cache_file)
+    assert ID_A not in reloaded
+    assert reloaded.get(ID_B) == "B"
+
+
+def test_torn_last_line_is_dropped_and_compacted(tmp_path):
+    cache_file = str(tmp_path / "names.json")
+    cache = ExtensionNameCache.load(cache_file)
+    cache.set(ID_A, "A")
+    cache.set(ID_B, "B")
+    cache.flush()
+    with open(cache.journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"op":"set","id":"' + ID_C + '","entry":{"na')
+
+    reloaded = ExtensionNameCache.load(cache_file)
+    assert reloaded.get(ID_A) == "A" and reloaded.get(ID_B) == "B"
+    assert ID_C not in reloaded
+    # 残缺的日志已合并进快照，之后的记录不会追加在残缺行之后
+    assert not os.path.exists(reloaded.journal_file)
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data["version"] == CACHE_FORMAT_VERSION
+    assert set(data["entries"]) == {ID_A, ID_B}
+
+    reloaded.set(ID_C, "C")
+    reloaded.flush()
+    assert ExtensionNameCache.load(cache_file).get(ID_C) == "C"
+
+
+def test_flush_compacts_large_journal(tmp_path):
+    cache_file = str(tmp_path / "names.json")
+    cache = ExtensionNameCache.load(cache_file, journal_compact_bytes=200)
+    for i, extension_id in enumerate((ID_A, ID_B, ID_C)):
+        cache.set(extension_id, f"Name {i}")
+    cache.flush()
+
+    assert not os.path.exists(cache.journal_file)
+    assert len(ExtensionNameCache.load(cache_file)) == 3
+
+
+def test_load_legacy_format(tmp_path):
+    cache_file = tmp_path / "names.json"
+    cache_file.write_text(json.dumps({ID_A: "Legacy"}), encoding='utf-8')
+
+    cache = ExtensionNameCache.load(str(cache_file))
+    assert cache.get(ID_A) == "Legacy"
+    assert cache.get_entry(ID_A)["source"] == SOURCE_LEGACY
+
+
+def test_migration_skips_torn_journal_line(tmp_path):
+    # 正常运行时名称保存在扩展清单中，旧的快照和日志只在第一次启动时迁移
+    cache_file = str(tmp_path / "names.json")
+    cache = ExtensionNameCache.load(cache_file)
+    cache.set(ID_A, "A")
+    cache.compact()
+    cache.set(ID_B, "B")
+    cache.flush()
+    with open(cache.journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"op":"del","id":"' + ID_A)
+
+    inventory = ExtensionInventory(str(tmp_path / "inventory.db"))
+    assert inventory.migrate_name_cache(cache_file) == 2
+    assert {extension_id: entry["name"] for extension_id, entry in inventory.load_names()} == {ID_A: "A", ID_B: "B"}
+    assert inventory.migrate_name_cache(cache_file) is None
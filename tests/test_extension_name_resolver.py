@@ -0,0 +1,196 @@
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import extension_name_resolver
+from extension_name_resolver import (CircuitBreaker, CrxsosoProvider, ExtensionNameResolver, RetryBudget,
+                                     WebstoreProvider)
+
+EXTENSION_ID = "a" * 32
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """按路径前缀返回配置的延迟和状态码，并记录请求次数"""
+
+    routes = {}  # 前缀 -> {"latency", "status", "name"}
+    hits = None
+    lock = None
+
+    def do_GET(self):
+        prefix = self.path.split("/")[1]
+        route = self.routes[prefix]
+        with self.lock:
+            self.hits[prefix] = self.hits.get(prefix, 0) + 1
+        time.sleep(route.get("latency", 0))
+        status = route.get("status", 200)
+        extension_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        name = f"{route.get('name', prefix)} {extension_id}"
+        if prefix == "crxsoso":
+            body = f'<div class="name el2">{name}<!----></div>'.encode('utf-8')
+        else:
+            body = f'<h1 class="e-f-w">{name}</h1>'.encode('utf-8')
+        if status != 200:
+            body = b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 对冲中较慢的请求返回时客户端可能已关闭连接
+        pass
+
+
+@contextlib.contextmanager
+def stub_store(**routes):
+    """启动本地模拟扩展商店，返回 (处理类, 地址前缀)；修改 routes 可改变之后的响应"""
+    handler = type("Handler", (StubHandler,), {"routes": routes, "hits": {}, "lock": threading.Lock()})
+    server = StubServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield handler, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # 重试前不等待，测试只关心重试次数
+    monkeypatch.setattr(extension_name_resolver, "backoff_delay", lambda attempt: 0)
+
+
+@contextlib.contextmanager
+def make_resolver(providers, **kwargs):
+    resolver = ExtensionNameResolver(providers=providers, **kwargs)
+    try:
+        yield resolver
+    finally:
+        resolver.close()
+
+
+def test_hedged_resolve_uses_faster_provider(monkeypatch):
+    monkeypatch.setattr(extension_name_resolver, "DEFAULT_HEDGE_DELAY_SECONDS", 0.05)
+    with stub_store(crxsoso={"latency": 1.0, "name": "Slow"}, webstore={"name": "Fast"}) as (handler, base):
+        slow = CrxsosoProvider(base + "/crxsoso/{}")
+        fast = WebstoreProvider(base + "/webstore/{}")
+        with make_resolver([slow, fast]) as resolver:
+            start = time.perf_counter()
+            name = resolver.resolve(EXTENSION_ID)
+            elapsed = time.perf_counter() - start
+
+    assert name == f"Fast {EXTENSION_ID}"
+    assert elapsed < 0.8
+    assert fast.counters["hedges"] == 1
+    assert handler.hits == {"crxsoso": 1, "webstore": 1}
+
+
+def test_breaker_opens_after_failures_and_half_opens_after_cooldown():
+    with stub_store(crxsoso={"status": 503}) as (handler, base):
+        provider = CrxsosoProvider(base + "/crxsoso/{}")
+        provider.breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.3)
+        provider.retry_budget = RetryBudget(ratio=0, max_tokens=0)  # 不重试，每次解析正好一个请求
+        with make_resolver([provider]) as resolver:
+            for _ in range(3):
+                assert resolver.resolve(EXTENSION_ID) == ""
+            assert provider.breaker.state == "open"
+
+            # 断开期间不发出请求
+            assert resolver.resolve(EXTENSION_ID) == ""
+            assert handler.hits["crxsoso"] == 3
+            assert provider.counters["short_circuits"] == 1
+
+            time.sleep(0.35)
+            assert provider.breaker.state == "half-open"
+            handler.routes["crxsoso"]["status"] = 200
+            assert resolver.resolve(EXTENSION_ID) == f"crxsoso {EXTENSION_ID}"
+            assert provider.breaker.state == "closed"
+            assert handler.hits["crxsoso"] == 4
+
+
+def test_half_open_probe_failure_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    # 同一时间只放行一个试探请求
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_retry_budget_exhausted_under_503():
+    with stub_store(crxsoso={"status": 503}) as (handler, base):
+        provider = CrxsosoProvider(base + "/crxsoso/{}")
+        provider.breaker = CircuitBreaker(failure_threshold=100)
+        provider.retry_budget = RetryBudget(ratio=0.2, max_tokens=2)
+        with make_resolver([provider]) as resolver:
+            # 额度为2：第一次解析 1 个请求 + 2 次重试
+            assert resolver.resolve(EXTENSION_ID) == ""
+            assert provider.counters["retries"] == 2
+            assert handler.hits["crxsoso"] == 3
+
+            # 额度用完后只发出原始请求，不再重试
+            for _ in range(3):
+                assert resolver.resolve(EXTENSION_ID) == ""
+            assert provider.counters["retries"] == 2
+            assert handler.hits["crxsoso"] == 6
+            assert provider.retry_budget.tokens < 1
+
+
+def test_open_breaker_does_not_spend_retry_budget():
+    with stub_store(crxsoso={"status": 503}) as (handler, base):
+        provider = CrxsosoProvider(base + "/crxsoso/{}")
+        provider.breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        provider.retry_budget = RetryBudget(ratio=0, max_tokens=2)
+        with make_resolver([provider]) as resolver:
+            # 第一次失败后熔断器断开，不再重试
+            assert resolver.resolve(EXTENSION_ID) == ""
+            assert provider.breaker.state == "open"
+            assert handler.hits["crxsoso"] == 1
+            assert provider.counters["retries"] == 0
+            assert provider.retry_budget.tokens == 2
+
+
+def test_half_open_probe_released_when_budget_exhausted():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()
+    # 试探请求没有发出，下一次仍可试探
+    assert breaker.allow()
+
+
+def test_resolve_many_honours_cancel_event():
+    ids = [chr(ord('a') + i % 16) * 32 for i in range(16)]
+    cancel_event = threading.Event()
+    received = []
+
+    def on_result(extension_id, name):
+        received.append(extension_id)
+        cancel_event.set()
+
+    with stub_store(crxsoso={"latency": 0.2}) as (handler, base):
+        provider = CrxsosoProvider(base + "/crxsoso/{}")
+        with make_resolver([provider], max_workers=2) as resolver:
+            results = resolver.resolve_many(ids, on_result=on_result, cancel_event=cancel_event)
+            time.sleep(0.3)
+            hits = handler.hits["crxsoso"]
+
+    assert len(results) == 1
+    assert received == list(results)
+    # 取消时最多还有正在进行的请求，其余请求不会发出
+    assert hits <= 4
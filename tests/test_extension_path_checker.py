@@ -0,0 +1,84 @@
+import os
+import threading
+
+import pytest
+
+from extension_path_checker import (STATUS_MISSING, STATUS_OK, STATUS_REMOTE, STATUS_UNREACHABLE,
+                                    PathStatusChecker, share_of)
+
+
+@pytest.mark.parametrize("path, share", [
+    (r"\\Server\Share\dir\ext.crx", r"\\server\share"),
+    ("//SERVER/Share/dir/ext.crx", r"\\server\share"),
+    (r"\\server\share", r"\\server\share"),
+    (r"\\server/SHARE\ext.crx", r"\\server\share"),
+    (r"C:\Extensions\ext.crx", None),
+    ("/home/user/ext.crx", None),
+    ("", None),
+])
+def test_share_of(path, share):
+    assert share_of(path) == share
+
+
+def test_check_many_statuses(tmp_path):
+    existing = tmp_path / "ext.crx"
+    existing.write_bytes(b"12345")
+    missing = str(tmp_path / "missing.crx")
+    checker = PathStatusChecker()
+
+    results = checker.check_many([str(existing), missing, "", "https://example.com/update.xml", str(existing)])
+
+    assert results == {str(existing): STATUS_OK, missing: STATUS_MISSING, "": STATUS_MISSING,
+                       "https://example.com/update.xml": STATUS_REMOTE}
+    assert checker.stat(str(existing))[1] == 5
+    assert checker.stat(missing) is None
+
+
+def test_results_are_cached_until_interval_or_force(tmp_path):
+    path = tmp_path / "ext.crx"
+    path.write_bytes(b"x")
+    checker = PathStatusChecker(interval=3600)
+    assert checker.check(str(path)) == STATUS_OK
+
+    path.unlink()
+    assert checker.check(str(path)) == STATUS_OK
+    assert checker.check(str(path), force=True) == STATUS_MISSING
+
+    path.write_bytes(b"x")
+    assert checker.check(str(path)) == STATUS_MISSING
+    checker.invalidate(str(path))
+    assert checker.check(str(path)) == STATUS_OK
+
+    expired = PathStatusChecker(interval=0)
+    assert expired.check(str(path)) == STATUS_OK
+    path.unlink()
+    assert expired.check(str(path)) == STATUS_MISSING
+
+
+def test_hung_share_times_out_and_skips_its_other_paths(tmp_path, monkeypatch):
+    release = threading.Event()
+    stat_calls = []
+    real_stat = os.stat
+    local = tmp_path / "local.crx"
+    local.write_bytes(b"x")
+
+    def fake_stat(path, *args, **kwargs):
+        if isinstance(path, str) and share_of(path):
+            stat_calls.append(path)
+            release.wait(5)
+            raise OSError("网络路径不可用")
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", fake_stat)
+    checker = PathStatusChecker(timeout=0.2, max_workers=1)
+    hung = [r"\\server\share\a.crx", r"\\SERVER\share\b.crx", r"\\server\share\c.crx"]
+    try:
+        results = checker.check_many(hung + [str(local)])
+    finally:
+        release.set()
+
+    assert results == {hung[0]: STATUS_UNREACHABLE, hung[1]: STATUS_UNREACHABLE,
+                       hung[2]: STATUS_UNREACHABLE, str(local): STATUS_OK}
+    # 同一共享中只有第一个路径真正调用了 os.stat()
+    assert stat_calls == [hung[0]]
+    assert checker.check(hung[1]) == STATUS_UNREACHABLE
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from chrome_extension_installer import ChromeExtensionInstaller
+from extension_inventory import ExtensionInventory
+from extension_reconciler import ExtensionReconciler, load_desired_state
+from policy_list import PolicyList
+from registry_backend import HKEY_LOCAL_MACHINE, MemoryRegistryBackend
+
+EXTENSIONS_KEY = r"Software\Google\Chrome\Extensions"
+FORCELIST = r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"
+ID_A = "a" * 32
+ID_B = "b" * 32
+
+
+@pytest.fixture
+def installer(tmp_path):
+    return ChromeExtensionInstaller(registry=MemoryRegistryBackend(), extension_dir=str(tmp_path / "Extensions"),
+                                    inventory=ExtensionInventory(str(tmp_path / "inventory.db")), verify=False)
+
+
+def _desired(tmp_path, extensions, **options):
+    for item in extensions:
+        crx_path = tmp_path / item["crx"]
+        crx_path.parent.mkdir(parents=True, exist_ok=True)
+        crx_path.write_bytes(f"crx {item['crx']}".encode())
+    path = tmp_path / "desired.json"
+    path.write_text(json.dumps(dict(options, extensions=extensions)), encoding="utf-8")
+    return load_desired_state(str(path))
+
+
+def test_prune_requires_explicit_true(tmp_path):
+    extensions = [{"crx": "a.crx", "id": ID_A, "version": "1.0"}]
+    assert _desired(tmp_path, extensions)["prune"] is False
+    assert _desired(tmp_path, extensions, prune="yes")["prune"] is False
+    assert _desired(tmp_path, extensions, prune=True)["prune"] is True
+
+
+def test_plan_keeps_unlisted_extensions_without_prune(tmp_path, installer):
+    installer.registry.write_values(HKEY_LOCAL_MACHINE, f"{EXTENSIONS_KEY}\\{ID_B}", {"path": "b.crx"})
+    desired = _desired(tmp_path, [{"crx": "a.crx", "id": ID_A, "version": "1.0"}])
+
+    steps, errors = ExtensionReconciler(installer).plan(desired)
+    assert errors == []
+    assert all(step["id"] == ID_A for step in steps)
+
+
+def test_plan_rejects_same_dest_basename(tmp_path, installer):
+    desired = _desired(tmp_path, [{"crx": "one/ext.crx", "id": ID_A, "version": "1.0"},
+                                  {"crx": "two/ext.crx", "id": ID_B, "version": "1.0"}])
+
+    steps, errors = ExtensionReconciler(installer).plan(desired)
+    assert steps == []
+    assert len(errors) == 1 and "ext.crx" in errors[0]
+
+
+def test_apply_skips_registry_steps_when_copy_fails(tmp_path, installer, monkeypatch):
+    desired = _desired(tmp_path, [{"crx": "a.crx", "id": ID_A, "version": "1.0"},
+                                  {"crx": "b.crx", "id": ID_B, "version": "1.0"}])
+    reconciler = ExtensionReconciler(installer)
+    steps, errors = reconciler.plan(desired)
+    assert errors == []
+
+    copy = installer._copy_extension_file
+
+    def failing_copy(crx_path):
+        if os.path.basename(crx_path) == "a.crx":
+            raise OSError("磁盘已满")
+        return copy(crx_path)
+
+    monkeypatch.setattr(installer, "_copy_extension_file", failing_copy)
+    assert reconciler.apply(steps) == 1
+
+    registry = installer.registry
+    assert ID_A not in registry.read_subkey_values(HKEY_LOCAL_MACHINE, EXTENSIONS_KEY)
+    assert registry.read_values(HKEY_LOCAL_MACHINE, f"{EXTENSIONS_KEY}\\{ID_B}")["version"] == "1.0"
+    forcelist = PolicyList(registry, HKEY_LOCAL_MACHINE, FORCELIST)
+    assert forcelist.get(ID_A) is None
+    assert forcelist.get(ID_B) is not None
+
+
+def test_prune_removes_duplicate_policy_values(tmp_path, installer):
+    installer.registry.write_values(HKEY_LOCAL_MACHINE, FORCELIST, {"1": f"{ID_B};https://a", "2": f"{ID_B};https://b"})
+    desired = _desired(tmp_path, [{"crx": "a.crx", "id": ID_A, "version": "1.0", "force": False, "allow": False}],
+                       prune=True)
+    reconciler = ExtensionReconciler(installer)
+    steps, errors = reconciler.plan(desired)
+    assert errors == []
+    assert reconciler.apply(steps) == 0
+
+    assert ExtensionReconciler(installer).plan(desired) == ([], [])
+    assert installer.registry.read_values(HKEY_LOCAL_MACHINE, FORCELIST) == {}
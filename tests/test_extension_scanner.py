@@ -0,0 +1,155 @@
+import os
+
+from extension_scanner import (LOCATION_ALLOWLIST, LOCATION_FORCELIST, LOCATION_HKCU, LOCATION_HKLM,
+                               LOCATION_WOW64, SCAN_LOCATIONS, ExtensionScanner, forcelist_path,
+                               forcelist_value)
+from registry_backend import MemoryRegistryBackend
+
+ID_A = "a" * 32
+ID_B = "b" * 32
+ID_C = "c" * 32
+
+PATHS = {name: (root, path) for name, root, path, _ in SCAN_LOCATIONS}
+
+
+def _write_key(registry, location, subkey, **values):
+    root, path = PATHS[location]
+    registry.write_values(root, f"{path}\\{subkey}", values)
+
+
+def _write_policy(registry, location, *values):
+    root, path = PATHS[location]
+    registry.write_values(root, path, {str(slot): value for slot, value in enumerate(values, 1)})
+
+
+def _crx(tmp_path, name):
+    path = tmp_path / "profile" / "crx" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"Cr24")
+    return str(path)
+
+
+def test_scan_empty_registry():
+    scanner = ExtensionScanner(MemoryRegistryBackend())
+    assert scanner.scan() == {}
+    assert scanner.count() == 0
+
+
+def test_scan_merges_locations(tmp_path):
+    registry = MemoryRegistryBackend()
+    crx_path = _crx(tmp_path, "a.crx")
+    # 子键名大小写不同，仍是同一扩展
+    _write_key(registry, LOCATION_HKCU, ID_A.upper(), path=crx_path, version="1.0")
+    _write_key(registry, LOCATION_WOW64, ID_A, path=crx_path, version="1.0")
+    _write_policy(registry, LOCATION_FORCELIST, forcelist_value(ID_A, crx_path))
+    _write_policy(registry, LOCATION_ALLOWLIST, ID_A, ID_B)
+
+    records = ExtensionScanner(registry).scan()
+
+    assert list(records) == [ID_A, ID_B]
+    record = records[ID_A]
+    assert record["path"] == crx_path
+    assert record["version"] == "1.0"
+    assert record["sources"] == [LOCATION_HKCU, LOCATION_WOW64, LOCATION_FORCELIST, LOCATION_ALLOWLIST]
+    assert record["keys"] == {LOCATION_HKCU: ID_A.upper(), LOCATION_WOW64: ID_A}
+    assert record["conflicts"] == []
+
+    # 只在允许列表中的扩展没有路径
+    assert records[ID_B]["sources"] == [LOCATION_ALLOWLIST]
+    assert records[ID_B]["path"] == ""
+    assert records[ID_B]["version"] == ""
+
+
+def test_scan_accepts_equivalent_paths(tmp_path):
+    registry = MemoryRegistryBackend()
+    crx_path = _crx(tmp_path, "a.crx")
+    dotted = os.path.join(os.path.dirname(crx_path), ".", "..", "crx", "a.crx")
+    _write_key(registry, LOCATION_HKCU, ID_A, path=crx_path, version="1.0")
+    _write_key(registry, LOCATION_HKLM, ID_A, path=dotted, version="1.0")
+    _write_policy(registry, LOCATION_FORCELIST, forcelist_value(ID_A, dotted))
+
+    record = ExtensionScanner(registry).scan()[ID_A]
+
+    assert record["conflicts"] == []
+    assert record["path"] == crx_path  # 取第一个位置的路径
+
+
+def test_scan_reports_conflicts(tmp_path):
+    registry = MemoryRegistryBackend()
+    crx_a = _crx(tmp_path, "a.crx")
+    crx_b = _crx(tmp_path, "b.crx")
+    crx_c = _crx(tmp_path, "c.crx")
+    _write_key(registry, LOCATION_HKCU, ID_A, path=crx_a, version="1.0")
+    _write_key(registry, LOCATION_HKLM, ID_A, path=crx_b, version="2.0")
+    _write_policy(registry, LOCATION_FORCELIST, forcelist_value(ID_A, crx_c), forcelist_value(ID_A, crx_a))
+
+    record = ExtensionScanner(registry).scan()[ID_A]
+
+    assert record["path"] == crx_a
+    assert record["version"] == "1.0"
+    assert len(record["conflicts"]) == 4
+    assert record["conflicts"][0].startswith("路径不一致：")
+    assert record["conflicts"][1] == "版本号不一致：1.0，2.0"
+    assert record["conflicts"][2].endswith(crx_c)
+    assert record["conflicts"][3] == f"{LOCATION_FORCELIST}中重复 2 次"
+
+
+def test_forcelist_only_extension(tmp_path):
+    registry = MemoryRegistryBackend()
+    crx_path = _crx(tmp_path, "c.crx")
+    update_url = "https://clients2.google.com/service/update2/crx"
+    _write_policy(registry, LOCATION_FORCELIST, forcelist_value(ID_C, crx_path), f"{ID_B};{update_url}")
+
+    records = ExtensionScanner(registry).scan()
+
+    assert records[ID_C]["path"] == crx_path
+    assert records[ID_C]["sources"] == [LOCATION_FORCELIST]
+    # 从更新地址安装的扩展显示更新地址
+    assert records[ID_B]["path"] == update_url
+
+
+def test_policy_values_skip_non_slot_names(tmp_path):
+    registry = MemoryRegistryBackend()
+    root, path = PATHS[LOCATION_ALLOWLIST]
+    registry.write_values(root, path, {"0": ID_A, "comment": ID_B, "1": ID_C})
+
+    scanner = ExtensionScanner(registry)
+
+    assert list(scanner.scan()) == [ID_C]
+    assert scanner.count() == 1
+
+
+def test_count_and_lookup_match_scan(tmp_path):
+    registry = MemoryRegistryBackend()
+    crx_path = _crx(tmp_path, "a.crx")
+    _write_key(registry, LOCATION_HKCU, ID_A, path=crx_path, version="1.0")
+    _write_key(registry, LOCATION_HKLM, ID_B, path="", version="3.0")
+    _write_policy(registry, LOCATION_FORCELIST, forcelist_value(ID_A, crx_path), f"{ID_C};https://example.com/crx")
+
+    scanner = ExtensionScanner(registry)
+    records = scanner.scan()
+
+    assert scanner.count() == len(records) == 3
+    assert scanner.lookup(ID_A) == records[ID_A]
+    assert scanner.lookup(ID_B) == records[ID_B]
+    assert scanner.lookup(ID_C) == records[ID_C]
+    assert scanner.lookup("d" * 32) is None
+
+
+def test_custom_locations():
+    registry = MemoryRegistryBackend()
+    _write_key(registry, LOCATION_HKCU, ID_A, path="", version="1.0")
+    _write_key(registry, LOCATION_HKLM, ID_B, path="", version="1.0")
+
+    scanner = ExtensionScanner(registry, locations=SCAN_LOCATIONS[:1])
+
+    assert list(scanner.scan()) == [ID_A]
+    assert scanner.count() == 1
+
+
+def test_forcelist_path_round_trip(tmp_path):
+    crx_path = _crx(tmp_path, "a b.crx")
+    assert forcelist_path(forcelist_value(ID_A, crx_path)) == crx_path
+    assert forcelist_path(f"{ID_A};https://example.com/crx") is None
+    assert forcelist_path(ID_A) is None
+
@@ -0,0 +1,145 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from chrome_extension_manager import ChromeExtensionManager
+from extension_search_index import ExtensionSearchIndex
+from keyed_treeview import KeyedTreeview
+from test_keyed_treeview import FakeTree
+
+ID_A = "a" * 32
+ID_B = "b" * 32
+ID_C = "c" * 32
+
+
+def ext(extension_id, name, path="", version="1.0", source="HKCU"):
+    return {"id": extension_id, "name": name, "path": path, "version": version, "source": source,
+            "status": "", "conflict": ""}
+
+
+@pytest.fixture
+def index():
+    index = ExtensionSearchIndex()
+    index.update(ext(ID_A, "Google 翻译", r"C:\Extensions\translate.crx", "2.0.11"))
+    index.update(ext(ID_B, "uBlock Origin", r"D:\crx\ublock.crx", "1.10.0", "HKLM"))
+    index.update(ext(ID_C, "Dark Reader", "", "4.9.1"))
+    return index
+
+
+def test_empty_query_does_not_filter(index):
+    assert index.search("") is None
+    assert index.search("   ") is None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("g", {ID_A}),                 # 词的前缀
+    ("or", {ID_B}),                # origin
+    ("rig", {ID_B}),               # 三字母组匹配词中间
+    ("UBLOCK", {ID_B}),            # 不区分大小写
+    ("翻译", {ID_A}),
+    ("译", {ID_A}),                # 中文按词中间的字匹配
+    ("crx", {ID_A, ID_B}),
+    ("1.", {ID_B}),                # 含分隔符的短词直接匹配
+    ("hklm", {ID_B}),
+    ("c" * 5, {ID_C}),             # 扩展ID
+    ("reader dark", {ID_C}),       # 多个词为“并且”
+    ("dark origin", set()),
+    ("xyz", set()),
+])
+def test_search(index, query, expected):
+    assert index.search(query) == expected
+
+
+def test_trigram_candidates_are_verified(index):
+    # "ubl" 和 "blo" "loc" 都出现，但 "ublocx" 整体不出现
+    assert index.search("ublocx") == set()
+
+
+def test_incremental_update_and_remove(index):
+    index.update(ext(ID_C, "Night Mode", "", "4.9.1"))
+    assert index.search("dark") == set()
+    assert index.search("night") == {ID_C}
+    assert "dark" not in index.sorted_tokens
+
+    index.set_field(ID_B, "name", "AdGuard")
+    assert index.search("ublock") == {ID_B}  # 路径中仍有 ublock
+    assert index.search("origin") == set()
+    assert index.search("adg") == {ID_B}
+
+    index.remove(ID_A)
+    assert ID_A not in index and len(index) == 2
+    assert index.search("翻译") == set()
+    assert index.search("crx") == {ID_B}
+    assert not any(ID_A in ids for ids in index.trigram_postings.values())
+
+
+def test_incremental_index_matches_rebuilt_index():
+    rng = random.Random(5)
+    words = ["alpha", "beta", "gamma", "翻译助手", "1.2.3", "ad", "block", "reader", "c:\\ext\\a.crx"]
+    ids = ["".join(rng.choice("abcdefghijklmnop") for _ in range(32)) for _ in range(30)]
+    current = {}
+    index = ExtensionSearchIndex()
+    for _ in range(300):
+        extension_id = rng.choice(ids)
+        if extension_id in current and rng.random() < 0.3:
+            index.remove(extension_id)
+            del current[extension_id]
+        else:
+            current[extension_id] = ext(extension_id, " ".join(rng.sample(words, 2)), rng.choice(words),
+                                        f"{rng.randint(0, 12)}.{rng.randint(0, 12)}")
+            index.update(current[extension_id])
+
+    rebuilt = ExtensionSearchIndex()
+    for item in current.values():
+        rebuilt.update(item)
+    assert index.sorted_tokens == rebuilt.sorted_tokens
+    assert dict(index.token_postings) == dict(rebuilt.token_postings)
+    assert dict(index.trigram_postings) == dict(rebuilt.trigram_postings)
+    for query in ["a", "al", "alp", "翻", "助手", "1.", "crx", "block 1", "reader gamma", "c:\\"]:
+        assert index.search(query) == rebuilt.search(query)
+
+
+class FakeVar:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakeLabel:
+    text = None
+
+    def configure(self, text):
+        self.text = text
+
+
+def test_filter_box_filters_and_updates_rows():
+    # 不创建窗口，只使用搜索框和列表相关的属性
+    manager = SimpleNamespace(search_index=ExtensionSearchIndex(), view=KeyedTreeview(FakeTree()),
+                              filter_text=FakeVar(), filter_label=FakeLabel(), filter_pending=False)
+    for item in (ext(ID_A, "Google 翻译"), ext(ID_B, "uBlock Origin"), ext(ID_C, "Dark Reader")):
+        ChromeExtensionManager._upsert_row(manager, item)
+    manager.view.retag()
+
+    manager.filter_text.value = "origin"
+    ChromeExtensionManager.apply_filter(manager)
+    assert manager.view.tree.children == [ID_B]
+    assert manager.filter_label.text == "显示 1 / 3"
+
+    # 过滤时修改的行需要重新过滤
+    ChromeExtensionManager._set_row_field(manager, ID_C, "name", "Origin Dark")
+    assert manager.filter_pending
+    ChromeExtensionManager.apply_filter(manager)
+    assert manager.view.tree.children == [ID_B, ID_C]
+
+    ChromeExtensionManager._remove_rows(manager, [ID_B])
+    ChromeExtensionManager.apply_filter(manager)
+    assert manager.view.tree.children == [ID_C]
+    assert manager.filter_label.text == "显示 1 / 2"
+
+    manager.filter_text.value = ""
+    ChromeExtensionManager.apply_filter(manager)
+    assert manager.view.tree.children == [ID_A, ID_C]
+    assert manager.filter_label.text == ""
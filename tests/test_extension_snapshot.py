@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+
+import chrome_extension_cli
+import registry_backend
+from extension_manager_core import ExtensionManagerCore
+from extension_snapshot import SNAPSHOT_MAGIC, BinarySnapshotWriter, import_snapshot, read_snapshot
+from registry_backend import MemoryRegistryBackend
+
+
+def _extension_id(i):
+    return "".join("abcdefghijklmnop"[int(d)] for d in f"{i:032d}")
+
+
+def test_import_keeps_every_name_beyond_cache_limit(tmp_path):
+    count = 10000
+    snapshot = tmp_path / "snapshot.ndjson"
+    with open(snapshot, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            f.write(json.dumps({"id": _extension_id(i), "name": f"Extension {i}", "path": "",
+                                "version": "1.0", "status": "", "hive": "HKCU", "sha256": ""}) + "\n")
+
+    core = ExtensionManagerCore(registry=MemoryRegistryBackend(),
+                                cache_file=str(tmp_path / "extension_names.json"))
+    counts = import_snapshot(core, str(snapshot))
+
+    assert counts == {"imported": count, "skipped": 0}
+    names = dict(core.inventory.load_names())
+    assert len(names) == count
+    assert names[_extension_id(0)]["name"] == "Extension 0"
+    assert core.name_cache.get(_extension_id(0)) == "Extension 0"
+
+
+def _binary_snapshot(count):
+    stream = io.BytesIO()
+    writer = BinarySnapshotWriter(stream)
+    for i in range(count):
+        writer.write({"id": _extension_id(i), "name": f"Extension {i}", "version": "1.0", "hive": "HKCU"})
+    writer.close()
+    return stream.getvalue()
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:len(data) // 2],  # 记录被截断
+    lambda data: data[:-4],  # 缺少结束标记
+    # 记录长度只够半个字段长度
+    lambda data: SNAPSHOT_MAGIC + b"\x01\x00\x00\x00\x05" + data[len(SNAPSHOT_MAGIC):],
+    # 记录长度比字段内容短
+    lambda data: SNAPSHOT_MAGIC + b"\x04\x00\x00\x00\x20\x00ab" + data[len(SNAPSHOT_MAGIC):],
+])
+def test_corrupt_binary_snapshot_raises_value_error(tmp_path, corrupt):
+    snapshot = tmp_path / "snapshot.bin"
+    snapshot.write_bytes(corrupt(_binary_snapshot(3)))
+    with pytest.raises(ValueError):
+        list(read_snapshot(str(snapshot)))
+
+
+def test_import_truncated_binary_snapshot_from_cli(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv(registry_backend.REGISTRY_FILE_ENV, str(tmp_path / "registry.json"))
+    monkeypatch.setattr(registry_backend, "_default_backend", None)
+    snapshot = tmp_path / "snapshot.bin"
+    data = _binary_snapshot(3)
+    snapshot.write_bytes(SNAPSHOT_MAGIC + b"\x01\x00\x00\x00\x05" + data[len(SNAPSHOT_MAGIC):])
+
+    exit_code = chrome_extension_cli.main(["--cache-file", str(tmp_path / "extension_names.json"),
+                                           "import", str(snapshot)])
+
+    assert exit_code == 1
+    record = json.loads(capsys.readouterr().out.strip())
+    assert "快照文件已损坏" in record["error"]
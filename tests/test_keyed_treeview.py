@@ -0,0 +1,379 @@
+import pytest
+
+from keyed_treeview import VIRTUAL_BUFFER_ROWS, KeyedTreeview, VirtualTreeview, diff_rows, row_values, sort_key
+
+
+class FakeTree:
+    """模拟 ttk.Treeview 的顶层项，记录每次调用
+
+    insert 和 move 的位置与Tk相同：按移动前的子项列表，把项放在第 index-1 项之后。
+    """
+
+    def __init__(self):
+        self.children = []
+        self.items = {}
+        self.calls = []
+        self._selection = []
+
+    def _place(self, iid, index):
+        if index == "end":
+            index = len(self.children)
+        sibling = self.children[min(index, len(self.children)) - 1] if index > 0 and self.children else None
+        if sibling == iid:
+            return
+        if iid in self.children:
+            self.children.remove(iid)
+        self.children.insert(0 if sibling is None else self.children.index(sibling) + 1, iid)
+
+    def insert(self, parent, index, iid, values=()):
+        assert iid not in self.items
+        self.calls.append(("insert", iid))
+        self.items[iid] = {"values": tuple(values), "tags": ()}
+        self._place(iid, index)
+        return iid
+
+    def item(self, iid, **options):
+        self.calls.append(("item", iid, tuple(sorted(options))))
+        self.items[iid].update({name: tuple(value) for name, value in options.items()})
+
+    def move(self, iid, parent, index):
+        self.calls.append(("move", iid))
+        self._place(iid, index)
+
+    def detach(self, *iids):
+        self.calls.append(("detach",) + iids)
+        for iid in iids:
+            self.children.remove(iid)
+
+    def delete(self, *iids):
+        self.calls.append(("delete",) + iids)
+        for iid in iids:
+            if iid in self.children:
+                self.children.remove(iid)
+            del self.items[iid]
+
+    def get_children(self):
+        return tuple(self.children)
+
+    def selection(self):
+        return tuple(self._selection)
+
+    def selection_set(self, items):
+        self._selection = list(items)
+
+    def shown_values(self):
+        return [self.items[iid]["values"] for iid in self.children]
+
+    def tags(self):
+        return [self.items[iid]["tags"] for iid in self.children]
+
+
+def ext(extension_id, name=None, version="1.0"):
+    return {"id": extension_id, "name": name or extension_id.upper(), "path": "", "version": version,
+            "status": "", "source": "HKCU", "conflict": ""}
+
+
+def alternating(count):
+    return [('oddrow',) if index % 2 == 0 else ('evenrow',) for index in range(count)]
+
+
+@pytest.fixture
+def view():
+    return KeyedTreeview(FakeTree())
+
+
+def test_move_matches_tk_sibling_semantics():
+    tree = FakeTree()
+    for iid in "abcd":
+        tree.insert("", "end", iid)
+    tree.move("a", "", 3)  # 向后移动时Tk的位置按移动前计算
+    assert tree.children == list("bcad")
+    tree.move("d", "", 0)
+    assert tree.children == list("dbca")
+
+
+def test_diff_rows():
+    current = {"a": row_values(ext("a")), "b": row_values(ext("b"))}
+    deletes, inserts, updates = diff_rows(["a", "b"], current, [ext("b", "New"), ext("c")])
+    assert deletes == ["a"]
+    assert inserts == [(1, "c", row_values(ext("c")))]
+    assert updates == [("b", row_values(ext("b", "New")))]
+
+
+def test_apply_only_touches_changed_rows(view):
+    tree = view.tree
+    view.apply([ext(i) for i in "abcd"])
+    assert tree.children == list("abcd")
+    assert tree.tags() == alternating(4)
+
+    tree.calls = []
+    view.apply([ext("a"), ext("b", "Renamed"), ext("d")])
+    assert tree.children == list("abd")
+    assert tree.shown_values()[1] == row_values(ext("b", "Renamed"))
+    # c 被删除，b 的值被更新，d 的位置变化后只重算 d 的颜色
+    assert tree.calls == [("delete", "c"), ("item", "b", ("values",)), ("item", "d", ("tags",))]
+    assert tree.tags() == alternating(3)
+
+    tree.calls = []
+    view.apply([ext("a"), ext("b", "Renamed"), ext("d")])
+    assert tree.calls == []
+
+
+def test_apply_reorders_with_moves(view):
+    tree = view.tree
+    view.apply([ext(i) for i in "abcde"])
+    tree.calls = []
+    view.apply([ext(i) for i in "ecabd"])
+
+    assert tree.children == list("ecabd")
+    assert not any(call[0] in ("insert", "delete") for call in tree.calls)
+    assert tree.tags() == alternating(5)
+
+
+def test_upsert_keeps_position_without_index(view):
+    view.apply([ext(i) for i in "abc"])
+    view.upsert(ext("b", "Changed"))
+    view.upsert(ext("z"))
+    view.retag()
+    assert view.tree.children == list("abcz")
+    assert view.get_values("b") == row_values(ext("b", "Changed"))
+
+
+def test_filter_detaches_instead_of_deleting(view):
+    tree = view.tree
+    view.apply([ext(i) for i in "abcde"])
+    tree.selection_set(["a", "b"])
+
+    tree.calls = []
+    view.set_filter({"b", "d"})
+    assert tree.children == ["b", "d"]
+    assert not any(call[0] == "delete" for call in tree.calls)
+    assert set(tree.items) == set("abcde")
+    assert tree.tags() == alternating(2)
+    assert view.selection() == ["b"]
+
+    # 过滤时新增和移动的行在取消过滤后位于正确位置
+    view.upsert(ext("f"), 0)
+    view.upsert(ext("a"), 4)
+    view.retag()
+    assert tree.children == ["b", "d"]
+
+    view.set_filter(None)
+    assert view.order == list("fbcda") + ["e"]
+    assert tree.children == view.order
+    assert tree.tags() == alternating(6)
+
+
+def test_sort_uses_natural_version_order(view):
+    view.apply([ext("a", version="1.10"), ext("b", version="1.9"), ext("c", version="1.2")])
+    view.sort("version")
+    assert view.tree.children == ["c", "b", "a"]
+    view.sort("version", reverse=True)
+    assert view.tree.children == ["a", "b", "c"]
+    assert sort_key("Ext 10") > sort_key("ext 9")
+
+
+def test_remove_and_clear(view):
+    tree = view.tree
+    view.apply([ext(i) for i in "abcd"])
+    view.remove(["b", "missing"])
+    view.retag()
+    assert tree.children == list("acd")
+    assert tree.tags() == alternating(3)
+
+    view.clear()
+    assert tree.children == [] and tree.items == {}
+    assert len(view) == 0 and "a" not in view
+
+
+ROW_HEIGHT = 20
+
+
+class FakeVirtualTree(FakeTree):
+    """在 FakeTree 之上加入虚拟列表用到的尺寸、事件和空闲回调"""
+
+    def __init__(self, visible_rows):
+        super().__init__()
+        self.height = ROW_HEIGHT * (visible_rows + 1)
+        self.bindings = {}
+        self.idle = []
+        self._focus = ""
+        self.tk = self
+
+    def call(self, *args):
+        return ROW_HEIGHT
+
+    def bbox(self, iid):
+        return (0, ROW_HEIGHT, 100, ROW_HEIGHT)
+
+    def winfo_height(self):
+        return self.height
+
+    def bind(self, sequence, callback):
+        self.bindings[sequence] = callback
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+    def run_idle(self):
+        idle, self.idle = self.idle, []
+        for callback in idle:
+            callback()
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self._focus
+        self._focus = iid
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def click(self, *slots):
+        """用户在Treeview中选中若干项"""
+        self.selection_set(slots)
+        if slots:
+            self._focus = slots[-1]
+        self.bindings["<<TreeviewSelect>>"](None)
+
+    def shown_ids(self):
+        return [self.items[iid]["values"][1] for iid in self.children]
+
+
+class FakeScrollbar:
+    def __init__(self):
+        self.command = None
+        self.position = None
+
+    def configure(self, command):
+        self.command = command
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def ids(count):
+    return [f"ext{index:03d}" for index in range(count)]
+
+
+@pytest.fixture
+def virtual():
+    tree = FakeVirtualTree(visible_rows=5)
+    view = VirtualTreeview(tree, FakeScrollbar())
+    view.apply([ext(extension_id) for extension_id in ids(100)])
+    tree.run_idle()
+    return view
+
+
+def test_virtual_window_reuses_slots(virtual):
+    tree = virtual.tree
+    slot_count = 5 + VIRTUAL_BUFFER_ROWS
+    assert tree.children == [f"slot{index}" for index in range(slot_count)]
+    assert tree.shown_ids() == ids(100)[:slot_count]
+    assert tree.tags() == alternating(slot_count)
+    assert virtual.scrollbar.position == (0, 0.05)
+
+    tree.calls = []
+    virtual.scroll(10)
+    assert not any(call[0] in ("insert", "delete") for call in tree.calls)
+    assert tree.shown_ids() == ids(100)[10:10 + slot_count]
+    assert virtual.slot_ids == dict(zip(tree.children, ids(100)[10:10 + slot_count]))
+    assert tree.tags() == alternating(slot_count)
+
+    # 内容不变的项不调用Tk
+    tree.calls = []
+    virtual.render()
+    assert tree.calls == []
+
+
+def test_virtual_scroll_is_clamped(virtual):
+    virtual.scroll(1000)
+    assert virtual.top == 95
+    assert virtual.tree.shown_ids() == ids(100)[95:]
+    virtual.scroll(-1000)
+    assert virtual.top == 0
+
+    virtual.yview("moveto", "0.5")
+    assert virtual.top == 50
+    virtual.yview("scroll", "1", "pages")
+    assert virtual.top == 55
+    virtual.yview("scroll", "-2", "units")
+    assert virtual.top == 53
+
+
+def test_virtual_selection_follows_extension_not_slot(virtual):
+    tree = virtual.tree
+    virtual.scroll(10)
+    tree.click("slot2")
+    assert virtual.selection() == ["ext012"]
+
+    # 滚动后同一个项显示其他扩展，选中状态仍属于原来的扩展
+    virtual.scroll(20)
+    assert tree.selection() == ()
+    assert virtual.selection() == ["ext012"]
+    virtual.scroll(-30)
+    assert virtual.top == 0
+    assert tree.selection() == ()
+
+    # 在窗口内重新选择时只替换窗口内的选中项，窗口外的选中项保留
+    tree.click("slot0")
+    assert virtual.selection() == ["ext000", "ext012"]
+    virtual.scroll(10)
+    assert [virtual.slot_ids[slot] for slot in tree.selection()] == ["ext012"]
+    assert tree.selection() == ("slot2",)
+
+
+def test_virtual_selection_after_sort_and_filter(virtual):
+    tree = virtual.tree
+    tree.click("slot3")
+    assert virtual.selection() == ["ext003"]
+
+    virtual.sort("id", reverse=True)
+    tree.run_idle()
+    assert tree.shown_ids()[0] == "ext099"
+    assert virtual.selection() == ["ext003"]
+
+    virtual.set_filter({"ext003", "ext050", "ext051"})
+    tree.run_idle()
+    assert tree.shown_ids() == ["ext051", "ext050", "ext003"]
+    selected_slot = tree.selection()
+    assert [virtual.slot_ids[slot] for slot in selected_slot] == ["ext003"]
+
+    virtual.set_filter({"ext050"})
+    assert virtual.selection() == []
+    virtual.set_filter(None)
+    assert virtual.selection() == ["ext003"]
+
+
+def test_virtual_keyboard_focus_scrolls(virtual):
+    tree = virtual.tree
+    tree.bindings["<Down>"](None)
+    assert virtual.focus_index == 0
+    for _ in range(6):
+        tree.bindings["<Down>"](None)
+    assert virtual.focus_index == 6
+    assert virtual.top == 2
+    assert virtual.selection() == ["ext006"]
+    assert virtual.slot_ids[tree.focus()] == "ext006"
+
+    tree.bindings["<End>"](None)
+    assert virtual.selection() == ["ext099"]
+    assert virtual.top == 95
+
+
+def test_virtual_remove_and_resize(virtual):
+    tree = virtual.tree
+    virtual.scroll(1000)
+    tree.click("slot4")
+    assert virtual.selection() == ["ext099"]
+
+    virtual.remove(ids(100)[50:])
+    tree.run_idle()
+    assert virtual.selection() == []
+    assert virtual.top == 45
+    assert tree.shown_ids() == ids(50)[45:]
+
+    # 窗口变小时删除多余的项
+    tree.height = ROW_HEIGHT * 3
+    virtual.render()
+    assert tree.children == [f"slot{index}" for index in range(2 + VIRTUAL_BUFFER_ROWS)]
+    assert tree.shown_ids() == ids(50)[45:49]
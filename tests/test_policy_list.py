@@ -0,0 +1,95 @@
+import random
+import time
+
+from policy_list import PolicyList
+from registry_backend import HKEY_LOCAL_MACHINE, MemoryRegistryBackend
+
+FORCELIST = r"Software\Policies\Google\Chrome\ExtensionInstallForcelist"
+
+
+def _id(letter):
+    return letter * 32
+
+
+def _policy_list(values):
+    registry = MemoryRegistryBackend()
+    if values:
+        registry.write_values(HKEY_LOCAL_MACHINE, FORCELIST, values)
+    return registry, PolicyList(registry, HKEY_LOCAL_MACHINE, FORCELIST)
+
+
+def _stored(registry):
+    return registry.read_values(HKEY_LOCAL_MACHINE, FORCELIST)
+
+
+def test_new_items_fill_gaps_in_order():
+    registry, policies = _policy_list({"2": _id("a"), "5": _id("b")})
+    for letter in "cdef":
+        policies.upsert(_id(letter))
+    assert _stored(registry) == {"1": _id("c"), "2": _id("a"), "3": _id("d"), "4": _id("e"),
+                                 "5": _id("b"), "6": _id("f")}
+
+
+def test_removed_slots_are_reused_smallest_first():
+    registry, policies = _policy_list({str(i): _id(letter) for i, letter in enumerate("abcdef", start=1)})
+    policies.remove(_id("e"))
+    policies.remove(_id("b"))
+    assert policies.upsert_many([(_id("g"), _id("g")), (_id("h"), _id("h")), (_id("i"), _id("i"))]) == 3
+    assert _stored(registry) == {"1": _id("a"), "2": _id("g"), "3": _id("c"), "4": _id("d"),
+                                 "5": _id("h"), "6": _id("f"), "7": _id("i")}
+
+
+def test_large_slot_number_does_not_allocate_gap_list():
+    registry, policies = _policy_list({"1": _id("a"), "4000000000": _id("b")})
+    started = time.perf_counter()
+    policies.upsert(_id("c"))
+    policies.remove(_id("a"))
+    policies.upsert(_id("d"))
+    assert time.perf_counter() - started < 1
+    assert len(policies._free) == 0
+    assert _stored(registry) == {"1": _id("d"), "2": _id("c"), "4000000000": _id("b")}
+
+
+def test_slots_never_collide():
+    rng = random.Random(9)
+    registry, policies = _policy_list({"3": _id("a"), "7": _id("b"), "8": _id("c"), "12": _id("d")})
+    letters = "abcdefghijklmnop"
+    for _ in range(500):
+        letter = rng.choice(letters)
+        if _id(letter) in policies and rng.random() < 0.5:
+            policies.remove(_id(letter))
+        else:
+            policies.upsert(_id(letter), f"{_id(letter)};{rng.random()}")
+        stored = _stored(registry)
+        assert sorted(policies.index.values()) == sorted(int(name) for name in stored)
+        assert {policies.extension_id_of(value) for value in stored.values()} == set(policies.index)
+    # 全部重新读取后与内存中的索引一致
+    assert PolicyList(registry, HKEY_LOCAL_MACHINE, FORCELIST).items() == policies.items()
+
+
+def test_remove_leaves_duplicates_but_remove_all_deletes_them():
+    values = {"1": f"{_id('a')};https://one", "2": _id("b"), "3": f"{_id('a')};https://two"}
+    registry, policies = _policy_list(values)
+    assert policies.duplicates == [3]
+    assert policies.remove(_id("a"))
+    assert _stored(registry) == {"2": _id("b"), "3": f"{_id('a')};https://two"}
+    # 重新读取后重复项成为该扩展的值
+    assert PolicyList(registry, HKEY_LOCAL_MACHINE, FORCELIST).get(_id("a")) == f"{_id('a')};https://two"
+
+    registry, policies = _policy_list(values)
+    assert policies.remove_all(_id("a")) == 2
+    assert _stored(registry) == {"2": _id("b")}
+    assert _id("a") not in PolicyList(registry, HKEY_LOCAL_MACHINE, FORCELIST)
+    policies.upsert(_id("c"))
+    policies.upsert(_id("d"))
+    assert _stored(registry) == {"1": _id("c"), "2": _id("b"), "3": _id("d")}
+
+
+def test_compact_renumbers_and_drops_duplicates():
+    values = {"2": _id("a"), "5": _id("b"), "9": _id("a"), "20": _id("c"), "name": "other"}
+    registry, policies = _policy_list(values)
+    policies.compact()
+    assert _stored(registry) == {"1": _id("a"), "2": _id("b"), "3": _id("c"), "name": "other"}
+    assert policies.items() == [(_id("a"), _id("a")), (_id("b"), _id("b")), (_id("c"), _id("c"))]
+    policies.upsert(_id("d"))
+    assert _stored(registry)["4"] == _id("d")
@@ -0,0 +1,170 @@
+import pytest
+
+import registry_backend
+from registry_backend import HANDLE_CACHE_SIZE, HKEY_LOCAL_MACHINE, WinRegistryBackend
+
+ERROR_KEY_DELETED = 1018
+EXTENSIONS = r"Software\Google\Chrome\Extensions"
+
+
+def _error(cls, winerror):
+    error = cls(f"winerror {winerror}")
+    error.winerror = winerror
+    return error
+
+
+class FakeKey:
+    def __init__(self, winreg, node):
+        self.winreg = winreg
+        self.node = node
+        self.closed = False
+        winreg.open_handles += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def Close(self):
+        if not self.closed:
+            self.closed = True
+            self.winreg.open_handles -= 1
+
+
+class FakeWinreg:
+    """只实现 WinRegistryBackend 用到的 winreg 函数，键被删除后旧句柄的操作失败"""
+
+    HKEY_CURRENT_USER = "HKCU"
+    HKEY_LOCAL_MACHINE = "HKLM"
+    # 与 winreg 中的取值相同
+    KEY_READ = 0x20019
+    KEY_ALL_ACCESS = 0xF003F
+    KEY_WOW64_64KEY = 0x0100
+    REG_SZ = 1
+
+    def __init__(self):
+        self.roots = {self.HKEY_CURRENT_USER: self._node(), self.HKEY_LOCAL_MACHINE: self._node()}
+        self.open_handles = 0
+        self.access = []
+
+    @staticmethod
+    def _node():
+        return {"values": {}, "subkeys": {}, "deleted": False}
+
+    def _live(self, key):
+        if key.closed or key.node["deleted"]:
+            raise _error(OSError, ERROR_KEY_DELETED)
+        return key.node
+
+    def _walk(self, base, path, create):
+        node = self.roots[base] if isinstance(base, str) else self._live(base)
+        for part in filter(None, path.split("\\")):
+            child = node["subkeys"].get(part.lower())
+            if child is None:
+                if not create:
+                    raise _error(FileNotFoundError, 2)
+                child = node["subkeys"][part.lower()] = dict(self._node(), name=part)
+            node = child
+        return node
+
+    def CreateKeyEx(self, base, path, reserved, access):
+        self.access.append(access)
+        return FakeKey(self, self._walk(base, path, True))
+
+    def OpenKey(self, base, path, reserved=0, access=0):
+        self.access.append(access)
+        return FakeKey(self, self._walk(base, path, False))
+
+    def CloseKey(self, key):
+        key.Close()
+
+    def EnumKey(self, key, index):
+        subkeys = list(self._live(key)["subkeys"].values())
+        if index >= len(subkeys):
+            raise _error(OSError, registry_backend.ERROR_NO_MORE_ITEMS)
+        return subkeys[index]["name"]
+
+    def EnumValue(self, key, index):
+        values = list(self._live(key)["values"].items())
+        if index >= len(values):
+            raise _error(OSError, registry_backend.ERROR_NO_MORE_ITEMS)
+        return values[index][0], values[index][1], self.REG_SZ
+
+    def QueryValueEx(self, key, name):
+        values = self._live(key)["values"]
+        if name not in values:
+            raise _error(FileNotFoundError, 2)
+        return values[name], self.REG_SZ
+
+    def SetValueEx(self, key, name, reserved, value_type, data):
+        self._live(key)["values"][name] = data
+
+    def DeleteValue(self, key, name):
+        if self._live(key)["values"].pop(name, None) is None:
+            raise _error(FileNotFoundError, 2)
+
+    def DeleteKey(self, base, path):
+        parent_path, _, name = path.rpartition("\\")
+        parent = self._walk(base, parent_path, False)
+        node = parent["subkeys"].pop(name.lower(), None)
+        if node is None:
+            raise _error(FileNotFoundError, 2)
+        node["deleted"] = True
+
+
+@pytest.fixture
+def fake_winreg(monkeypatch):
+    fake = FakeWinreg()
+    monkeypatch.setattr(registry_backend, "winreg", fake)
+    return fake
+
+
+def test_handle_cache_is_bounded(fake_winreg):
+    backend = WinRegistryBackend()
+    for i in range(HANDLE_CACHE_SIZE * 4):
+        backend.write_values(HKEY_LOCAL_MACHINE, f"{EXTENSIONS}\\ext{i}", {"path": f"p{i}", "version": "1"})
+    assert fake_winreg.open_handles <= HANDLE_CACHE_SIZE
+    assert len(backend.read_subkey_values(HKEY_LOCAL_MACHINE, EXTENSIONS)) == HANDLE_CACHE_SIZE * 4
+    # 扫描使用的临时句柄都已关闭
+    assert fake_winreg.open_handles <= HANDLE_CACHE_SIZE
+    backend.close()
+    assert fake_winreg.open_handles == 0
+
+
+def test_key_recreated_by_another_process_is_reopened(fake_winreg):
+    backend = WinRegistryBackend()
+    key_path = f"{EXTENSIONS}\\abc"
+    backend.write_values(HKEY_LOCAL_MACHINE, key_path, {"path": "old"})
+    assert backend.read_values(HKEY_LOCAL_MACHINE, key_path) == {"path": "old"}
+
+    # 另一个进程删除并重建了这个键，后端缓存的句柄指向已删除的键
+    fake_winreg.DeleteKey(fake_winreg.HKEY_LOCAL_MACHINE, key_path)
+    with fake_winreg.CreateKeyEx(fake_winreg.HKEY_LOCAL_MACHINE, key_path, 0, 0) as key:
+        fake_winreg.SetValueEx(key, "path", 0, fake_winreg.REG_SZ, "new")
+
+    assert backend.read_values(HKEY_LOCAL_MACHINE, key_path) == {"path": "new"}
+    backend.write_values(HKEY_LOCAL_MACHINE, key_path, {"version": "2"})
+    with fake_winreg.OpenKey(fake_winreg.HKEY_LOCAL_MACHINE, key_path) as key:
+        assert fake_winreg.QueryValueEx(key, "version")[0] == "2"
+
+
+def test_key_deleted_by_another_process_is_not_read_as_empty(fake_winreg):
+    backend = WinRegistryBackend()
+    key_path = f"{EXTENSIONS}\\abc"
+    backend.write_values(HKEY_LOCAL_MACHINE, key_path, {"path": "old"})
+    backend.read_values(HKEY_LOCAL_MACHINE, key_path)
+    fake_winreg.DeleteKey(fake_winreg.HKEY_LOCAL_MACHINE, key_path)
+
+    with pytest.raises(FileNotFoundError):
+        backend.read_values(HKEY_LOCAL_MACHINE, key_path)
+
+
+def test_uses_default_registry_view(fake_winreg):
+    # 与原来的管理工具一样使用进程默认的注册表视图，32位程序仍读写 WOW6432Node
+    backend = WinRegistryBackend()
+    backend.write_values(HKEY_LOCAL_MACHINE, rf"{EXTENSIONS}\ext", {"path": "p"})
+    backend.read_values(HKEY_LOCAL_MACHINE, rf"{EXTENSIONS}\ext")
+    backend.read_subkey_values(HKEY_LOCAL_MACHINE, EXTENSIONS)
+    assert fake_winreg.access
+    assert not any(access & FakeWinreg.KEY_WOW64_64KEY for access in fake_winreg.access)